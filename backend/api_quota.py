@@ -0,0 +1,248 @@
+import datetime
+import os
+import threading
+import time
+
+# AppsFlyer call budgets.
+#
+# The quota ledger (SQLite, shared by every gunicorn worker / RQ job through the
+# database file) counts today's report downloads per app and per account and
+# remembers when AppsFlyer said an allowance is used up, so later calls for the
+# same report are skipped before they reach the API. The token buckets smooth
+# bursts per endpoint family; with Redis the buckets are shared across processes.
+
+ACCOUNT = '*'
+
+# endpoint_type -> quota family. AppsFlyer counts raw downloads as install or
+# in-app event reports; the aggregated daily report has its own limit, and the
+# raw-data daily report is kept apart from it so neither's refusals block the other.
+QUOTA_FAMILIES = {
+    'daily_report': 'daily_report',
+    'raw_daily_report': 'raw_daily_report',
+    'installs_report': 'installs',
+    'blocked_installs_report': 'installs',
+    'detection': 'installs',
+    'blocked_install_postbacks': 'installs',
+    'blocked_clicks_report': 'installs',
+    'in_app_events_report': 'in_app_events',
+    'blocked_in_app_events_report': 'in_app_events',
+    'fraud_post_inapps': 'in_app_events',
+}
+
+# Families of the raw-data API, all refused when the subscription has no raw data
+RAW_FAMILIES = ('installs', 'in_app_events', 'raw_daily_report')
+DAILY_REPORT_FAMILIES = ('daily_report', 'raw_daily_report')
+
+# AppsFlyer error message -> (family, scope) it exhausts; family None means every raw
+# family, a daily-report limit applies to the daily report family that was called
+QUOTA_MESSAGES = {
+    "limit reached for daily-report": ('daily_report', 'app'),
+    "you've reached your maximum number of in-app event reports that can be downloaded today for this app": ('in_app_events', 'app'),
+    "you've reached your maximum number of in-app event reports that can be downloaded today for this account": ('in_app_events', 'account'),
+    "you've reached your maximum number of install reports that can be downloaded today for this app": ('installs', 'app'),
+    "you've reached your maximum number of install reports that can be downloaded today for this account": ('installs', 'account'),
+    "your current subscription package doesn't include raw data reports": (None, 'account'),
+    "subscription package doesn't include raw data": (None, 'account'),
+}
+
+
+def _parse_limits(value):
+    """'installs=24,in_app_events=24' -> {'installs': 24, 'in_app_events': 24}"""
+    limits = {}
+    for item in filter(None, (value or '').split(',')):
+        name, _, number = item.partition('=')
+        try:
+            limits[name.strip()] = float(number)
+        except ValueError:
+            print(f"[QUOTA] Ignoring invalid limit entry: {item}")
+    return limits
+
+
+# Daily download allowances per family (0 / unset = only learn them from AppsFlyer's errors)
+DAILY_APP_LIMITS = _parse_limits(os.getenv('AF_DAILY_APP_LIMITS', ''))
+DAILY_ACCOUNT_LIMITS = _parse_limits(os.getenv('AF_DAILY_ACCOUNT_LIMITS', ''))
+# Token buckets: calls per minute per family and the burst allowed on top (0 disables)
+RATE_PER_MINUTE = _parse_limits(os.getenv('AF_RATE_LIMITS',
+                                          'daily_report=120,raw_daily_report=120,installs=120,in_app_events=120'))
+RATE_BURST = int(os.getenv('AF_RATE_BURST', '20'))
+
+
+def quota_day():
+    """AppsFlyer allowances reset at midnight UTC"""
+    return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+
+def init_quota_ledger(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS api_quota_ledger (
+        day TEXT NOT NULL,
+        scope TEXT NOT NULL,
+        family TEXT NOT NULL,
+        used INTEGER NOT NULL DEFAULT 0,
+        exhausted_reason TEXT,
+        PRIMARY KEY (day, scope, family)
+    )''')
+
+
+def _scopes(app_id, family):
+    return [(app_id, DAILY_APP_LIMITS.get(family, 0)), (ACCOUNT, DAILY_ACCOUNT_LIMITS.get(family, 0))]
+
+
+def reserve(conn, app_id, endpoint_type):
+    """
+    Take one download from today's allowances before calling AppsFlyer.
+
+    Returns None when the call may go ahead, otherwise the reason it would fail.
+    The check and the increment happen in one write transaction, so concurrent
+    workers can't both take the last download.
+    """
+    family = QUOTA_FAMILIES.get(endpoint_type)
+    if family is None or not app_id:
+        return None
+    day = quota_day()
+    c = conn.cursor()
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        for scope, limit in _scopes(app_id, family):
+            c.execute('''SELECT used, exhausted_reason FROM api_quota_ledger
+                         WHERE day = ? AND scope = ? AND family = ?''', (day, scope, family))
+            rows = c.fetchall()
+            reason = next((r[1] for r in rows if r[1]), None)
+            used = sum(r[0] for r in rows)
+            if reason:
+                conn.rollback()
+                return reason
+            if limit and used >= limit:
+                conn.rollback()
+                return f"daily {family} allowance of {int(limit)} used up for {'the account' if scope == ACCOUNT else scope}"
+        c.executemany('''INSERT INTO api_quota_ledger (day, scope, family, used) VALUES (?, ?, ?, 1)
+                         ON CONFLICT (day, scope, family) DO UPDATE SET used = used + 1''',
+                      [(day, scope, family) for scope, _ in _scopes(app_id, family)])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return None
+
+
+def release(conn, app_id, endpoint_type):
+    """Give back a reserved download that AppsFlyer never served"""
+    family = QUOTA_FAMILIES.get(endpoint_type)
+    if family is None or not app_id:
+        return
+    conn.executemany('''UPDATE api_quota_ledger SET used = MAX(used - 1, 0)
+                        WHERE day = ? AND scope = ? AND family = ?''',
+                     [(quota_day(), scope, family) for scope in (app_id, ACCOUNT)])
+    conn.commit()
+
+
+def quota_error(error_text, endpoint_type=None):
+    """(family, scope, message) if an AppsFlyer error body for endpoint_type says an allowance is used up"""
+    error_text = (error_text or '').lower()
+    for message, (family, scope) in QUOTA_MESSAGES.items():
+        if message in error_text:
+            if family == 'daily_report' and QUOTA_FAMILIES.get(endpoint_type) in DAILY_REPORT_FAMILIES:
+                family = QUOTA_FAMILIES[endpoint_type]
+            return family, scope, message
+    return None
+
+
+def mark_exhausted(conn, app_id, family, scope, reason):
+    """Remember for the rest of the day that AppsFlyer refused this family (None = every raw family)"""
+    scope = ACCOUNT if scope == 'account' else app_id
+    families = RAW_FAMILIES if family is None else (family,)
+    conn.executemany('''INSERT INTO api_quota_ledger (day, scope, family, used, exhausted_reason) VALUES (?, ?, ?, 0, ?)
+                        ON CONFLICT (day, scope, family) DO UPDATE SET exhausted_reason = excluded.exhausted_reason''',
+                     [(quota_day(), scope, family, reason) for family in families])
+    conn.commit()
+
+
+def ledger_snapshot(conn):
+    """Today's ledger rows plus the configured allowances"""
+    c = conn.cursor()
+    c.execute('''SELECT scope, family, used, exhausted_reason FROM api_quota_ledger
+                 WHERE day = ? ORDER BY scope = ? DESC, scope, family''', (quota_day(), ACCOUNT))
+    return {
+        'day': quota_day(),
+        'entries': [{'scope': scope, 'family': family, 'used': used, 'exhausted': reason}
+                    for scope, family, used, reason in c.fetchall()],
+        'daily_app_limits': DAILY_APP_LIMITS,
+        'daily_account_limits': DAILY_ACCOUNT_LIMITS,
+        'rate_per_minute': RATE_PER_MINUTE,
+        'rate_burst': RATE_BURST
+    }
+
+
+# Refill and take a token in one step; returns the seconds to wait ('0' = token taken)
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+
+class RateLimiter:
+    """
+    Token bucket per quota family.
+
+    With a Redis connection the buckets live in Redis and every process draws
+    from the same budget; without one each process keeps its own buckets.
+    """
+
+    def __init__(self, redis_conn=None):
+        self.redis_conn = redis_conn
+        self._script = None
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _take_local(self, family, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.get(family, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+            if tokens >= 1:
+                self._buckets[family] = (tokens - 1, now)
+                return 0
+            self._buckets[family] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def _take(self, family, rate, burst):
+        if self.redis_conn is not None:
+            try:
+                if self._script is None:
+                    self._script = self.redis_conn.register_script(_TOKEN_BUCKET_LUA)
+                return float(self._script(keys=[f"af_rate:{family}"], args=[rate, burst, time.time()]))
+            except Exception as e:
+                print(f"[QUOTA] Redis token bucket unavailable, using local bucket: {e}")
+                self.redis_conn = None
+        return self._take_local(family, rate, burst)
+
+    def acquire(self, endpoint_type):
+        """Block until the endpoint's family has a token; returns the seconds waited"""
+        family = QUOTA_FAMILIES.get(endpoint_type)
+        per_minute = RATE_PER_MINUTE.get(family, 0) if family else 0
+        if per_minute <= 0:
+            return 0
+        rate = per_minute / 60.0
+        burst = max(1, RATE_BURST)
+        waited = 0
+        while True:
+            wait = self._take(family, rate, burst)
+            if wait <= 0:
+                if waited:
+                    print(f"[QUOTA] Waited {waited:.2f}s for a {family} token")
+                return waited
+            time.sleep(wait)
+            waited += wait
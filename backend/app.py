@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, render_template, request, session, redirect, url_for, Response
+from flask import Flask, jsonify, render_template, request, session, redirect, url_for, Response, stream_with_context
 from flask_cors import CORS
 import os
 from pathlib import Path
@@ -12,6 +12,8 @@ import time
 from functools import wraps
 import requests
 import csv
+import itertools
+import threading
 from io import StringIO
 import datetime
 import sqlite3
@@ -21,7 +23,8 @@ import pytz
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from redis import Redis
-from rq import Queue
+from rq import Queue, Worker, get_current_job
+from rq.job import Job, Dependency
 import logging
 
 # Configure logging for Railway
@@ -58,17 +61,36 @@ try:
     redis_conn.ping()
     logger.info(f"✅ Redis connected successfully to {redis_host}:{redis_port}")
     
+    # RQ (pickled jobs) and the hot response cache (serialized bodies) need a connection that doesn't decode replies
+    redis_bytes_conn = Redis(host=redis_host, port=redis_port, db=redis_db)
+    
     # Initialize RQ queue
-    task_queue = Queue(connection=redis_conn)
+    task_queue = Queue(connection=redis_bytes_conn)
     
 except Exception as e:
     logger.warning(f"⚠️  Redis connection failed: {e}")
     logger.info("📝 Background tasks will be disabled")
     redis_conn = None
+    redis_bytes_conn = None
     task_queue = None
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from appsflyer_login import get_apps_with_installs
+import fetch_engine
+from fetch_engine import host_slot, fetch_endpoints, map_apps
+from appsflyer_client import AppsFlyerClient, endpoint_type_for, app_id_for
+import api_quota
+from retry_scheduler import RetryScheduler, backoff_delay, job_name
+from csv_stream import SpooledResponse, open_csv, count_by_key, splice_csv_window
+import csv_schema
+import day_partitions
+import db
+import raw_store
+import retention
+from hot_cache import HotCache, APPS, ENCODINGS, variants
+from raw_export import RAW_EXPORTS, EXPORT_FORMATS, RawExport, arrow_available
+import metrics_store
+from metrics_store import STATS, FRAUD
 
 # Get the project root directory and load environment variables
 project_root = Path(__file__).parent.parent
@@ -135,6 +157,16 @@ if not all([DASHBOARD_USERNAME, DASHBOARD_PASSWORD]):
 EMAIL = os.getenv('EMAIL')
 PASSWORD = os.getenv('PASSWORD')
 APPSFLYER_API_KEY = os.getenv('APPSFLYER_API_KEY')
+# Base URL for all AppsFlyer API calls - override to point at a local stand-in for benchmarks
+APPSFLYER_BASE_URL = os.getenv('APPSFLYER_BASE_URL', 'https://hq1.appsflyer.com').rstrip('/')
+# The one AppsFlyer API client (pooled keep-alive session) - all report fetches go through it
+appsflyer = AppsFlyerClient(APPSFLYER_BASE_URL, APPSFLYER_API_KEY, limiter=api_quota.RateLimiter(redis_conn))
+# How long a downloaded report can be reused by other requests for the same app/endpoint/dates (0 disables)
+RAW_FETCH_CACHE_TTL = int(os.getenv('RAW_FETCH_CACHE_TTL', '3600'))
+# Failed fetches are retried later by this scheduler (RQ delayed jobs while a worker is listening, else a local timer)
+retries = RetryScheduler(task_queue, redis_conn, workers_available=lambda: report_workers_available())
+# Serialized dashboard responses, dropped whenever the data behind them is rewritten
+hot_cache = HotCache(redis_bytes_conn)
 
 if not all([EMAIL, PASSWORD]):
     raise ValueError("EMAIL and PASSWORD not found in environment variables")
@@ -188,7 +220,7 @@ def init_db():
         logger.info(f"Created database directory: {db_dir}")
     
     logger.info(f"Initializing database at: {DB_PATH}")
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect(DB_PATH)
     c = conn.cursor()
     c.execute('''CREATE TABLE IF NOT EXISTS app_event_selections (
         app_id TEXT PRIMARY KEY,
@@ -230,6 +262,11 @@ def init_db():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         UNIQUE(app_id, endpoint_type, period, start_date, end_date)
     )''')
+    # Lookup index for the raw report fetch cache (app, endpoint, date range, freshness)
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_raw_data_fetch_cache
+                 ON raw_appsflyer_data (app_id, endpoint_type, start_date, end_date, created_at)''')
+    # CSV bodies live compressed and deduplicated in raw_blobs (legacy TEXT rows are migrated)
+    raw_store.init_raw_store(conn)
     
     # Create table for auto-run timing management
     c.execute('''CREATE TABLE IF NOT EXISTS auto_run_settings (
@@ -258,12 +295,19 @@ def init_db():
     # Initialize auto-run settings with default values if not exists
     c.execute('''INSERT OR IGNORE INTO auto_run_settings (id) VALUES (1)''')
     
+    # Normalized stats/fraud report tables (stats_cache/fraud_cache only index the runs)
+    metrics_store.init_metrics_store(conn)
+    # Per (app, day) results so rolling periods only refetch the days that are still open
+    day_partitions.init_day_partitions(conn)
+    api_quota.init_quota_ledger(conn)
+    retention.init_retention(conn)
+    
     conn.commit()
     conn.close()
 
 # Add the new column if it doesn't exist
 def add_is_active_column():
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect(DB_PATH)
     c = conn.cursor()
     try:
         c.execute('ALTER TABLE app_event_selections ADD COLUMN is_active INTEGER DEFAULT 0')
@@ -327,7 +371,7 @@ def get_active_apps(max_retries=7, force_fetch=False, allow_appsflyer_api=True):
     import pytz
     gmt2 = pytz.timezone('Europe/Berlin')
     now = datetime.datetime.now(gmt2)
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect(DB_PATH)
     c = conn.cursor()
     
     # Get active status from database first
@@ -477,6 +521,7 @@ def get_active_apps(max_retries=7, force_fetch=False, allow_appsflyer_api=True):
              (json.dumps(result), fetch_time))
     conn.commit()
     conn.close()
+    hot_cache.invalidate(APPS)
     return result
 
 @app.route('/active-apps')
@@ -499,13 +544,10 @@ def active_apps():
 @app.route('/app-stats/<app_id>')
 @login_required
 def app_stats(app_id):
-    headers = {
-        "Authorization": f"Bearer {APPSFLYER_API_KEY}"
-    }
     # Example: Installs report (adjust endpoint as needed)
-    installs_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/installs_report/v5"
+    installs_url = appsflyer.url(app_id, 'installs_report')
     try:
-        resp = requests.get(installs_url, headers=headers)
+        resp = appsflyer.get(installs_url, accept=None, stream=False)
         if resp.status_code == 200:
             # For now, just return the raw response (CSV or JSON)
             return resp.text, 200, {'Content-Type': resp.headers.get('Content-Type', 'text/plain')}
@@ -544,16 +586,14 @@ def get_period_dates(period):
 @login_required
 def app_events(app_id):
     import time
-    import requests
     today = datetime.date.today()
     start_date = (today - datetime.timedelta(days=10)).strftime("%Y-%m-%d")
     end_date = today.strftime("%Y-%m-%d")
-    url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/in_app_events_report/v5"
+    url = appsflyer.url(app_id, 'in_app_events_report')
     params = {"from": start_date, "to": end_date}
-    headers = {"accept": "text/csv", "authorization": f"Bearer {APPSFLYER_API_KEY}"}
     
     # Check event_cache first
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect(DB_PATH)
     c = conn.cursor()
     c.execute('''CREATE TABLE IF NOT EXISTS event_cache (
         app_id TEXT PRIMARY KEY,
@@ -582,70 +622,74 @@ def app_events(app_id):
             break
             
     print(f"[GET EVENTS] Fetching In-App Events for: {app_name} (App ID: {app_id}) from {start_date} to {end_date}...")
+    # One immediate retry covers a dropped keep-alive connection; nothing waits inside the request
     max_retries = 2
-    retry_delay = 5
-    retries = 0
+    attempts = 0
     start_time = time.time()
+    skip_reason = _reserve_quota(url)
+    if skip_reason:
+        print(f"[GET EVENTS] Skipping In-App Events for {app_id}: {skip_reason}")
+        conn.close()
+        return jsonify({
+            "events": [],
+            "fetch_time": "0.00 seconds",
+            "error": f"AppsFlyer quota: {skip_reason}"
+        })
     
-    while retries < max_retries:
+    while attempts < max_retries:
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=90)
+            response = appsflyer.get(url, params)
             response.raise_for_status()
-            rows = response.text.strip().split("\n")
-            if not rows:
-                return jsonify({
-                    "events": [], 
-                    "fetch_time": f"{time.time()-start_time:.2f} seconds",
-                    "error": "No data returned from API"
-                })
-                
-            header = rows[0].split(",")
-            data = [row.split(",") for row in rows[1:]]
+            # The spool is a temp file once the report outgrows memory - close it on every way out
+            with SpooledResponse.from_response(response) as spooled:
+                header, data = open_csv(spooled)
+                if header is None:
+                    return jsonify({
+                        "events": [], 
+                        "fetch_time": f"{time.time()-start_time:.2f} seconds",
+                        "error": "No data returned from API"
+                    })
             
-            if "Event Name" not in header:
-                print(f"[GET EVENTS] No 'Event Name' column found for app: {app_id}")
-                return jsonify({
-                    "events": [], 
-                    "fetch_time": f"{time.time()-start_time:.2f} seconds",
-                    "error": "No 'Event Name' column in API response"
-                })
+                if "Event Name" not in header:
+                    print(f"[GET EVENTS] No 'Event Name' column found for app: {app_id}")
+                    return jsonify({
+                        "events": [], 
+                        "fetch_time": f"{time.time()-start_time:.2f} seconds",
+                        "error": "No 'Event Name' column in API response"
+                    })
                 
-            event_name_index = header.index("Event Name")
-            event_names = set()
-            for row in data:
-                if len(row) > event_name_index:
-                    event_names.add(row[event_name_index])
+                event_name_index = header.index("Event Name")
+                event_names = set()
+                for row in data:
+                    if len(row) > event_name_index:
+                        event_names.add(row[event_name_index])
                     
-            elapsed = time.time() - start_time
-            print(f"[GET EVENTS] Done fetching events for app: {app_name} (App ID: {app_id}) in {elapsed:.2f} seconds. Found {len(event_names)} events.")
-            result = {
-                "events": sorted(list(event_names)), 
-                "fetch_time": f"{elapsed:.2f} seconds"
-            }
-            # Save to cache
-            c.execute('REPLACE INTO event_cache (app_id, data, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)', (app_id, json.dumps(result)))
-            conn.commit()
-            conn.close()
-            return jsonify(result)
+                elapsed = time.time() - start_time
+                print(f"[GET EVENTS] Done fetching events for app: {app_name} (App ID: {app_id}) in {elapsed:.2f} seconds. Found {len(event_names)} events.")
+                result = {
+                    "events": sorted(list(event_names)), 
+                    "fetch_time": f"{elapsed:.2f} seconds"
+                }
+                # Save to cache
+                c.execute('REPLACE INTO event_cache (app_id, data, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)', (app_id, json.dumps(result)))
+                conn.commit()
+                conn.close()
+                return jsonify(result)
             
         except requests.exceptions.HTTPError as http_err:
             response_content = response.text.strip() if hasattr(response, 'text') else ''
             print(f"[GET EVENTS] HTTP error occurred: {http_err}")
             print("Response Content:", response_content)
             
-            if "Limit reached for daily-report" in response_content:
-                retries += 1
-                if retries < max_retries:
-                    print(f"Limit reached for daily-report. Retrying in {retry_delay} seconds... (Attempt {retries}/{max_retries})")
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    print("Max retries reached for daily-report. Skipping In-App Events for this app.")
-                    return jsonify({
-                        "events": [], 
-                        "fetch_time": f"{time.time()-start_time:.2f} seconds", 
-                        "error": "API rate limit reached after multiple retries"
-                    })
+            refused = api_quota.quota_error(response_content, endpoint_type_for(url))
+            _release_quota(url, refused)
+            if refused:
+                print("Quota reached for In-App Events. Skipping In-App Events for this app.")
+                return jsonify({
+                    "events": [], 
+                    "fetch_time": f"{time.time()-start_time:.2f} seconds", 
+                    "error": f"AppsFlyer quota: {refused[2]}"
+                })
             else:
                 print("Unhandled HTTP error. Skipping In-App Events for this app.")
                 return jsonify({
@@ -656,14 +700,14 @@ def app_events(app_id):
                 })
                 
         except Exception as e:
-            retries += 1
+            attempts += 1
             print(f"An error occurred while fetching In-App Events for {app_name} (App ID: {app_id}): {e}")
-            if retries < max_retries:
-                print(f"Retrying in {retry_delay} seconds... (Attempt {retries}/{max_retries})")
-                time.sleep(retry_delay)
+            if attempts < max_retries:
+                print(f"Retrying now... (Attempt {attempts}/{max_retries})")
                 continue
             else:
                 print("Max retries reached or unrecoverable error occurred. Skipping In-App Events for this app.")
+                _release_quota(url)
                 return jsonify({
                     "events": [], 
                     "fetch_time": f"{time.time()-start_time:.2f} seconds", 
@@ -677,6 +721,16 @@ def app_events(app_id):
         "error": "Max retries reached"
     })
 
+# Period label for raw reports that only cover the trailing (refetched) days of a period
+RAW_SLICE_SUFFIX = ':slice'
+
+def raw_period_label(period, start_date, end_date):
+    """Label a raw report is stored under - slices are kept apart from the full-window copy the exports read"""
+    window_start, window_end = get_period_dates(period)
+    if window_start < start_date and end_date == window_end:
+        return period + RAW_SLICE_SUFFIX
+    return period
+
 def save_raw_appsflyer_data(app_id, app_name, endpoint_type, period, raw_csv_data, start_date, end_date):
     """Save original raw AppsFlyer CSV data to database"""
     try:
@@ -684,112 +738,547 @@ def save_raw_appsflyer_data(app_id, app_name, endpoint_type, period, raw_csv_dat
             print(f"[RAW_DATA] Skipping save - no data for {app_id} {endpoint_type}")
             return
             
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         
-        # Replace existing data for the same app/endpoint/period/date range
+        label = raw_period_label(period, start_date, end_date)
+        # Replace existing data for the same app/endpoint/period/date range - the body goes to raw_blobs
         c.execute('''INSERT OR REPLACE INTO raw_appsflyer_data 
-                     (app_id, app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at) 
-                     VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)''',
-                  (app_id, app_name, endpoint_type, period, raw_csv_data, start_date, end_date))
-        
+                     (app_id, app_name, endpoint_type, period, raw_csv_data, blob_hash, start_date, end_date, created_at) 
+                     VALUES (?, ?, ?, ?, '', ?, ?, ?, CURRENT_TIMESTAMP)''',
+                  (app_id, app_name, endpoint_type, label, raw_store.put(conn, raw_csv_data), start_date, end_date))
+        
+        if label != period:
+            # Incremental refresh: splice the new days into the period's previous full-window
+            # copy so the /export/raw endpoints still get the whole window
+            window_start, window_end = get_period_dates(period)
+            c.execute(f'''SELECT {raw_store.RAW_CSV_SQL} FROM raw_appsflyer_data
+                         WHERE app_id = ? AND endpoint_type = ? AND period = ?
+                         ORDER BY created_at DESC LIMIT 1''', (app_id, endpoint_type, period))
+            previous = c.fetchone()
+            window_csv = splice_csv_window(raw_store.unpack(previous[0]), raw_csv_data, window_start, start_date) if previous else None
+            if window_csv is None:
+                print(f"[RAW_DATA] No matching {period} copy to extend for {app_id} {endpoint_type} - export covers {start_date} to {end_date} only")
+                window_csv = raw_csv_data
+            c.execute('''INSERT OR REPLACE INTO raw_appsflyer_data 
+                         (app_id, app_name, endpoint_type, period, raw_csv_data, blob_hash, start_date, end_date, created_at) 
+                         VALUES (?, ?, ?, ?, '', ?, ?, ?, CURRENT_TIMESTAMP)''',
+                      (app_id, app_name, endpoint_type, period, raw_store.put(conn, window_csv), window_start, window_end))
+        
+        # Bodies the replaced rows pointed at may not be used by any row any more
+        raw_store.prune(conn)
         conn.commit()
         conn.close()
         
-        # Get data size in a readable format
-        data_size = len(raw_csv_data)
-        if data_size < 1024:
-            size_str = f"{data_size} bytes"
-        elif data_size < 1024 * 1024:
-            size_str = f"{data_size / 1024:.1f} KB"
-        else:
-            size_str = f"{data_size / (1024 * 1024):.1f} MB"
-            
-        print(f"[RAW_DATA] Saved {endpoint_type} data for {app_name} ({app_id}) - {size_str}")
+        print(f"[RAW_DATA] Saved {endpoint_type} data for {app_name} ({app_id}) - {raw_store.format_size(len(raw_csv_data))}")
         
     except Exception as e:
         print(f"[RAW_DATA] Error saving raw data for {app_id} {endpoint_type}: {str(e)}")
 
-def make_api_request(url, params, max_retries=7, retry_delay=30, app_id=None, app_name=None, period=None):
-    """Make API request to AppsFlyer and optionally save raw data"""
-    headers = {
-        "Authorization": f"Bearer {APPSFLYER_API_KEY}",
-        "accept": "text/csv"
-    }
-    
+# --- RAW REPORT FETCH CACHE ---
+# Stats and fraud download the same raw reports for the same apps and dates, so
+# a fresh copy in raw_appsflyer_data is served instead of spending API quota again.
+raw_fetch_cache_stats = {'hits': 0, 'misses': 0}
+_raw_fetch_cache_lock = threading.Lock()
+_raw_fetch_inflight = {}
+
+def _count_raw_fetch_cache(outcome):
+    with _raw_fetch_cache_lock:
+        raw_fetch_cache_stats[outcome] += 1
+    if redis_conn:
+        try:
+            redis_conn.hincrby('raw_fetch_cache:stats', outcome, 1)
+        except Exception as e:
+            logger.debug(f"Could not update shared raw fetch cache counters: {e}")
+
+def _raw_fetch_key_lock(key):
+    # One lock per (app, endpoint, from, to) so concurrent callers wait for a single download
+    with _raw_fetch_cache_lock:
+        lock = _raw_fetch_inflight.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _raw_fetch_inflight[key] = lock
+        return lock
+
+def get_cached_raw_report(app_id, endpoint_type, start_date, end_date):
+    """Return (raw_csv_data, period) of a copy younger than RAW_FETCH_CACHE_TTL, or None"""
+    if RAW_FETCH_CACHE_TTL <= 0:
+        return None
+    conn = db.connect(DB_PATH)
+    try:
+        c = conn.cursor()
+        c.execute(f'''SELECT {raw_store.RAW_CSV_SQL}, period FROM raw_appsflyer_data
+                     WHERE app_id = ? AND endpoint_type = ? AND start_date = ? AND end_date = ?
+                       AND created_at >= datetime('now', ?)
+                     ORDER BY created_at DESC LIMIT 1''',
+                  (app_id, endpoint_type, start_date, end_date, f'-{RAW_FETCH_CACHE_TTL} seconds'))
+        row = c.fetchone()
+        return (raw_store.unpack(row[0]), row[1]) if row else None
+    finally:
+        conn.close()
+
+@app.route('/api/raw-cache-stats')
+@login_required
+def raw_cache_stats():
+    """Hit/miss counters for the raw report fetch cache"""
+    with _raw_fetch_cache_lock:
+        local_stats = dict(raw_fetch_cache_stats)
+    shared_stats = None
+    if redis_conn:
+        try:
+            shared = redis_conn.hgetall('raw_fetch_cache:stats')
+            shared_stats = {'hits': int(shared.get('hits', 0)), 'misses': int(shared.get('misses', 0))}
+        except Exception as e:
+            logger.debug(f"Could not read shared raw fetch cache counters: {e}")
+    stats = shared_stats or local_stats
+    lookups = stats['hits'] + stats['misses']
+    return jsonify({
+        'hits': stats['hits'],
+        'misses': stats['misses'],
+        'hit_rate': round(stats['hits'] / lookups, 4) if lookups else 0,
+        'ttl_seconds': RAW_FETCH_CACHE_TTL,
+        'worker': local_stats,
+        'shared': shared_stats is not None
+    })
+
+@app.route('/api/raw-storage-stats')
+@login_required
+def raw_storage_stats():
+    """Size of the stored raw reports uncompressed vs. compressed and deduplicated"""
+    conn = db.connect(DB_PATH)
+    try:
+        return jsonify(raw_store.size_report(conn))
+    finally:
+        conn.close()
+
+@app.route('/api/retention-status')
+@login_required
+def retention_status():
+    """Cache retention limits, current usage and what the latest runs freed"""
+    conn = db.connect(DB_PATH)
+    try:
+        return jsonify(retention.status(conn))
+    finally:
+        conn.close()
+
+@app.route('/api/csv-schemas')
+@login_required
+def csv_schemas():
+    """Header layouts seen per report type, schema drift and column-lookup cache counters"""
+    return jsonify(csv_schema.status())
+
+@app.route('/api/retention/run', methods=['POST'])
+@login_required
+def run_retention():
+    """Apply the retention limits now"""
+    conn = db.connect(DB_PATH)
+    try:
+        return jsonify(retention.enforce(conn))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@app.route('/api/quota-status')
+@login_required
+def quota_status():
+    """Today's AppsFlyer download ledger and the configured allowances / rate limits"""
+    conn = db.connect(DB_PATH)
+    try:
+        return jsonify(api_quota.ledger_snapshot(conn))
+    finally:
+        conn.close()
+
+def make_api_request(url, params, max_retries=7, retry_delay=30, app_id=None, app_name=None, period=None, attempt=0):
+    """
+    Make API request to AppsFlyer and optionally save raw data.
+
+    Makes a single attempt. A retryable failure (429, 5xx, connection error,
+    timeout) of a call whose result is saved is handed to the retry scheduler
+    with exponential backoff and reported to the caller as 'timeout', so nothing
+    waits in the request. Up to max_retries attempts are made in total, starting
+    at retry_delay.
+    """
     # Extract endpoint type from URL for saving raw data
-    endpoint_type = None
-    if app_id and app_name and period:
-        if "daily_report" in url:
-            endpoint_type = "daily_report"
-        elif "blocked_installs_report" in url:
-            endpoint_type = "blocked_installs_report"
-        elif "installs_report" in url:
-            endpoint_type = "installs_report"
-        elif "detection" in url:
-            endpoint_type = "detection"
-        elif "blocked_in_app_events_report" in url:
-            endpoint_type = "blocked_in_app_events_report"
-        elif "fraud-post-inapps" in url:
-            endpoint_type = "fraud_post_inapps"
-        elif "blocked_clicks_report" in url:
-            endpoint_type = "blocked_clicks_report"
-        elif "blocked_install_postbacks" in url:
-            endpoint_type = "blocked_install_postbacks"
-        elif "in_app_events_report" in url:
-            endpoint_type = "in_app_events_report"
+    endpoint_type = endpoint_type_for(url) if app_id and app_name and period else None
     
-    for attempt in range(max_retries):
-        try:
-            print(f"[API] Making request to {url} (attempt {attempt + 1}/{max_retries})")
-            resp = requests.get(url, headers=headers, params=params, timeout=90)
+    if not endpoint_type or RAW_FETCH_CACHE_TTL <= 0:
+        return _fetch_from_api(url, params, max_retries, retry_delay, endpoint_type, app_id, app_name, period, attempt)
+    
+    start_date = params.get('from', '')
+    end_date = params.get('to', '')
+    with _raw_fetch_key_lock((app_id, endpoint_type, start_date, end_date)):
+        cached = get_cached_raw_report(app_id, endpoint_type, start_date, end_date)
+        if cached:
+            raw_csv_data, cached_period = cached
+            _count_raw_fetch_cache('hits')
+            print(f"[API] Raw fetch cache hit for {app_id} {endpoint_type} ({start_date} to {end_date})")
+            # Keep a copy under this period too so the /export/raw endpoints find it
+            if cached_period != raw_period_label(period, start_date, end_date):
+                save_raw_appsflyer_data(app_id, app_name, endpoint_type, period, raw_csv_data, start_date, end_date)
+            resp = SpooledResponse.from_text(raw_csv_data, url)
+            resp.from_cache = True
+            return resp
+        _count_raw_fetch_cache('misses')
+        return _fetch_from_api(url, params, max_retries, retry_delay, endpoint_type, app_id, app_name, period, attempt)
+
+def _reserve_quota(url):
+    """Take today's download allowance for a call; returns the skip reason if there is none left"""
+    conn = db.connect(DB_PATH)
+    try:
+        return api_quota.reserve(conn, app_id_for(url), endpoint_type_for(url))
+    finally:
+        conn.close()
+
+def _release_quota(url, refused=None):
+    """Hand back the allowance of a call AppsFlyer didn't serve, remembering quota refusals"""
+    conn = db.connect(DB_PATH)
+    try:
+        api_quota.release(conn, app_id_for(url), endpoint_type_for(url))
+        if refused:
+            family, scope, message = refused
+            api_quota.mark_exhausted(conn, app_id_for(url), family, scope, message)
+    finally:
+        conn.close()
+
+def _fetch_from_api(url, params, max_retries, retry_delay, endpoint_type, app_id, app_name, period, attempt=0):
+    """Call AppsFlyer once, save the raw CSV on success and schedule a retry on a transient failure"""
+    skip_reason = _reserve_quota(url)
+    if skip_reason:
+        print(f"[API] Skipping {url}: {skip_reason}")
+        return None
+    resp, refused, retry_after = None, None, None
+    try:
+        resp, refused, retry_after = _fetch_once(url, params, attempt, max_retries, endpoint_type, app_id, app_name, period)
+    finally:
+        if resp is None or resp == 'timeout':
+            _release_quota(url, refused)
+    if retry_after is not None:
+        retried = _schedule_retry(url, params, attempt, max_retries, retry_delay, retry_after, endpoint_type, app_id, app_name, period)
+        # A timeout is still reported as one when it isn't retried
+        return resp if resp == 'timeout' else retried
+    return resp
+
+def _fetch_once(url, params, attempt, max_retries, endpoint_type, app_id, app_name, period):
+    """One AppsFlyer call; returns (response, quota refusal or None, Retry-After seconds if worth retrying or None)"""
+    try:
+        print(f"[API] Making request to {url} (attempt {attempt + 1}/{max_retries})")
+        # Wait for the rate limiter before taking a host slot, so a throttled endpoint
+        # doesn't hold slots other endpoints' calls could use
+        appsflyer.wait_for_token(url)
+        with host_slot(url):
+            resp = appsflyer.get(url, params, token_taken=True)
             if resp.status_code == 200:
-                # Save raw data if we have all required info
-                if endpoint_type and app_id and app_name and period:
-                    start_date = params.get('from', '')
-                    end_date = params.get('to', '')
-                    save_raw_appsflyer_data(app_id, app_name, endpoint_type, period, resp.text, start_date, end_date)
-                return resp
-            print(f"[API] Request failed with status {resp.status_code}")
-            print(f"[API] Response headers: {dict(resp.headers)}")
-            print(f"[API] Response body: {resp.text}")
-            
-            # Check for specific error messages that should skip retries
-            error_text = resp.text.lower()
-            skip_retry_messages = [
-                "limit reached for daily-report",
-                "you've reached your maximum number of in-app event reports that can be downloaded today for this app",
-                "you've reached your maximum number of in-app event reports that can be downloaded today for this account",
-                "you've reached your maximum number of install reports that can be downloaded today for this app",
-                "you've reached your maximum number of install reports that can be downloaded today for this account",
-                "your current subscription package doesn't include raw data reports",
-                "subscription package doesn't include raw data"
-            ]
-            
-            if any(msg in error_text for msg in skip_retry_messages):
-                print("[API] Detected API limitation. Skipping retries for this request.")
-                return None
+                # Download the body in chunks into a spooled file instead of one big string
+                resp = SpooledResponse.from_response(resp)
+        if resp.status_code == 200:
+            # Save raw data if we have all required info
+            if endpoint_type and app_id and app_name and period:
+                start_date = params.get('from', '')
+                end_date = params.get('to', '')
+                save_raw_appsflyer_data(app_id, app_name, endpoint_type, period, resp.text, start_date, end_date)
+            return resp, None, None
+        print(f"[API] Request failed with status {resp.status_code}")
+        print(f"[API] Response headers: {dict(resp.headers)}")
+        print(f"[API] Response body: {resp.text}")
+        
+        # Quota messages mean every retry today fails too - the ledger remembers them
+        refused = api_quota.quota_error(resp.text, endpoint_type_for(url))
+        if refused:
+            print("[API] Detected API limitation. Skipping retries for this request.")
+            return None, refused, None
+            
+        if resp.status_code == 429:  # Rate limit
+            try:
+                return None, None, int(resp.headers.get('Retry-After', 0))
+            except ValueError:
+                return None, None, 0
+        if resp.status_code >= 500:
+            return None, None, 0
+        # Other 4xx answers (bad dates, unknown app, bad token) come back the same on a retry
+        return None, None, None
+    except requests.exceptions.Timeout as e:
+        print(f"[API] Timeout error: {str(e)}")
+        return 'timeout', None, 0
+    except requests.exceptions.RequestException as e:
+        print(f"[API] Request error: {str(e)}")
+        if hasattr(e, 'response') and e.response is not None:
+            print(f"[API] Exception response headers: {dict(e.response.headers)}")
+            print(f"[API] Exception response body: {e.response.text}")
+        return None, None, 0
+
+def _retry_key(url, params):
+    return f"{url}|{params.get('from', '')}|{params.get('to', '')}"
+
+def _schedule_retry(url, params, attempt, max_retries, retry_delay, retry_after, endpoint_type, app_id, app_name, period):
+    """Hand a failed fetch to the retry scheduler; returns what the caller of make_api_request gets now"""
+    if not endpoint_type:
+        # Nothing would pick up the result of a deferred retry
+        print(f"[API] Not retrying {url} - its result is not saved")
+        return None
+    if attempt + 1 >= max_retries:
+        print(f"[API] Giving up on {url} after {max_retries} attempts")
+        return None
+    delay = backoff_delay(attempt, retry_delay, retry_after)
+    print(f"[API] Retrying {url} in {delay:.1f}s in the background (attempt {attempt + 2}/{max_retries})")
+    retries.schedule(_retry_key(url, params), delay, retry_raw_fetch,
+                     url, params, attempt + 1, max_retries, retry_delay, app_id, app_name, period)
+    return 'timeout'
+
+def retry_raw_fetch(url, params, attempt, max_retries, retry_delay, app_id, app_name, period):
+    """Deferred retry of a failed endpoint fetch - run by the retry scheduler (RQ delayed job or local timer)"""
+    retries.done(_retry_key(url, params))
+    resp = make_api_request(url, params, max_retries=max_retries, retry_delay=retry_delay,
+                            app_id=app_id, app_name=app_name, period=period, attempt=attempt)
+    if resp is not None and resp != 'timeout':
+        print(f"[API] Background retry of {url} succeeded - stored for the next dashboard run")
+    return resp is not None and resp != 'timeout'
+
+def _stats_entry(app, table, selected, errors):
+    return {
+        'app_id': app['app_id'],
+        'app_name': app['app_name'],
+        'table': table,
+        'selected_events': selected,
+        'traffic': sum(r['impressions'] + r['clicks'] for r in table),
+        'errors': errors
+    }
+
+def fetch_app_stats(app, period, start_date, end_date, selected_events):
+    """
+    Stats table for a single app, fetching only the days that are still open.
+
+    Closed days come from day_partitions; the trailing open days are fetched with
+    fetch_app_stats_range and stored as new partitions when the fetch was complete.
+    Returns (entry, outcome) like fetch_app_stats_range.
+    """
+    app_id = app['app_id']
+    selected = selected_events.get(app_id, [])
+    variant = json.dumps(selected)
+    conn = db.connect(DB_PATH)
+    fetch_from, closed_rows = day_partitions.plan_refresh(conn, 'stats', app_id, variant, start_date, end_date)
+    conn.close()
+    if fetch_from is None:
+        print(f"[STATS] All days {start_date} to {end_date} are closed for {app_id} - using stored days")
+        return _stats_entry(app, closed_rows, selected, []), 'processed'
+    if fetch_from != start_date:
+        print(f"[STATS] Days before {fetch_from} are closed for {app_id} - fetching {fetch_from} to {end_date} only")
+    
+    entry, outcome = fetch_app_stats_range(app, period, fetch_from, end_date, selected_events)
+    if entry is None or outcome == 'skipped':
+        return entry, outcome
+    fetched = entry['table']
+    complete = not entry.get('errors') and not (entry.get('error') and entry['error'] != 'No data returned from API')
+    if complete:
+        conn = db.connect(DB_PATH)
+        day_partitions.store_days(conn, 'stats', app_id, variant, fetch_from, end_date, fetched)
+        conn.commit()
+        conn.close()
+    if not closed_rows:
+        return entry, outcome
+    return _stats_entry(app, closed_rows + fetched, selected, entry.get('errors', [])), 'processed'
+
+def fetch_app_stats_range(app, period, start_date, end_date, selected_events):
+    """
+    Fetch and aggregate the stats table for a single app.
+
+    The daily report is fetched first because it gates the rest of the app;
+    the remaining raw-data endpoints are then fanned out concurrently.
+
+    Returns:
+        (entry, outcome) where entry is the stats dict for the app (or None if
+        the app should be left out) and outcome is 'processed', 'skipped' or None.
+    """
+    app_id = app['app_id']
+    app_name = app['app_name']
+    print(f"[STATS] Fetching stats for app: {app_name} (App ID: {app_id})...")
+    
+    timeout_count = 0
+    app_errors = []
+    
+    # Use the aggregate daily report endpoint for main stats
+    url = appsflyer.url(app_id, 'daily_report')
+    params = {"from": start_date, "to": end_date}
+    
+    try:
+        print(f"[STATS] Calling daily_report API for {app_id}...")
+        resp = make_api_request(url, params, app_id=app_id, app_name=app_name, period=period)
+        if resp == 'timeout':
+            print(f"[STATS] Timeout detected for daily_report {app_id}, continuing with other APIs...")
+            timeout_count += 1
+            app_errors.append("Daily Report API timeout")
+        selected = selected_events.get(app_id, [])
+        daily_stats = metrics_store.DailyStats(events=selected)
+        
+        if resp and resp != 'timeout' and resp.status_code == 200:
+            print(f"[STATS] Got daily_report for {app_id}.")
+            header, data_rows = open_csv(resp)
+            first_row = next(data_rows, None)
+            if header is None or first_row is None:  # Only header or empty
+                print(f"[STATS] No data returned for {app_id}")
+                return {
+                    'app_id': app_id,
+                    'app_name': app_name,
+                    'table': [],
+                    'selected_events': [],
+                    'traffic': 0,
+                    'error': 'No data returned from API'
+                }, None
+            print(f"[STATS] daily_report header for {app_id}: {header}")
+            data_rows = itertools.chain([first_row], data_rows)
+            columns = csv_schema.resolve('daily_report', header)
+            impressions_idx = columns['impressions']
+            clicks_idx = columns['clicks']
+            installs_idx = columns['installs']
+            date_idx = columns['date']
+            media_source_idx = columns['media_source']
+            if None in [impressions_idx, clicks_idx, installs_idx, date_idx]:
+                print(f"[STATS] WARNING: Could not find all required columns for {app_id}")
+                return None, None
+            if media_source_idx is None:
+                print(f"[STATS] WARNING: Could not find media source column for {app_id}. Skipping all installs for safety.")
+                return None, None
+            for row in data_rows:
+                if len(row) <= max(impressions_idx, clicks_idx, installs_idx, date_idx, media_source_idx):
+                    continue
+                media_source = row[media_source_idx].strip().lower()
+                date = row[date_idx] if date_idx is not None and len(row) > date_idx else ''
+                if not date:
+                    continue
+                impressions = int(row[impressions_idx]) if impressions_idx is not None and len(row) > impressions_idx and row[impressions_idx].isdigit() else 0
+                clicks = int(row[clicks_idx]) if clicks_idx is not None and len(row) > clicks_idx and row[clicks_idx].isdigit() else 0
+                installs = int(row[installs_idx]) if installs_idx is not None and len(row) > installs_idx and row[installs_idx].isdigit() else 0
                 
-            if resp.status_code == 429:  # Rate limit
-                retry_after = int(resp.headers.get('Retry-After', retry_delay))
-                print(f"[API] Rate limited. Waiting {retry_after} seconds...")
-                time.sleep(retry_after)
-                continue
-            if attempt < max_retries - 1:
-                print(f"[API] Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-        except requests.exceptions.Timeout as e:
-            print(f"[API] Timeout error: {str(e)}")
-            return 'timeout'
-        except requests.exceptions.RequestException as e:
-            print(f"[API] Request error: {str(e)}")
-            if hasattr(e, 'response') and e.response is not None:
-                print(f"[API] Exception response headers: {dict(e.response.headers)}")
-                print(f"[API] Exception response body: {e.response.text}")
-            if attempt < max_retries - 1:
-                print(f"[API] Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-    return None
+                # Organic installs are tracked separately and left out of the reported installs
+                daily_stats.add_row(date, impressions, clicks, installs, organic=media_source == 'organic')
+        else:
+            print(f"[STATS] daily_report API error for {app_id}: {resp.status_code if resp and resp != 'timeout' else 'No response'}")
+            return None, None
+        
+        # In-App Events (for selected events)
+        # Helper to detect error events
+        def is_error_event(ev):
+            if not ev: return True
+            evl = ev.lower()
+            return (
+                'maximum nu' in evl or
+                'subscription' in evl or
+                'error' in evl or
+                'failed' in evl or
+                "doesn't include" in evl or
+                'not include' in evl or
+                'your current subscription pack' in evl
+            )
+        # Only fetch in-app events if there are real events
+        real_events = [ev for ev in selected if ev and not is_error_event(ev)]
+        
+        # The raw-data endpoints are independent of each other - fetch them concurrently
+        raw_params = {"from": start_date, "to": end_date}
+        raw_kwargs = {'app_id': app_id, 'app_name': app_name, 'period': period}
+        calls = {
+            # Installs Report (for raw data export)
+            'installs_report': (make_api_request, (appsflyer.url(app_id, 'installs_report'), raw_params), raw_kwargs),
+            # Blocked Installs (RT)
+            'blocked_installs_report': (make_api_request, (appsflyer.url(app_id, 'blocked_installs_report'), raw_params), raw_kwargs),
+            # Blocked Installs (PA)
+            'detection': (make_api_request, (appsflyer.url(app_id, 'detection'), raw_params), raw_kwargs),
+        }
+        if real_events:
+            print(f"[STATS] Calling in_app_events_report API for {app_id} (events: {real_events})...")
+            calls['in_app_events_report'] = (make_api_request, (appsflyer.url(app_id, 'in_app_events_report'), raw_params), raw_kwargs)
+        else:
+            print(f"[STATS] Skipping in_app_events_report API for {app_id} (no real events)")
+        print(f"[STATS] Calling {', '.join(calls)} APIs for {app_id} concurrently...")
+        responses = fetch_endpoints(calls)
+        
+        installs_resp = responses.get('installs_report')
+        if installs_resp == 'timeout':
+            print(f"[STATS] Timeout detected for installs_report {app_id}, continuing with other APIs...")
+            timeout_count += 1
+            app_errors.append("Installs Report API timeout")
+        
+        blocked_rt_resp = responses.get('blocked_installs_report')
+        if blocked_rt_resp == 'timeout':
+            print(f"[STATS] Timeout detected for blocked_installs_report {app_id}, continuing with other APIs...")
+            timeout_count += 1
+            app_errors.append("Blocked Installs (RT) API timeout")
+        
+        # Process Blocked Installs (RT) data
+        if blocked_rt_resp and blocked_rt_resp != 'timeout' and blocked_rt_resp.status_code == 200:
+            header, rows = open_csv(blocked_rt_resp)
+            if header is not None:
+                date_idx = csv_schema.resolve('blocked_installs_report', header)['time']
+                if date_idx is not None:
+                    daily_stats.add_counts("blocked_installs_rt", count_by_key(rows, date_idx))
+
+        blocked_pa_resp = responses.get('detection')
+        if blocked_pa_resp == 'timeout':
+            print(f"[STATS] Timeout detected for detection API {app_id}, continuing with other APIs...")
+            timeout_count += 1
+            app_errors.append("Blocked Installs (PA) API timeout")
+        
+        # Process Blocked Installs (PA) data
+        if blocked_pa_resp and blocked_pa_resp != 'timeout' and blocked_pa_resp.status_code == 200:
+            header, rows = open_csv(blocked_pa_resp)
+            if header is not None:
+                date_idx = csv_schema.resolve('detection', header)['time']
+                if date_idx is not None:
+                    daily_stats.add_counts("blocked_installs_pa", count_by_key(rows, date_idx))
+
+        if real_events:
+            events_resp = responses.get('in_app_events_report')
+            if events_resp and events_resp != 'timeout' and events_resp.status_code == 200:
+                event_header, event_rows = open_csv(events_resp)
+                event_columns = csv_schema.resolve('in_app_events_report', event_header or [])
+                event_name_index = event_columns['event_name']
+                event_time_index = event_columns['time']
+                if event_name_index is not None and event_time_index is not None:
+                    # Aggregate per (date, event) while streaming - the report itself is never held in memory
+                    event_counts = count_by_key(event_rows, event_time_index, event_name_idx=event_name_index, event_names=set(real_events))
+                    daily_stats.add_event_counts(event_counts)
+            else:
+                print(f"[STATS] in_app_events_report API error for {app_id}: {events_resp.status_code if events_resp and events_resp != 'timeout' else 'No response'}")
+        # Prepare daily stats for frontend, skipping dates that have no stats data
+        table = daily_stats.rows(skip_empty=True)
+        # Determine if we should skip this app entirely
+        if timeout_count >= 3:  # All 3 main API calls timed out
+            print(f"[STATS] Skipping app {app_name} ({app_id}) - all API calls timed out")
+            return None, 'skipped'
+            
+        print(f"[STATS] Successfully processed app {app_name} ({app_id}) with {timeout_count} timeouts")
+        
+        return {
+            'app_id': app_id,
+            'app_name': app_name,
+            'table': table,
+            'selected_events': selected,
+            'traffic': sum(r['impressions'] + r['clicks'] for r in table),
+            'errors': app_errors
+        }, 'processed'
+    except Exception as e:
+        print(f"[STATS] Error for app {app_id}: {e}")
+        return {
+            'app_id': app_id,
+            'app_name': app_name,
+            'table': [],
+            'selected_events': [],
+            'traffic': 0,
+            'error': str(e)
+        }, 'skipped'
+
+def stats_cache_key(apps, period, selected_events):
+    """Unique cache key for a stats report: period:event1:event2:app_ids"""
+    app_ids = '-'.join(sorted([app['app_id'] for app in apps]))
+    event1 = ''
+    event2 = ''
+    if apps and selected_events:
+        first_app_id = apps[0]['app_id']
+        events = selected_events.get(first_app_id, [])
+        if len(events) > 0:
+            event1 = events[0] or ''
+        if len(events) > 1:
+            event2 = events[1] or ''
+    return f"{period}:{event1}:{event2}:{app_ids}"
 
 @app.route('/all-apps-stats', methods=['POST'])
 @login_required
@@ -811,277 +1300,38 @@ def all_apps_stats():
     
     stats_list = []
     
-    # Build a unique cache key for stats: period:event1:event2:app_ids
-    app_ids = '-'.join(sorted([app['app_id'] for app in active_apps]))
-    event1 = ''
-    event2 = ''
-    if active_apps and selected_events:
-        first_app_id = active_apps[0]['app_id']
-        events = selected_events.get(first_app_id, [])
-        if len(events) > 0:
-            event1 = events[0] or ''
-        if len(events) > 1:
-            event2 = events[1] or ''
-    cache_key = f"{period}:{event1}:{event2}:{app_ids}"
+    cache_key = stats_cache_key(active_apps, period, selected_events)
     # Check cache
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect(DB_PATH)
     c = conn.cursor()
-    c.execute('SELECT data, updated_at FROM stats_cache WHERE range = ?', (cache_key,))
-    row = c.fetchone()
+    row = metrics_store.find_run(conn, STATS, cache_key)
     if row:
-        data, updated_at = row
-        result = json.loads(data)
+        result = metrics_store.load_run(conn, STATS, cache_key)
         # Only use cache if it contains at least one app
         if result.get('apps') and len(result['apps']) > 0:
-            result['updated_at'] = updated_at
+            result['updated_at'] = row[1]
             conn.close()
             return jsonify(result)
     
-    for app in active_apps:
-        app_id = app['app_id']
-        app_name = app['app_name']
-        print(f"[STATS] Fetching stats for app: {app_name} (App ID: {app_id})...")
-        
-        timeout_count = 0
-        app_errors = []
-        
-        # Use the aggregate daily report endpoint for main stats
-        url = f"https://hq1.appsflyer.com/api/agg-data/export/app/{app_id}/daily_report/v5"
-        params = {"from": start_date, "to": end_date}
-        
-        try:
-            print(f"[STATS] Calling daily_report API for {app_id}...")
-            resp = make_api_request(url, params, app_id=app_id, app_name=app_name, period=period)
-            if resp == 'timeout':
-                print(f"[STATS] Timeout detected for daily_report {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Daily Report API timeout")
-            daily_stats = {}
-            
-            if resp and resp.status_code == 200:
-                print(f"[STATS] Got daily_report for {app_id}.")
-                rows = resp.text.strip().split("\n")
-                if len(rows) < 2:  # Only header or empty
-                    print(f"[STATS] No data returned for {app_id}")
-                    stats_list.append({
-                        'app_id': app_id,
-                        'app_name': app_name,
-                        'table': [],
-                        'selected_events': [],
-                        'traffic': 0,
-                        'error': 'No data returned from API'
-                    })
-                    continue
-                header = rows[0].split(",")
-                print(f"[STATS] daily_report header for {app_id}: {header}")
-                data_rows = [row.split(",") for row in rows[1:]]
-                # Case-insensitive column mapping
-                col_map = {col.lower().strip(): i for i, col in enumerate(header)}
-                def find_col(*names):
-                    for name in names:
-                        for col in header:
-                            if col.lower().replace('_','').replace(' ','') == name.lower().replace('_','').replace(' ',''):
-                                return header.index(col)
-                    return None
-                impressions_idx = find_col('impressions', 'Impressions')
-                clicks_idx = find_col('clicks', 'Clicks')
-                installs_idx = find_col('installs', 'Installs')
-                date_idx = find_col('date', 'Date')
-                media_source_idx = find_col('media_source', 'media source', 'Media Source', 'Media Source (pid)', 'media_source (pid)', 'pid', 'Media Source (PID)', 'media_source (PID)')
-                if None in [impressions_idx, clicks_idx, installs_idx, date_idx]:
-                    print(f"[STATS] WARNING: Could not find all required columns for {app_id}")
-                    continue
-                if media_source_idx is None:
-                    print(f"[STATS] WARNING: Could not find media source column for {app_id}. Skipping all installs for safety.")
-                    continue
-                for row in data_rows:
-                    if len(row) <= max(impressions_idx, clicks_idx, installs_idx, date_idx, media_source_idx):
-                        continue
-                    media_source = row[media_source_idx].strip().lower()
-                    date = row[date_idx] if date_idx is not None and len(row) > date_idx else ''
-                    if not date:
-                        continue
-                    impressions = int(row[impressions_idx]) if impressions_idx is not None and len(row) > impressions_idx and row[impressions_idx].isdigit() else 0
-                    clicks = int(row[clicks_idx]) if clicks_idx is not None and len(row) > clicks_idx and row[clicks_idx].isdigit() else 0
-                    installs = int(row[installs_idx]) if installs_idx is not None and len(row) > installs_idx and row[installs_idx].isdigit() else 0
-                    
-                    # Initialize daily stats if not exists
-                    daily_stats.setdefault(date, {"impressions": 0, "clicks": 0, "total_installs": 0, "organic_installs": 0})
-                    
-                    # Add to totals
-                    daily_stats[date]["impressions"] += impressions
-                    daily_stats[date]["clicks"] += clicks
-                    daily_stats[date]["total_installs"] += installs
-                    
-                    # Track organic installs separately
-                    if media_source == 'organic':
-                        daily_stats[date]["organic_installs"] += installs
-                
-                # After processing all rows, calculate non-organic installs
-                for date in daily_stats:
-                    daily_stats[date]["installs"] = daily_stats[date]["total_installs"] - daily_stats[date]["organic_installs"]
-                    if daily_stats[date]["installs"] < 0:
-                        daily_stats[date]["installs"] = 0  # Prevent negative installs
-            else:
-                print(f"[STATS] daily_report API error for {app_id}: {resp.status_code if resp else 'No response'}")
-                continue
-            # Installs Report (for raw data export)
-            print(f"[STATS] Calling installs_report API for {app_id}...")
-            installs_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/installs_report/v5"
-            installs_params = {"from": start_date, "to": end_date}
-            installs_resp = make_api_request(installs_url, installs_params, app_id=app_id, app_name=app_name, period=period)
-            if installs_resp == 'timeout':
-                print(f"[STATS] Timeout detected for installs_report {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Installs Report API timeout")
-            
-            # Blocked Installs (RT)
-            print(f"[STATS] Calling blocked_installs_report API for {app_id}...")
-            blocked_rt_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/blocked_installs_report/v5"
-            blocked_rt_params = {"from": start_date, "to": end_date}
-            blocked_rt_resp = make_api_request(blocked_rt_url, blocked_rt_params, app_id=app_id, app_name=app_name, period=period)
-            if blocked_rt_resp == 'timeout':
-                print(f"[STATS] Timeout detected for blocked_installs_report {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Blocked Installs (RT) API timeout")
-            
-            # Process Blocked Installs (RT) data
-            if blocked_rt_resp and blocked_rt_resp.status_code == 200:
-                rows = blocked_rt_resp.text.strip().split("\n")
-                if len(rows) > 1:
-                    header = rows[0].split(",")
-                    date_idx = header.index("Install Time") if "Install Time" in header else None
-                    for row in rows[1:]:
-                        cols = row.split(",")
-                        if date_idx is not None and len(cols) > date_idx:
-                            install_date = cols[date_idx].split(" ")[0]
-                            if install_date in daily_stats:
-                                daily_stats[install_date]["blocked_installs_rt"] = daily_stats[install_date].get("blocked_installs_rt", 0) + 1
-
-            # Blocked Installs (PA)
-            print(f"[STATS] Calling detection API for {app_id}...")
-            blocked_pa_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/detection/v5"
-            blocked_pa_params = {"from": start_date, "to": end_date}
-            blocked_pa_resp = make_api_request(blocked_pa_url, blocked_pa_params, app_id=app_id, app_name=app_name, period=period)
-            if blocked_pa_resp == 'timeout':
-                print(f"[STATS] Timeout detected for detection API {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Blocked Installs (PA) API timeout")
-            
-            # Process Blocked Installs (PA) data
-            if blocked_pa_resp and blocked_pa_resp.status_code == 200:
-                rows = blocked_pa_resp.text.strip().split("\n")
-                if len(rows) > 1:
-                    header = rows[0].split(",")
-                    date_idx = header.index("Install Time") if "Install Time" in header else None
-                    for row in rows[1:]:
-                        cols = row.split(",")
-                        if date_idx is not None and len(cols) > date_idx:
-                            install_date = cols[date_idx].split(" ")[0]
-                            if install_date in daily_stats:
-                                daily_stats[install_date]["blocked_installs_pa"] = daily_stats[install_date].get("blocked_installs_pa", 0) + 1
-
-            # In-App Events (for selected events)
-            event_data = {}
-            selected = selected_events.get(app_id, [])
-            # Helper to detect error events
-            def is_error_event(ev):
-                if not ev: return True
-                evl = ev.lower()
-                return (
-                    'maximum nu' in evl or
-                    'subscription' in evl or
-                    'error' in evl or
-                    'failed' in evl or
-                    "doesn't include" in evl or
-                    'not include' in evl or
-                    'your current subscription pack' in evl
-                )
-            # Only fetch in-app events if there are real events
-            real_events = [ev for ev in selected if ev and not is_error_event(ev)]
-            if real_events:
-                print(f"[STATS] Calling in_app_events_report API for {app_id} (events: {real_events})...")
-                events_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/in_app_events_report/v5"
-                events_params = {"from": start_date, "to": end_date}
-                events_resp = make_api_request(events_url, events_params, app_id=app_id, app_name=app_name, period=period)
-                if events_resp and events_resp.status_code == 200:
-                    event_rows = events_resp.text.strip().split("\n")
-                    event_header = event_rows[0].split(",")
-                    event_name_index = event_header.index("Event Name") if "Event Name" in event_header else None
-                    event_time_index = event_header.index("Event Time") if "Event Time" in event_header else None
-                    for row in event_rows[1:]:
-                        cols = row.split(",")
-                        if event_name_index is not None and event_time_index is not None and len(cols) > max(event_name_index, event_time_index):
-                            event_name = cols[event_name_index]
-                            event_date = cols[event_time_index].split(" ")[0]
-                            if event_name in real_events:
-                                event_data.setdefault(event_name, {})
-                                event_data[event_name].setdefault(event_date, 0)
-                                event_data[event_name][event_date] += 1
-                else:
-                    print(f"[STATS] in_app_events_report API error for {app_id}: {events_resp.status_code if events_resp else 'No response'}")
-            else:
-                print(f"[STATS] Skipping in_app_events_report API for {app_id} (no real events)")
-            # Prepare daily stats for frontend
-            all_dates = sorted(daily_stats.keys())
-            table = []
-            for date in all_dates:
-                # Skip dates that have no stats data
-                if not any(daily_stats[date].get(key, 0) > 0 for key in ["impressions", "clicks", "installs", "blocked_installs_rt", "blocked_installs_pa"]):
-                    continue
-                    
-                row = {
-                    "date": date,
-                    "impressions": daily_stats[date].get("impressions", 0),
-                    "clicks": daily_stats[date].get("clicks", 0),
-                    "installs": daily_stats[date].get("installs", 0),
-                    "blocked_installs_rt": daily_stats[date].get("blocked_installs_rt", 0),
-                    "blocked_installs_pa": daily_stats[date].get("blocked_installs_pa", 0),
-                }
-                # Calculated rates
-                row["imp_to_click"] = round(row["clicks"] / row["impressions"], 2) if row["impressions"] > 0 else 0
-                row["click_to_install"] = (row["installs"] / row["clicks"]) if row["clicks"] > 0 else 0
-                row["blocked_rt_rate"] = round(row["blocked_installs_rt"] / row["installs"], 2) if row["installs"] > 0 else 0
-                row["blocked_pa_rate"] = round(row["blocked_installs_pa"] / row["installs"], 2) if row["installs"] > 0 else 0
-                # Add event counts
-                if selected:
-                    for event in selected:
-                        row[event] = event_data.get(event, {}).get(date, 0)
-                table.append(row)
-            # Determine if we should skip this app entirely
-            if timeout_count >= 3:  # All 3 main API calls timed out
-                print(f"[STATS] Skipping app {app_name} ({app_id}) - all API calls timed out")
-                skipped_apps += 1
-                continue
-                
-            print(f"[STATS] Successfully processed app {app_name} ({app_id}) with {timeout_count} timeouts")
+    # Fan out across apps - each app fans out across its endpoints in turn, and
+    # the per-host cap in make_api_request bounds the real load on AppsFlyer
+    print(f"[STATS] Fetching {total_apps} apps with up to {fetch_engine.FETCH_MAX_APPS} in parallel "
+          f"(max {fetch_engine.FETCH_PER_HOST_LIMIT} concurrent requests per host)")
+    results = map_apps(lambda app: fetch_app_stats(app, period, start_date, end_date, selected_events), active_apps)
+    for entry, outcome in results:
+        if outcome == 'processed':
             processed_apps += 1
-            
-            stats_list.append({
-                'app_id': app_id,
-                'app_name': app_name,
-                'table': table,
-                'selected_events': selected,
-                'traffic': sum(r['impressions'] + r['clicks'] for r in table),
-                'errors': app_errors
-            })
-        except Exception as e:
-            print(f"[STATS] Error for app {app_id}: {e}")
+        elif outcome == 'skipped':
             skipped_apps += 1
-            stats_list.append({
-                'app_id': app_id,
-                'app_name': app_name,
-                'table': [],
-                'selected_events': [],
-                'traffic': 0,
-                'error': str(e)
-            })
+        if entry is not None:
+            stats_list.append(entry)
     stats_list.sort(key=lambda x: x['traffic'], reverse=True)
     
     # Save to cache ONLY if there is at least one app
     if len(stats_list) > 0:
-        c.execute('REPLACE INTO stats_cache (range, data, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)', (cache_key, json.dumps({'apps': stats_list})))
+        metrics_store.write_report(conn, STATS, cache_key, stats_list)
         conn.commit()
+        hot_cache.invalidate(STATS)
         print(f"[STATS] Saved {len(stats_list)} apps to cache with key: {cache_key}")
     else:
         print(f"[STATS] No apps to cache - stats_list is empty")
@@ -1102,7 +1352,7 @@ def all_apps_stats():
 @app.route('/event-selections', methods=['GET'])
 @login_required
 def get_event_selections():
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect(DB_PATH)
     c = conn.cursor()
     try:
         c.execute('SELECT app_id, event1, event2, is_active FROM app_event_selections')
@@ -1129,7 +1379,7 @@ def save_event_selections():
     if not data:
         return jsonify({"success": False, "error": "No data provided"}), 400
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect(DB_PATH)
     c = conn.cursor()
     try:
         saved_count = 0
@@ -1167,6 +1417,7 @@ def save_event_selections():
                 saved_count += 1
         
         conn.commit()
+        hot_cache.invalidate(APPS)
         print(f"[SAVE] Successfully saved {saved_count} app configurations to database (permanent storage)")
         return jsonify({"success": True, "saved_count": saved_count})
     except Exception as e:
@@ -1224,23 +1475,23 @@ def get_stats():
         # If force, trigger a new fetch (client should call /all-apps-stats)
         if force:
             return jsonify({'error': 'Force fetch not implemented in /get_stats. Please use /all-apps-stats.'}), 400
-        # Return the most recent stats if available
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        # Use LIKE query for all ranges to ensure consistent behavior
-        c.execute("SELECT data, updated_at FROM stats_cache WHERE range LIKE ? ORDER BY updated_at DESC LIMIT 1", (f"{range_key}%",))
-        row = c.fetchone()
-        conn.close()
-        if row:
-            data, updated_at = row
-            result = json.loads(data)
-            result['updated_at'] = updated_at
-            return jsonify(result)
-        else:
-            return jsonify({'apps': [], 'updated_at': None})
+        return hot_response(f'stats:{range_key}', (STATS,), lambda: build_stats(range_key))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def build_stats(range_key):
+    # Return the most recent stats if available
+    conn = db.connect(DB_PATH)
+    # Latest run for the period, whatever its events and apps
+    row = metrics_store.latest_run(conn, STATS, range_key)
+    result = metrics_store.load_run(conn, STATS, row[0]) if row else None
+    conn.close()
+    if row:
+        result['updated_at'] = row[1]
+        return jsonify(result)
+    else:
+        return jsonify({'apps': [], 'updated_at': None})
+
 @app.route('/update-credential', methods=['POST'])
 @login_required
 def update_credential():
@@ -1416,20 +1667,221 @@ def env_status():
     
     return jsonify(status)
 
-def find_media_source_idx(header):
-    # More flexible matching for Media Source column
-    def norm(col):
-        return col.lower().replace(' ', '').replace('_', '').replace('(', '').replace(')', '')
-    # Try exact match first
-    for i, col in enumerate(header):
-        if norm(col) == 'mediasource':
-            return i
-    # Try partial match if exact match fails
-    for i, col in enumerate(header):
-        if 'media' in norm(col) and 'source' in norm(col):
-            return i
-    print(f"[FRAUD] WARNING: Could not find Media Source column in header: {header}")
-    return None
+def _fraud_entry(app, table, errors, event_row):
+    event1_name, event2_name = event_row if event_row else (None, None)
+    return {
+        'app_id': app['app_id'],
+        'app_name': app['app_name'],
+        'table': table,
+        'errors': errors,
+        'event1_name': event1_name,
+        'event2_name': event2_name
+    }
+
+def fetch_app_fraud(app, period, start_date, end_date):
+    """
+    Fraud table for a single app, fetching only the days that are still open.
+
+    Closed days come from day_partitions; the trailing open days are fetched with
+    fetch_app_fraud_range and stored as new partitions when the fetch was complete.
+    """
+    app_id = app['app_id']
+    # Get event selections for this app to fetch event1 and event2 data
+    conn = db.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute('SELECT event1, event2 FROM app_event_selections WHERE app_id = ?', (app_id,))
+    event_row = c.fetchone()
+    variant = json.dumps(list(event_row) if event_row else None)
+    fetch_from, closed_rows = day_partitions.plan_refresh(conn, 'fraud', app_id, variant, start_date, end_date)
+    conn.close()
+    if fetch_from is None:
+        print(f"[FRAUD] All days {start_date} to {end_date} are closed for {app_id} - using stored days")
+        return _fraud_entry(app, closed_rows, [], event_row), 'processed'
+    if fetch_from != start_date:
+        print(f"[FRAUD] Days before {fetch_from} are closed for {app_id} - fetching {fetch_from} to {end_date} only")
+    
+    entry, outcome = fetch_app_fraud_range(app, period, fetch_from, end_date, event_row)
+    if entry is None:
+        return entry, outcome
+    if not entry['errors']:
+        conn = db.connect(DB_PATH)
+        day_partitions.store_days(conn, 'fraud', app_id, variant, fetch_from, end_date, entry['table'])
+        conn.commit()
+        conn.close()
+    if closed_rows:
+        entry['table'] = closed_rows + entry['table']
+    return entry, outcome
+
+# Fraud raw-data endpoints counted per (date, media_source): endpoint -> (label, metric).
+# Their time and media source columns are in csv_schema.SCHEMAS.
+FRAUD_ENDPOINTS = {
+    'blocked_installs_report': ('Blocked Installs (RT)', 'blocked_installs_rt'),
+    'detection': ('Blocked Installs (PA)', 'blocked_installs_pa'),
+    'blocked_in_app_events_report': ('Blocked In-App Events', 'blocked_in_app_events'),
+    'fraud_post_inapps': ('Fraud Post-InApps', 'fraud_post_inapps'),
+    'blocked_clicks_report': ('Blocked Clicks', 'blocked_clicks'),
+    'blocked_install_postbacks': ('Blocked Install Postbacks', 'blocked_install_postbacks'),
+}
+
+def fraud_endpoint_counts(app_id, app_name, period, start_date, end_date, endpoint, label):
+    """
+    Fetch one fraud endpoint of an app and count its rows per (date, media_source).
+
+    Runs on the fetch engine's endpoint pool, so the download and the counting
+    of every endpoint overlap. Returns (counts, error) where counts is a
+    count_by_key result or None and error is 'timeout', a message or None.
+    """
+    resp = make_api_request(appsflyer.url(app_id, endpoint), {"from": start_date, "to": end_date},
+                            app_id=app_id, app_name=app_name, period=period)
+    if resp == 'timeout':
+        return None, 'timeout'
+    if resp is None:
+        print(f"[FRAUD] {label} for app {app_id}: No response received")
+        return None, None
+    if resp.status_code != 200:
+        return None, f"{label} API error: {resp.status_code} {resp.text[:200]}"
+    header, rows = open_csv(resp)
+    if header is None:
+        return None, None
+    columns = csv_schema.resolve(endpoint, header)
+    date_idx = columns['time']
+    ms_idx = columns['media_source']
+    if ms_idx is None:
+        print(f"[FRAUD] ERROR: Could not find exact 'Media Source' column in {label} for app {app_id}. Header: {header}")
+    if date_idx is None:
+        return None, None
+    return count_by_key(rows, date_idx, ms_idx, by_media_source=True), None
+
+def fraud_event_counts(app_id, app_name, period, start_date, end_date, event_keys):
+    """
+    Fetch the in-app events of an app and count the selected ones per (date, media_source, event name).
+
+    event_keys maps event names to 'event1' / 'event2'; returns (counts, error) like fraud_endpoint_counts.
+    """
+    resp = make_api_request(appsflyer.url(app_id, 'in_app_events_report'), {"from": start_date, "to": end_date},
+                            app_id=app_id, app_name=app_name, period=period)
+    if resp == 'timeout':
+        return None, 'timeout'
+    if resp is None:
+        print(f"[FRAUD] No response from in_app_events_report API for {app_id}")
+        return None, None
+    if resp.status_code != 200:
+        return None, f"In-App Events API error: {resp.status_code}"
+    # Proper CSV parsing handles quoted fields with commas; rows are aggregated while streaming
+    event_header, event_rows = open_csv(resp)
+    if event_header is None:
+        return None, None
+    event_columns = csv_schema.resolve('in_app_events_report', event_header)
+    event_name_idx = event_columns['event_name']
+    event_time_idx = event_columns['time']
+    event_ms_idx = event_columns['media_source']
+    print(f"[FRAUD] Event parsing indices - name: {event_name_idx}, time: {event_time_idx}, media_source: {event_ms_idx}")
+    if event_name_idx is None or event_time_idx is None or event_ms_idx is None:
+        print(f"[FRAUD] Could not find required columns in in_app_events_report for {app_id}")
+        return None, None
+    return count_by_key(event_rows, event_time_idx, event_ms_idx, by_media_source=True,
+                        default_media_source=None, event_name_idx=event_name_idx,
+                        event_names=event_keys), None
+
+def fetch_app_fraud_range(app, period, start_date, end_date, event_row):
+    """
+    Fetch the fraud endpoints for a single app and aggregate them per (date, media_source).
+    
+    Returns:
+        (entry, outcome) where entry is the fraud dict for the app (None when
+        every call timed out) and outcome is 'processed' or 'skipped'.
+    """
+    app_id = app['app_id']
+    app_name = app['app_name']
+    print(f"[FRAUD] Fetching fraud data for app: {app_name} (App ID: {app_id})...")
+    app_errors = []
+    timeout_count = 0
+    
+    # Aggregated by (date, media_source), totals kept as counts are added
+    fraud_table = metrics_store.FraudTable()
+    
+    # Helper function to detect error events
+    def is_error_event(ev):
+        if not ev: return True
+        evl = ev.lower()
+        return (
+            'maximum nu' in evl or
+            'subscription' in evl or
+            'error' in evl or
+            'failed' in evl or
+            "doesn't include" in evl or
+            'not include' in evl or
+            'your current subscription pack' in evl
+        )
+    
+    # event_row holds this app's (event1, event2) from app_event_selections
+    selected_events = []
+    if event_row:
+        event1, event2 = event_row
+        if event1 and event1.strip() and not is_error_event(event1):
+            selected_events.append(('event1', event1))
+        if event2 and event2.strip() and not is_error_event(event2):
+            selected_events.append(('event2', event2))
+    # event1 takes precedence if both selections name the same event
+    event_keys = {}
+    for event_key, event_value in selected_events:
+        event_keys.setdefault(event_value, event_key)
+    
+    # The endpoints are independent of each other - fetch and count them concurrently, then merge the counts
+    endpoint_args = (app_id, app_name, period, start_date, end_date)
+    calls = {
+        # Installs Report (for raw data export)
+        'installs_report': (make_api_request, (appsflyer.url(app_id, 'installs_report'), {"from": start_date, "to": end_date}),
+                            {'app_id': app_id, 'app_name': app_name, 'period': period}),
+    }
+    for endpoint, (label, _) in FRAUD_ENDPOINTS.items():
+        calls[endpoint] = (fraud_endpoint_counts, endpoint_args + (endpoint, label), {})
+    if event_keys:
+        print(f"[FRAUD] Fetching event data for {app_id} (events: {[e[1] for e in selected_events]})...")
+        calls['in_app_events_report'] = (fraud_event_counts, endpoint_args + (event_keys,), {})
+    else:
+        print(f"[FRAUD] No valid events selected for {app_id}, skipping event data collection")
+    print(f"[FRAUD] Calling {', '.join(calls)} APIs for {app_id} concurrently...")
+    results = fetch_endpoints(calls)
+    
+    if results['installs_report'] == 'timeout':
+        print(f"[FRAUD] Timeout detected for installs_report {app_id}, continuing with other APIs...")
+        timeout_count += 1
+        app_errors.append("Installs Report API timeout")
+    labels = {endpoint: label for endpoint, (label, _) in FRAUD_ENDPOINTS.items()}
+    labels['in_app_events_report'] = 'In-App Events'
+    for endpoint in [endpoint for endpoint in calls if endpoint != 'installs_report']:
+        # None: the call raised (fetch_endpoints already logged it)
+        counts, error = results[endpoint] or (None, f"{labels[endpoint]} API error: request failed")
+        if error == 'timeout':
+            print(f"[FRAUD] Timeout detected for {endpoint} {app_id}, continuing with other APIs...")
+            timeout_count += 1
+            app_errors.append(f"{labels[endpoint]} API timeout")
+        elif error:
+            print(f"[FRAUD] {error} for app {app_id}")
+            app_errors.append(error)
+        if not counts:
+            continue
+        if endpoint == 'in_app_events_report':
+            for (event_date, media_source, event_name), count in counts.items():
+                fraud_table.add(event_date, media_source, event_keys[event_name], count)
+        else:
+            records = fraud_table.add_counts(FRAUD_ENDPOINTS[endpoint][1], counts)
+            print(f"[FRAUD] {labels[endpoint]} for app {app_id}: {records} records processed")
+    
+    print(f"[FRAUD] App {app_name} totals: {fraud_table.totals}")
+    print(f"[FRAUD] Final table for {app_name} has {len(fraud_table)} rows")
+    print(f"[FRAUD] Unique media sources: {fraud_table.media_sources()}")
+    
+    # Determine if we should skip this app entirely
+    if timeout_count >= 7:  # All 7 API calls timed out (including events)
+        print(f"[FRAUD] Skipping app {app_name} ({app_id}) - all API calls timed out")
+        return None, 'skipped'
+    
+    print(f"[FRAUD] Successfully processed app {app_name} ({app_id}) with {timeout_count} timeouts")
+    
+    # Include event names for frontend display
+    return _fraud_entry(app, fraud_table.rows(), app_errors, event_row), 'processed'
 
 @app.route('/get_fraud', methods=['POST'])
 @login_required
@@ -1443,7 +1895,7 @@ def get_fraud():
         # Create a unique cache key based on period and sorted app IDs
         app_ids = '-'.join(sorted([app['app_id'] for app in active_apps]))
         cache_key = f"{period}:{app_ids}"
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         c.execute('''CREATE TABLE IF NOT EXISTS fraud_cache (
             range TEXT PRIMARY KEY,
@@ -1452,15 +1904,13 @@ def get_fraud():
         )''')
         conn.commit()
         if not force:
-            # Use LIKE query for all ranges to ensure consistent behavior
-            c.execute("SELECT data, updated_at FROM fraud_cache WHERE range LIKE ? ORDER BY updated_at DESC LIMIT 1", (f"{period}%",))
-            row = c.fetchone()
+            # Latest run for the period, whatever its events and apps
+            row = metrics_store.latest_run(conn, FRAUD, period)
             if row:
-                data, updated_at = row
-                result = json.loads(data)
+                result = metrics_store.load_run(conn, FRAUD, row[0])
                 # Only use cache if it contains at least one app
                 if result.get('apps') and len(result['apps']) > 0:
-                    result['updated_at'] = updated_at
+                    result['updated_at'] = row[1]
                     conn.close()
                     return jsonify(result)
         fraud_list = []
@@ -1470,356 +1920,21 @@ def get_fraud():
         
         print(f"[FRAUD] Starting fraud data processing for {total_apps} apps...")
         
-        for app in active_apps:
-            app_id = app['app_id']
-            app_name = app['app_name']
-            print(f"[FRAUD] Fetching fraud data for app: {app_name} (App ID: {app_id})...")
-            table = []
-            app_errors = []
-            timeout_count = 0
-            
-            # Helper: aggregate by (date, media_source)
-            agg = {}
-            def add_metric(date, media_source, key, count=1):
-                k = (date, media_source)
-                if k not in agg:
-                    agg[k] = {
-                        "date": date,
-                        "media_source": media_source,
-                        "blocked_installs_rt": 0,
-                        "blocked_installs_pa": 0,
-                        "blocked_in_app_events": 0,
-                        "fraud_post_inapps": 0,
-                        "blocked_clicks": 0,
-                        "blocked_install_postbacks": 0,
-                        "event1": 0,
-                        "event2": 0
-                    }
-                agg[k][key] += count
-            
-            # Installs Report (for raw data export)
-            print(f"[FRAUD] Calling installs_report API for {app_id}...")
-            installs_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/installs_report/v5"
-            installs_params = {"from": start_date, "to": end_date}
-            installs_resp = make_api_request(installs_url, installs_params, app_id=app_id, app_name=app_name, period=period)
-            if installs_resp == 'timeout':
-                print(f"[FRAUD] Timeout detected for installs_report {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Installs Report API timeout")
-            
-            # Blocked Installs (RT)
-            blocked_rt_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/blocked_installs_report/v5"
-            blocked_rt_params = {"from": start_date, "to": end_date}
-            blocked_rt_resp = make_api_request(blocked_rt_url, blocked_rt_params, app_id=app_id, app_name=app_name, period=period)
-            if blocked_rt_resp == 'timeout':
-                print(f"[FRAUD] Timeout detected for blocked_installs_report {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Blocked Installs (RT) API timeout")
-            if blocked_rt_resp and blocked_rt_resp.status_code == 200:
-                rt_text = blocked_rt_resp.text.strip()
-                if rt_text:
-                    import io
-                    csv_reader = csv.reader(io.StringIO(rt_text))
-                    rows = list(csv_reader)
-                    print(f"[FRAUD] Blocked Installs (RT) for app {app_id}: {len(rows)} rows received")
-                    if len(rows) > 1:
-                        header = rows[0]
-                        print(f"[FRAUD] Blocked Installs (RT) header: {header}")
-                        date_idx = header.index("Install Time") if "Install Time" in header else None
-                        ms_idx = find_media_source_idx(header)
-                        print(f"[FRAUD] Blocked Installs (RT) indices - date_idx: {date_idx}, ms_idx: {ms_idx}")
-                        if ms_idx is None:
-                            print(f"[FRAUD] ERROR: Could not find exact 'Media Source' column in Blocked Installs (RT) for app {app_id}. Header: {header}")
-                        rt_count = 0
-                        for row in rows[1:]:
-                            if date_idx is not None and len(row) > date_idx:
-                                install_date = row[date_idx].split(" ")[0]
-                                media_source = row[ms_idx].strip() if ms_idx is not None and len(row) > ms_idx else "Unknown"
-                                add_metric(install_date, media_source, "blocked_installs_rt")
-                                rt_count += 1
-                        print(f"[FRAUD] Blocked Installs (RT) for app {app_id}: {rt_count} records processed")
-                    else:
-                        print(f"[FRAUD] Blocked Installs (RT) for app {app_id}: No data rows (header only)")
-            elif blocked_rt_resp is not None:
-                print(f"[FRAUD] Blocked Installs (RT) API error for app {app_id}: {blocked_rt_resp.status_code} {blocked_rt_resp.text[:200]}")
-                app_errors.append(f"Blocked Installs (RT) API error: {blocked_rt_resp.status_code} {blocked_rt_resp.text[:200]}")
+        print(f"[FRAUD] Fetching {total_apps} apps with up to {fetch_engine.FETCH_MAX_APPS} in parallel "
+              f"(max {fetch_engine.FETCH_PER_HOST_LIMIT} concurrent requests per host)")
+        results = map_apps(lambda app: fetch_app_fraud(app, period, start_date, end_date), active_apps)
+        for entry, outcome in results:
+            if outcome == 'skipped':
+                skipped_apps += 1
             else:
-                print(f"[FRAUD] Blocked Installs (RT) for app {app_id}: No response received")
-            # Blocked Installs (PA)
-            blocked_pa_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/detection/v5"
-            blocked_pa_params = {"from": start_date, "to": end_date}
-            blocked_pa_resp = make_api_request(blocked_pa_url, blocked_pa_params, app_id=app_id, app_name=app_name, period=period)
-            if blocked_pa_resp == 'timeout':
-                print(f"[FRAUD] Timeout detected for detection API {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Blocked Installs (PA) API timeout")
-            if blocked_pa_resp and blocked_pa_resp.status_code == 200:
-                pa_text = blocked_pa_resp.text.strip()
-                if pa_text:
-                    import io
-                    csv_reader = csv.reader(io.StringIO(pa_text))
-                    rows = list(csv_reader)
-                    if len(rows) > 1:
-                        header = rows[0]
-                        date_idx = header.index("Install Time") if "Install Time" in header else None
-                        ms_idx = find_media_source_idx(header)
-                        if ms_idx is None:
-                            print(f"[FRAUD] ERROR: Could not find exact 'Media Source' column in Blocked Installs (PA) for app {app_id}. Header: {header}")
-                        for row in rows[1:]:
-                            if date_idx is not None and len(row) > date_idx:
-                                install_date = row[date_idx].split(" ")[0]
-                                media_source = row[ms_idx].strip() if ms_idx is not None and len(row) > ms_idx else "Unknown"
-                                add_metric(install_date, media_source, "blocked_installs_pa")
-            elif blocked_pa_resp is not None:
-                app_errors.append(f"Blocked Installs (PA) API error: {blocked_pa_resp.status_code} {blocked_pa_resp.text[:200]}")
-            # Blocked In-App Events
-            blocked_events_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/blocked_in_app_events_report/v5"
-            blocked_events_params = {"from": start_date, "to": end_date}
-            blocked_events_resp = make_api_request(blocked_events_url, blocked_events_params, app_id=app_id, app_name=app_name, period=period)
-            if blocked_events_resp == 'timeout':
-                print(f"[FRAUD] Timeout detected for blocked_in_app_events_report {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Blocked In-App Events API timeout")
-            if blocked_events_resp and blocked_events_resp.status_code == 200:
-                events_text = blocked_events_resp.text.strip()
-                if events_text:
-                    import io
-                    csv_reader = csv.reader(io.StringIO(events_text))
-                    rows = list(csv_reader)
-                    if len(rows) > 1:
-                        header = rows[0]
-                        date_idx = header.index("Event Time") if "Event Time" in header else None
-                        ms_idx = find_media_source_idx(header)
-                        if ms_idx is None:
-                            print(f"[FRAUD] ERROR: Could not find exact 'Media Source' column in Blocked In-App Events for app {app_id}. Header: {header}")
-                        for row in rows[1:]:
-                            if date_idx is not None and len(row) > date_idx:
-                                event_date = row[date_idx].split(" ")[0]
-                                media_source = row[ms_idx].strip() if ms_idx is not None and len(row) > ms_idx else "Unknown"
-                                add_metric(event_date, media_source, "blocked_in_app_events")
-            elif blocked_events_resp is not None:
-                app_errors.append(f"Blocked In-App Events API error: {blocked_events_resp.status_code} {blocked_events_resp.text[:200]}")
-            # Fraud Post Inapps
-            fraud_post_inapps_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/fraud-post-inapps/v5"
-            fraud_post_inapps_params = {"from": start_date, "to": end_date}
-            fraud_post_inapps_resp = make_api_request(fraud_post_inapps_url, fraud_post_inapps_params, app_id=app_id, app_name=app_name, period=period)
-            if fraud_post_inapps_resp == 'timeout':
-                print(f"[FRAUD] Timeout detected for fraud-post-inapps {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Fraud Post-InApps API timeout")
-            if fraud_post_inapps_resp and fraud_post_inapps_resp.status_code == 200:
-                fraud_text = fraud_post_inapps_resp.text.strip()
-                if fraud_text:
-                    import io
-                    csv_reader = csv.reader(io.StringIO(fraud_text))
-                    rows = list(csv_reader)
-                    if len(rows) > 1:
-                        header = rows[0]
-                        date_idx = header.index("Event Time") if "Event Time" in header else None
-                        ms_idx = find_media_source_idx(header)
-                        if ms_idx is None:
-                            print(f"[FRAUD] ERROR: Could not find exact 'Media Source' column in Fraud Post InApps for app {app_id}. Header: {header}")
-                        for row in rows[1:]:
-                            if date_idx is not None and len(row) > date_idx:
-                                event_date = row[date_idx].split(" ")[0]
-                                media_source = row[ms_idx].strip() if ms_idx is not None and len(row) > ms_idx else "Unknown"
-                                add_metric(event_date, media_source, "fraud_post_inapps")
-            elif fraud_post_inapps_resp is not None:
-                app_errors.append(f"Fraud Post-InApps API error: {fraud_post_inapps_resp.status_code} {fraud_post_inapps_resp.text[:200]}")
-            # Blocked Clicks
-            blocked_clicks_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/blocked_clicks_report/v5"
-            blocked_clicks_params = {"from": start_date, "to": end_date}
-            blocked_clicks_resp = make_api_request(blocked_clicks_url, blocked_clicks_params, app_id=app_id, app_name=app_name, period=period)
-            if blocked_clicks_resp == 'timeout':
-                print(f"[FRAUD] Timeout detected for blocked_clicks_report {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Blocked Clicks API timeout")
-            if blocked_clicks_resp and blocked_clicks_resp.status_code == 200:
-                clicks_text = blocked_clicks_resp.text.strip()
-                if clicks_text:
-                    import io
-                    csv_reader = csv.reader(io.StringIO(clicks_text))
-                    rows = list(csv_reader)
-                    if len(rows) > 1:
-                        header = rows[0]
-                        date_idx = header.index("Click Time") if "Click Time" in header else None
-                        ms_idx = find_media_source_idx(header)
-                        if ms_idx is None:
-                            print(f"[FRAUD] ERROR: Could not find exact 'Media Source' column in Blocked Clicks for app {app_id}. Header: {header}")
-                        for row in rows[1:]:
-                            if date_idx is not None and len(row) > date_idx:
-                                click_date = row[date_idx].split(" ")[0]
-                                media_source = row[ms_idx].strip() if ms_idx is not None and len(row) > ms_idx else "Unknown"
-                                add_metric(click_date, media_source, "blocked_clicks")
-            elif blocked_clicks_resp is not None:
-                app_errors.append(f"Blocked Clicks API error: {blocked_clicks_resp.status_code} {blocked_clicks_resp.text[:200]}")
-            # Blocked Install Postbacks
-            blocked_postbacks_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/blocked_install_postbacks/v5"
-            blocked_postbacks_params = {"from": start_date, "to": end_date}
-            blocked_postbacks_resp = make_api_request(blocked_postbacks_url, blocked_postbacks_params, app_id=app_id, app_name=app_name, period=period)
-            if blocked_postbacks_resp == 'timeout':
-                print(f"[FRAUD] Timeout detected for blocked_install_postbacks {app_id}, continuing with other APIs...")
-                timeout_count += 1
-                app_errors.append("Blocked Install Postbacks API timeout")
-            if blocked_postbacks_resp and blocked_postbacks_resp.status_code == 200:
-                postbacks_text = blocked_postbacks_resp.text.strip()
-                if postbacks_text:
-                    import io
-                    csv_reader = csv.reader(io.StringIO(postbacks_text))
-                    rows = list(csv_reader)
-                    if len(rows) > 1:
-                        header = rows[0]
-                        date_idx = header.index("Install Time") if "Install Time" in header else None
-                        ms_idx = find_media_source_idx(header)
-                        if ms_idx is None:
-                            print(f"[FRAUD] ERROR: Could not find exact 'Media Source' column in Blocked Install Postbacks for app {app_id}. Header: {header}")
-                        for row in rows[1:]:
-                            if date_idx is not None and len(row) > date_idx:
-                                install_date = row[date_idx].split(" ")[0]
-                                media_source = row[ms_idx].strip() if ms_idx is not None and len(row) > ms_idx else "Unknown"
-                                add_metric(install_date, media_source, "blocked_install_postbacks")
-            elif blocked_postbacks_resp is not None:
-                app_errors.append(f"Blocked Install Postbacks API error: {blocked_postbacks_resp.status_code} {blocked_postbacks_resp.text[:200]}")
-            
-            # Helper function to detect error events
-            def is_error_event(ev):
-                if not ev: return True
-                evl = ev.lower()
-                return (
-                    'maximum nu' in evl or
-                    'subscription' in evl or
-                    'error' in evl or
-                    'failed' in evl or
-                    "doesn't include" in evl or
-                    'not include' in evl or
-                    'your current subscription pack' in evl
-                )
-            
-            # Get event selections for this app to fetch event1 and event2 data
-            conn_temp = sqlite3.connect(DB_PATH)
-            c_temp = conn_temp.cursor()
-            c_temp.execute('SELECT event1, event2 FROM app_event_selections WHERE app_id = ?', (app_id,))
-            event_row = c_temp.fetchone()
-            conn_temp.close()
-            
-            selected_events = []
-            if event_row:
-                event1, event2 = event_row
-                if event1 and event1.strip() and not is_error_event(event1):
-                    selected_events.append(('event1', event1))
-                if event2 and event2.strip() and not is_error_event(event2):
-                    selected_events.append(('event2', event2))
-            
-            # Fetch event1 and event2 data per media source
-            if selected_events:
-                print(f"[FRAUD] Fetching event data for {app_id} (events: {[e[1] for e in selected_events]})...")
-                events_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/in_app_events_report/v5"
-                events_params = {"from": start_date, "to": end_date}
-                events_resp = make_api_request(events_url, events_params, app_id=app_id, app_name=app_name, period=period)
-                
-                if events_resp == 'timeout':
-                    print(f"[FRAUD] Timeout detected for in_app_events_report {app_id}, continuing...")
-                    timeout_count += 1
-                    app_errors.append("In-App Events API timeout")
-                elif events_resp and events_resp.status_code == 200:
-                    event_text = events_resp.text.strip()
-                    if event_text:
-                        import io
-                        # Use proper CSV parsing to handle quoted fields with commas
-                        csv_reader = csv.reader(io.StringIO(event_text))
-                        event_rows = list(csv_reader)
-                        
-                        if len(event_rows) > 1:
-                            event_header = event_rows[0]
-                            event_name_idx = event_header.index("Event Name") if "Event Name" in event_header else None
-                            event_time_idx = event_header.index("Event Time") if "Event Time" in event_header else None
-                            event_ms_idx = find_media_source_idx(event_header)
-                            
-                            print(f"[FRAUD] In-app events CSV header: {event_header}")
-                            print(f"[FRAUD] Event parsing indices - name: {event_name_idx}, time: {event_time_idx}, media_source: {event_ms_idx}")
-                            
-                            if event_name_idx is not None and event_time_idx is not None and event_ms_idx is not None:
-                                for row in event_rows[1:]:
-                                    if len(row) > max(event_name_idx, event_time_idx, event_ms_idx):
-                                        event_name = row[event_name_idx]
-                                        event_date = row[event_time_idx].split(" ")[0]
-                                        media_source = row[event_ms_idx].strip()
-                                        
-                                        # Debug logging for media source extraction
-                                        print(f"[FRAUD] Event: {event_name}, Date: {event_date}, Media Source: '{media_source}'")
-                                        
-                                        # Check if this event matches event1 or event2
-                                        for event_key, event_value in selected_events:
-                                            if event_name == event_value:
-                                                add_metric(event_date, media_source, event_key)
-                                                print(f"[FRAUD] Added {event_key} event for media source: '{media_source}'")
-                                                break
-                        else:
-                            print(f"[FRAUD] Could not find required columns in in_app_events_report for {app_id}")
-                            if event_name_idx is None:
-                                print(f"[FRAUD] Event Name column not found in header: {event_header}")
-                            if event_time_idx is None:
-                                print(f"[FRAUD] Event Time column not found in header: {event_header}")
-                            if event_ms_idx is None:
-                                print(f"[FRAUD] Media Source column not found in header: {event_header}")
-                elif events_resp is not None:
-                    print(f"[FRAUD] In-App Events API error for {app_id}: {events_resp.status_code}")
-                    app_errors.append(f"In-App Events API error: {events_resp.status_code}")
-                else:
-                    print(f"[FRAUD] No response from in_app_events_report API for {app_id}")
-            else:
-                print(f"[FRAUD] No valid events selected for {app_id}, skipping event data collection")
-            
-            # Aggregate all (date, media_source) rows
-            for (date, media_source), row in sorted(agg.items()):
-                # Include all rows, even if all metrics are zero
-                print(f"[FRAUD] Adding row for media source: {media_source} on date: {date}")
-                print(f"[FRAUD] Row metrics: {row}")
-                table.append(row)
-                
-            # Debug: Print app totals
-            app_totals = {
-                'blocked_installs_rt': sum(row.get('blocked_installs_rt', 0) for row in table),
-                'blocked_installs_pa': sum(row.get('blocked_installs_pa', 0) for row in table),
-                'blocked_in_app_events': sum(row.get('blocked_in_app_events', 0) for row in table),
-                'fraud_post_inapps': sum(row.get('fraud_post_inapps', 0) for row in table),
-                'blocked_clicks': sum(row.get('blocked_clicks', 0) for row in table),
-                'blocked_install_postbacks': sum(row.get('blocked_install_postbacks', 0) for row in table),
-                'event1': sum(row.get('event1', 0) for row in table),
-                'event2': sum(row.get('event2', 0) for row in table)
-            }
-            print(f"[FRAUD] App {app_name} totals: {app_totals}")
-            print(f"[FRAUD] Final table for {app_name} has {len(table)} rows")
-            print(f"[FRAUD] Unique media sources: {sorted(set(row['media_source'] for row in table))}")
-            
-            # Determine if we should skip this app entirely
-            if timeout_count >= 7:  # All 7 API calls timed out (including events)
-                print(f"[FRAUD] Skipping app {app_name} ({app_id}) - all API calls timed out")
-                skipped_apps += 1
-                continue
-                
-            print(f"[FRAUD] Successfully processed app {app_name} ({app_id}) with {timeout_count} timeouts")
-            processed_apps += 1
-            
-            # Include event names for frontend display
-            event1_name = None
-            event2_name = None
-            if event_row:
-                event1_name, event2_name = event_row
-            
-            fraud_list.append({
-                'app_id': app_id,
-                'app_name': app_name,
-                'table': table,
-                'errors': app_errors,
-                'event1_name': event1_name,
-                'event2_name': event2_name
-            })
+                processed_apps += 1
+            if entry is not None:
+                fraud_list.append(entry)
         # Save to cache ONLY if there is at least one app
         if len(fraud_list) > 0:
-            c.execute('REPLACE INTO fraud_cache (range, data, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)',
-                      (cache_key, json.dumps({'apps': fraud_list})))
+            metrics_store.write_report(conn, FRAUD, cache_key, fraud_list)
             conn.commit()
+            hot_cache.invalidate(FRAUD)
             print(f"[FRAUD] Saved {len(fraud_list)} apps to cache with key: {cache_key}")
         else:
             print(f"[FRAUD] No apps to cache - fraud_list is empty")
@@ -1845,23 +1960,167 @@ def get_fraud():
         print(f"[FRAUD] ===============================")
         return jsonify({'error': str(e)}), 500
 
+# --- PROGRESS STREAMS (Server-Sent Events) ---
+# /all-apps-stats/stream and /get_fraud/stream take the same POST body as the
+# plain endpoints but answer with text/event-stream: a 'start' event, one 'app'
+# event with the app's finished table as soon as it is ready, then 'done'. The
+# dashboard reads them with fetch() and renders the apps as they arrive.
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # don't let a proxy hold the events back
+    })
+
+def stream_app_results(tag, kind, cache_key, apps, results, cached=None, sort_key=None):
+    """
+    Event stream of a stats/fraud run.
+
+    results yields (index into apps, (entry, outcome)) in completion order;
+    the finished entries are written to the cache like the plain endpoints do.
+    cached is a (result, updated_at) cache hit that is replayed instead, and
+    sort_key orders the cached entries the way the plain endpoint returns them.
+    """
+    total = len(apps)
+    yield sse_event('start', {'total': total, 'cached': cached is not None})
+    if cached is not None:
+        result, updated_at = cached
+        for done, entry in enumerate(result['apps'], 1):
+            yield sse_event('app', {'app_id': entry['app_id'], 'app_name': entry['app_name'], 'outcome': 'cached',
+                                    'done': done, 'total': len(result['apps']), 'entry': entry})
+        yield sse_event('done', {'total': len(result['apps']), 'included': len(result['apps']), 'skipped': 0,
+                                 'cached': True, 'updated_at': updated_at})
+        return
+    entries, skipped, done = [], 0, 0
+    try:
+        for index, (entry, outcome) in results:
+            done += 1
+            if outcome == 'skipped':
+                skipped += 1
+            if entry is not None:
+                entries.append(entry)
+            app = apps[index]
+            print(f"[{tag}] Streamed {app['app_id']} ({done}/{total}, {outcome})")
+            yield sse_event('app', {'app_id': app['app_id'], 'app_name': app['app_name'], 'outcome': outcome,
+                                    'done': done, 'total': total, 'entry': entry})
+    except Exception as e:
+        print(f"[{tag}] Stream failed after {done}/{total} apps: {e}")
+        yield sse_event('error', {'error': str(e), 'done': done, 'total': total})
+        return
+    if entries:
+        if sort_key:
+            entries.sort(key=sort_key)
+        conn = db.connect(DB_PATH)
+        metrics_store.write_report(conn, kind, cache_key, entries)
+        conn.commit()
+        hot_cache.invalidate(kind)
+        conn.close()
+        print(f"[{tag}] Saved {len(entries)} apps to cache with key: {cache_key}")
+    yield sse_event('done', {'total': total, 'included': len(entries), 'skipped': skipped, 'cached': False,
+                             'updated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+
+def _cached_run(kind, key, latest=False):
+    """(result, updated_at) of a cached run with at least one app, or None; latest=True takes key as a period"""
+    conn = db.connect(DB_PATH)
+    try:
+        row = metrics_store.latest_run(conn, kind, key) if latest else metrics_store.find_run(conn, kind, key)
+        if not row:
+            return None
+        result = metrics_store.load_run(conn, kind, row[0])
+        return (result, row[1]) if result.get('apps') else None
+    finally:
+        conn.close()
+
+@app.route('/all-apps-stats/stream', methods=['POST'])
+@login_required
+def all_apps_stats_stream():
+    """/all-apps-stats as an event stream - apps are sent as they finish"""
+    data = request.get_json()
+    active_apps = data.get('apps', [])
+    period = data.get('period', 'last10')
+    selected_events = data.get('selected_events', {})
+    start_date, end_date = get_period_dates(period)
+    cache_key = stats_cache_key(active_apps, period, selected_events)
+    print(f"[STATS] Streaming {len(active_apps)} apps for period: {period} ({start_date} to {end_date})")
+    results = fetch_engine.iter_apps(lambda app: fetch_app_stats(app, period, start_date, end_date, selected_events), active_apps)
+    return sse_response(stream_app_results('STATS', STATS, cache_key, active_apps, results,
+                                           cached=_cached_run(STATS, cache_key), sort_key=lambda x: -x['traffic']))
+
+@app.route('/get_fraud/stream', methods=['POST'])
+@login_required
+def get_fraud_stream():
+    """/get_fraud as an event stream - apps are sent as they finish"""
+    data = request.get_json()
+    active_apps = data.get('apps', [])
+    period = data.get('period', 'last10')
+    force = data.get('force', False)
+    start_date, end_date = get_period_dates(period)
+    cache_key = f"{period}:{'-'.join(sorted([app['app_id'] for app in active_apps]))}"
+    print(f"[FRAUD] Streaming {len(active_apps)} apps for period: {period} ({start_date} to {end_date})")
+    results = fetch_engine.iter_apps(lambda app: fetch_app_fraud(app, period, start_date, end_date), active_apps)
+    cached = None if force else _cached_run(FRAUD, period, latest=True)
+    return sse_response(stream_app_results('FRAUD', FRAUD, cache_key, active_apps, results, cached=cached))
+
+def hot_response(name, scopes, build):
+    """
+    Serve a dashboard JSON response from the hot cache, building and storing it on a miss.
+
+    build() returns the Flask response; only 200s are cached. The body is sent
+    in the best encoding the client accepts, with an ETag of its content, and a
+    request whose If-None-Match still matches gets an empty 304.
+    """
+    encoding = request.accept_encodings.best_match(ENCODINGS, default='identity')
+    cached = hot_cache.get(name, ('etag', encoding))
+    if cached is not None and cached[1] == b'':
+        # Too small to have been compressed
+        encoding = 'identity'
+        cached = hot_cache.get(name, ('etag', encoding))
+    if cached is not None:
+        etag, body = cached[0].decode(), cached[1]
+        source = 'hit'
+    else:
+        generations = hot_cache.generations(scopes)
+        response = app.make_response(build())
+        if response.status_code != 200:
+            return response
+        # Without Redis only the encoding being sent is worth computing
+        fields = variants(response.get_data(), ENCODINGS if hot_cache.enabled else [encoding])
+        hot_cache.put(name, scopes, fields, generations)
+        if fields[encoding] == b'':
+            encoding = 'identity'
+        etag, body = fields['etag'], fields[encoding]
+        source = 'miss'
+
+    not_modified = request.if_none_match.contains_weak(etag)
+    response = Response(b'' if not_modified else body, status=304 if not_modified else 200,
+                        mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    # Browsers keep the body but revalidate it on every request
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+    if encoding != 'identity' and not not_modified:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['X-Hot-Cache'] = source
+    return response
+
 @app.route('/api/overview')
 @login_required
 def overview():
+    return hot_response('overview', (STATS, FRAUD), build_overview)
+
+def build_overview():
     try:
-        # Read the most recent 'last10' stats_cache entry (regardless of event selections or app IDs)
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("SELECT data, updated_at FROM stats_cache WHERE range LIKE 'last10%' ORDER BY updated_at DESC LIMIT 1")
-        row = c.fetchone()
-        total_impressions = 0
-        total_clicks = 0
-        total_installs = 0
+        # Read the most recent 'last10' stats run (regardless of event selections or app IDs)
+        conn = db.connect(DB_PATH)
+        row = metrics_store.latest_run(conn, STATS, 'last10')
+        totals = {'impressions': 0, 'clicks': 0, 'installs': 0}
+        trend = {'dates': [], 'impressions': [], 'clicks': [], 'installs': []}
         last_updated = None
-        date_map = {}
         if row:
-            data, updated_at = row
-            stats = json.loads(data)
+            range_key, updated_at = row
             # Convert last_updated to GMT+2
             if updated_at:
                 import datetime
@@ -1869,75 +2128,22 @@ def overview():
                 utc_dt = utc_dt.replace(tzinfo=pytz.utc)
                 gmt2 = pytz.timezone('Europe/Berlin')
                 last_updated = utc_dt.astimezone(gmt2).strftime('%Y-%m-%d %H:%M:%S')
-            for app in stats.get('apps', []):
-                for entry in app.get('table', []):
-                    date = entry.get('date')
-                    if date:
-                        if date not in date_map:
-                            date_map[date] = {'impressions': 0, 'clicks': 0, 'installs': 0}
-                        date_map[date]['impressions'] += int(entry.get('impressions', 0))
-                        date_map[date]['clicks'] += int(entry.get('clicks', 0))
-                        date_map[date]['installs'] += int(entry.get('installs', 0))
-                    total_impressions += int(entry.get('impressions', 0))
-                    total_clicks += int(entry.get('clicks', 0))
-                    total_installs += int(entry.get('installs', 0))
-        trend_dates = sorted(date_map.keys())
-        trend_impressions = [date_map[d]['impressions'] for d in trend_dates]
-        trend_clicks = [date_map[d]['clicks'] for d in trend_dates]
-        trend_installs = [date_map[d]['installs'] for d in trend_dates]
-
-        # Use only the most recent 'last10:' fraud_cache entry for Top Fraudulent Sources
-        c.execute("SELECT range FROM fraud_cache WHERE range LIKE 'last10:%' ORDER BY updated_at DESC LIMIT 1")
-        fraud_cache_row = c.fetchone()
+            # Per-date sums across all apps were rolled up when the run was written
+            summary = metrics_store.load_summary(conn, STATS, range_key)
+            totals = summary['totals']
+            trend = {key: summary[key] for key in trend}
+
+        # Use only the most recent 'last10:' fraud run for Top Fraudulent Sources
+        fraud_run = metrics_store.latest_run(conn, FRAUD, 'last10')
         top_bad_sources_by_app = []
-        if fraud_cache_row:
-            fraud_cache_key = fraud_cache_row[0]
-            c.execute('SELECT data FROM fraud_cache WHERE range = ?', (fraud_cache_key,))
-            fraud_row = c.fetchone()
-            if fraud_row:
-                fraud_data = json.loads(fraud_row[0])
-                # For each app, group by media_source and sum fraud
-                for app in fraud_data.get('apps', []):
-                    app_name = app.get('app_name', '')
-                    app_id = app.get('app_id', '')
-                    source_map = {}
-                    for row in app.get('table', []):
-                        media_source = row.get('media_source', '')
-                        pa_fraud = int(row.get('blocked_installs_pa', 0))
-                        rt_fraud = int(row.get('blocked_installs_rt', 0))
-                        if pa_fraud > 0 or rt_fraud > 0:
-                            if media_source not in source_map:
-                                source_map[media_source] = {'media_source': media_source, 'pa_fraud': 0, 'rt_fraud': 0}
-                            source_map[media_source]['pa_fraud'] += pa_fraud
-                            source_map[media_source]['rt_fraud'] += rt_fraud
-                    # Top 5 sources for this app
-                    sources = list(source_map.values())
-                    sources.sort(key=lambda x: x['pa_fraud'] + x['rt_fraud'], reverse=True)
-                    top_sources = sources[:5]
-                    total_fraud = sum(s['pa_fraud'] + s['rt_fraud'] for s in top_sources)
-                    top_bad_sources_by_app.append({
-                        'app_id': app_id,
-                        'app_name': app_name,
-                        'sources': top_sources,
-                        'total_fraud': total_fraud
-                    })
-                # Sort apps by total fraud, take top 5
-                top_bad_sources_by_app.sort(key=lambda x: x['total_fraud'], reverse=True)
-                top_bad_sources_by_app = top_bad_sources_by_app[:5]
+        if fraud_run:
+            # Top 5 sources per app, top 5 apps by total fraud
+            top_bad_sources_by_app = metrics_store.load_summary(conn, FRAUD, fraud_run[0])['top_sources_by_app']
         conn.close()
 
         return jsonify({
-            'totals': {
-                'impressions': total_impressions,
-                'clicks': total_clicks,
-                'installs': total_installs
-            },
-            'trend': {
-                'dates': trend_dates,
-                'impressions': trend_impressions,
-                'clicks': trend_clicks,
-                'installs': trend_installs
-            },
+            'totals': totals,
+            'trend': trend,
             'topBadSourcesByApp': top_bad_sources_by_app,
             'last_updated': last_updated
         })
@@ -1947,14 +2153,16 @@ def overview():
 
 @app.route('/clear-backend-cache', methods=['POST'])
 def clear_backend_cache():
-    import sqlite3
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         
         # Clear all cache tables
         c.execute('DELETE FROM stats_cache')
         c.execute('DELETE FROM fraud_cache')
+        metrics_store.delete_runs(conn, STATS)
+        metrics_store.delete_runs(conn, FRAUD)
+        day_partitions.clear_partitions(conn)
         c.execute('DELETE FROM event_cache')
         c.execute('DELETE FROM apps_cache')
         
@@ -1966,11 +2174,13 @@ def clear_backend_cache():
         
         # Clear all saved CSV export data
         c.execute('DELETE FROM raw_appsflyer_data')
+        c.execute('DELETE FROM raw_blobs')
         
         # Note: We don't clear auto_run_settings as those are user configuration preferences
         
         conn.commit()
         conn.close()
+        hot_cache.invalidate(STATS, FRAUD, APPS)
         
         return jsonify({
             'success': True,
@@ -1978,11 +2188,15 @@ def clear_backend_cache():
             'cleared_tables': [
                 'stats_cache',
                 'fraud_cache', 
+                'metric_apps',
+                'metric_facts',
+                'day_partitions',
                 'event_cache',
                 'apps_cache',
                 'manual_apps',
                 'app_event_selections',
-                'raw_appsflyer_data'
+                'raw_appsflyer_data',
+                'raw_blobs'
             ],
             'preserved_tables': ['auto_run_settings']
         })
@@ -1993,22 +2207,22 @@ def clear_backend_cache():
 @app.route('/clear-apps-cache', methods=['POST'])
 def clear_apps_cache():
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        # Clear all apps cache (synced apps)
-        c.execute('DELETE FROM apps_cache')
-        
-        # Clear all events cache
-        c.execute('DELETE FROM event_cache')
-        
-        # Clear manual apps as well (user wants to clear ALL apps)
-        c.execute('DELETE FROM manual_apps')
-        
-        # Also clear any app event selections for manual apps
-        c.execute('DELETE FROM app_event_selections WHERE app_id NOT IN (SELECT app_id FROM apps_cache)')
-        
-        conn.commit()
+        # Commits when the block succeeds, rolls back otherwise; the connection always goes back to the pool
+        with db.connect(DB_PATH) as conn:
+            c = conn.cursor()
+            
+            # Clear all apps cache (synced apps)
+            c.execute('DELETE FROM apps_cache')
+            
+            # Clear all events cache
+            c.execute('DELETE FROM event_cache')
+            
+            # Clear manual apps as well (user wants to clear ALL apps)
+            c.execute('DELETE FROM manual_apps')
+            
+            # Also clear any app event selections for manual apps
+            c.execute('DELETE FROM app_event_selections WHERE app_id NOT IN (SELECT app_id FROM apps_cache)')
+        hot_cache.invalidate(APPS)
         
         return jsonify({
             "success": True,
@@ -2023,17 +2237,18 @@ def clear_apps_cache():
             "success": False,
             "error": str(e)
         }), 500
-    finally:
-        conn.close()
 
 @app.route('/clear-stats-cache', methods=['POST'])
 def clear_stats_cache():
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         c.execute('DELETE FROM stats_cache')
+        metrics_store.delete_runs(conn, STATS)
+        day_partitions.clear_partitions(conn, 'stats', 'auto_stats')
         conn.commit()
         conn.close()
+        hot_cache.invalidate(STATS)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -2041,7 +2256,7 @@ def clear_stats_cache():
 @app.route('/clear-fraud-cache', methods=['POST'])
 def clear_fraud_cache():
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         
         # Count rows before deletion
@@ -2049,8 +2264,11 @@ def clear_fraud_cache():
         count_before = c.fetchone()[0]
         
         c.execute('DELETE FROM fraud_cache')
+        metrics_store.delete_runs(conn, FRAUD)
+        day_partitions.clear_partitions(conn, 'fraud', 'auto_fraud')
         conn.commit()
         conn.close()
+        hot_cache.invalidate(FRAUD)
         
         print(f"[CACHE] Cleared {count_before} fraud cache entries")
         return jsonify({'success': True, 'message': f'Fraud cache cleared ({count_before} entries)'})
@@ -2062,6 +2280,9 @@ def clear_fraud_cache():
 @login_required
 def apps_page():
     """Tab switching endpoint - should NEVER trigger AppsFlyer API calls"""
+    return hot_response('apps-page', (APPS,), build_apps_page)
+
+def build_apps_page():
     try:
         result = get_active_apps(allow_appsflyer_api=False)
         return jsonify({
@@ -2094,7 +2315,7 @@ def fraud_page():
 def get_subpage_10d():
     import logging
     app.logger.debug('GET /get_subpage_10d')
-    return get_stats_for_range('10d')
+    return hot_response('subpage-10d', (STATS,), lambda: get_stats_for_range('10d'))
 
 
 
@@ -2103,15 +2324,14 @@ def get_subpage_10d():
 def get_fraud_subpage_10d():
     import logging
     app.logger.debug('GET /get_fraud_subpage_10d')
-    return get_fraud_for_range('10d')
+    return hot_response('fraud-subpage-10d', (FRAUD,), lambda: get_fraud_for_range('10d'))
 
 
 
 # Helper to fetch fraud for a given range (10d only)
 def get_fraud_for_range(range_key):
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+        conn = db.connect(DB_PATH)
         # Only support 10d range now
         if range_key == '10d':
             keys = ['10d', 'last10']
@@ -2120,15 +2340,13 @@ def get_fraud_for_range(range_key):
         
         row = None
         for key in keys:
-            c.execute("SELECT data, updated_at FROM fraud_cache WHERE range LIKE ? ORDER BY updated_at DESC LIMIT 1", (f"{key}%",))
-            row = c.fetchone()
+            row = metrics_store.latest_run(conn, FRAUD, key)
             if row:
                 break
+        result = metrics_store.load_run(conn, FRAUD, row[0]) if row else None
         conn.close()
         if row:
-            data, updated_at = row
-            result = json.loads(data)
-            result['updated_at'] = updated_at
+            result['updated_at'] = row[1]
             return jsonify(result)
         else:
             return jsonify({'apps': [], 'updated_at': None})
@@ -2138,8 +2356,7 @@ def get_fraud_for_range(range_key):
 # Helper to fetch stats for a given range (for Stats endpoints)
 def get_stats_for_range(range_key):
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+        conn = db.connect(DB_PATH)
         period_map = {
             '10d': ['10d', 'last10'],
             'mtd': ['mtd'],
@@ -2149,21 +2366,165 @@ def get_stats_for_range(range_key):
         keys = period_map.get(range_key, [range_key])
         row = None
         for key in keys:
-            c.execute("SELECT data, updated_at FROM stats_cache WHERE range LIKE ? ORDER BY updated_at DESC LIMIT 1", (f"{key}%",))
-            row = c.fetchone()
+            row = metrics_store.latest_run(conn, STATS, key)
             if row:
                 break
+        result = metrics_store.load_run(conn, STATS, row[0]) if row else None
         conn.close()
         if row:
-            data, updated_at = row
-            result = json.loads(data)
-            result['updated_at'] = updated_at
+            result['updated_at'] = row[1]
             return jsonify(result)
         else:
             return jsonify({'apps': [], 'updated_at': None})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def process_report_app(app, period, start_date, end_date, selected_events):
+    """
+    Stats entry of one app for a report.
+
+    Returns (entry, outcome) where entry is None if the app is left out and
+    outcome is 'processed', 'skipped' or None. Runs inline for synchronous
+    reports and as one RQ subjob per app for background reports.
+    """
+    app_id = app['app_id']
+    app_name = app['app_name']
+    print(f"[REPORT] Processing app: {app_name} (App ID: {app_id})...")
+    
+    timeout_count = 0
+    app_errors = []
+
+    # Use the aggregate daily report endpoint for main stats
+    url = appsflyer.url(app_id, 'daily_report')
+    params = {"from": start_date, "to": end_date}
+
+    try:
+        print(f"[REPORT] Calling daily_report API for {app_id}...")
+        resp = make_api_request(url, params, app_id=app_id, app_name=app_name, period=period)
+        if resp == 'timeout':
+            print(f"[REPORT] Timeout detected for daily_report {app_id}, continuing with other APIs...")
+            timeout_count += 1
+            app_errors.append("Daily Report API timeout")
+
+        selected = selected_events.get(app_id, [])
+        # Installs are reported as the daily report has them, organic included
+        daily_stats = metrics_store.DailyStats(events=selected, net_of_organic=False)
+        if resp and resp != 'timeout' and resp.status_code == 200:
+            print(f"[REPORT] Got daily_report for {app_id}")
+            header, data_rows = open_csv(resp)
+            first_row = next(data_rows, None)
+            if header is None or first_row is None:  # Only header or empty
+                print(f"[REPORT] No data returned for {app_id}")
+                return None, None
+
+            data_rows = itertools.chain([first_row], data_rows)
+
+            def safe_int(val):
+                try:
+                    if val in ['', 'N/A', 'None', 'null']:
+                        return 0
+                    return int(float(val))
+                except (ValueError, TypeError):
+                    return 0
+
+            columns = csv_schema.resolve('daily_report', header)
+            impressions_idx = columns['impressions']
+            clicks_idx = columns['clicks']
+            installs_idx = columns['installs']
+            date_idx = columns['date']
+
+            if None in [impressions_idx, clicks_idx, installs_idx, date_idx]:
+                print(f"[REPORT] Could not find all required columns for {app_id}")
+                return None, None
+
+            # Process each row
+            for row in data_rows:
+                if len(row) <= max(impressions_idx, clicks_idx, installs_idx, date_idx):
+                    continue
+
+                daily_stats.add_row(row[date_idx], safe_int(row[impressions_idx]), safe_int(row[clicks_idx]),
+                                    safe_int(row[installs_idx]))
+
+        # Process additional data (blocked installs, events)
+        # Add blocked installs data
+        blocked_rt_url = appsflyer.url(app_id, 'blocked_installs_report')
+        blocked_rt_resp = make_api_request(blocked_rt_url, params, app_id=app_id, app_name=app_name, period=period)
+        if blocked_rt_resp and blocked_rt_resp != 'timeout' and blocked_rt_resp.status_code == 200:
+            header, rows = open_csv(blocked_rt_resp)
+            if header is not None:
+                date_idx = csv_schema.resolve('blocked_installs_report', header)['time']
+                if date_idx is not None:
+                    daily_stats.add_counts("blocked_installs_rt", count_by_key(rows, date_idx))
+
+        # Add event data if selected
+        if selected:
+            events_url = appsflyer.url(app_id, 'in_app_events_report')
+            events_resp = make_api_request(events_url, params, app_id=app_id, app_name=app_name, period=period)
+            if events_resp and events_resp != 'timeout' and events_resp.status_code == 200:
+                header, rows = open_csv(events_resp)
+                if header is not None:
+                    columns = csv_schema.resolve('in_app_events_report', header)
+                    event_name_idx = columns['event_name']
+                    event_time_idx = columns['time']
+
+                    if event_name_idx is not None and event_time_idx is not None:
+                        event_counts = count_by_key(rows, event_time_idx, event_name_idx=event_name_idx, event_names=set(selected))
+                        daily_stats.add_event_counts(event_counts)
+
+        # Prepare daily stats for frontend
+        def report_row(*values):
+            row = metrics_store.stats_row(*values)
+            row["click_to_install"] = round(row["click_to_install"], 2)
+            return row
+        table = daily_stats.rows(report_row)
+
+        # Determine if we should skip this app entirely
+        if timeout_count >= 2:  # Multiple API calls timed out
+            print(f"[REPORT] Skipping app {app_name} ({app_id}) - multiple API calls timed out")
+            return None, 'skipped'
+
+        print(f"[REPORT] Successfully processed app {app_name} ({app_id}) with {timeout_count} timeouts")
+        return {
+            'app_id': app_id,
+            'app_name': app_name,
+            'table': table,
+            'selected_events': selected,
+            'traffic': sum(r['impressions'] + r['clicks'] for r in table),
+            'errors': app_errors
+        }, 'processed'
+
+    except Exception as e:
+        print(f"[REPORT] Error processing app {app_id}: {str(e)}")
+        return None, 'skipped'
+    except BrokenPipeError as e:
+        print(f"[REPORT] BrokenPipeError (EPIPE) for app {app_id}: {str(e)}. Skipping to next app.")
+        return None, 'skipped'
+
+def save_report(apps, period, selected_events, stats_list):
+    """Cache a finished report's app entries under its stats cache key and return the response body"""
+    if stats_list:
+        cache_key = stats_cache_key(apps, period, selected_events)
+
+        result = {
+            'apps': stats_list,
+            'updated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+        conn = db.connect(DB_PATH)
+        metrics_store.write_report(conn, STATS, cache_key, stats_list)
+        conn.commit()
+        hot_cache.invalidate(STATS)
+        conn.close()
+
+        print(f"[REPORT] Saved {len(stats_list)} apps to cache with key: {cache_key}")
+    else:
+        print(f"[REPORT] No apps to cache - stats_list is empty")
+        result = {
+            'apps': [],
+            'updated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    return result
+
 def process_report_async(apps, period, selected_events):
     """Background task to process report data"""
     try:
@@ -2181,205 +2542,15 @@ def process_report_async(apps, period, selected_events):
         stats_list = []
         
         for app in apps:
-            app_id = app['app_id']
-            app_name = app['app_name']
-            print(f"[REPORT] Processing app: {app_name} (App ID: {app_id})...")
-            
-            timeout_count = 0
-            app_errors = []
-            
-            # Use the aggregate daily report endpoint for main stats
-            url = f"https://hq1.appsflyer.com/api/agg-data/export/app/{app_id}/daily_report/v5"
-            params = {"from": start_date, "to": end_date}
-            
-            try:
-                print(f"[REPORT] Calling daily_report API for {app_id}...")
-                resp = make_api_request(url, params, app_id=app_id, app_name=app_name, period=period)
-                if resp == 'timeout':
-                    print(f"[REPORT] Timeout detected for daily_report {app_id}, continuing with other APIs...")
-                    timeout_count += 1
-                    app_errors.append("Daily Report API timeout")
-                
-                daily_stats = {}
-                if resp and resp.status_code == 200:
-                    print(f"[REPORT] Got daily_report for {app_id}")
-                    rows = resp.text.strip().split("\n")
-                    if len(rows) < 2:  # Only header or empty
-                        print(f"[REPORT] No data returned for {app_id}")
-                        continue
-                        
-                    header = rows[0].split(",")
-                    data_rows = [row.split(",") for row in rows[1:]]
-                    
-                    # Find column indices
-                    def find_col(*names):
-                        for name in names:
-                            for col in header:
-                                if col.lower().replace('_','').replace(' ','') == name.lower().replace('_','').replace(' ',''):
-                                    return header.index(col)
-                        return None
-
-                    def safe_int(val):
-                        try:
-                            if val in ['', 'N/A', 'None', 'null']:
-                                return 0
-                            return int(float(val))
-                        except (ValueError, TypeError):
-                            return 0
-                        
-                    impressions_idx = find_col('impressions', 'Impressions')
-                    clicks_idx = find_col('clicks', 'Clicks')
-                    installs_idx = find_col('installs', 'Installs')
-                    date_idx = find_col('date', 'Date')
-                    
-                    if None in [impressions_idx, clicks_idx, installs_idx, date_idx]:
-                        print(f"[REPORT] Could not find all required columns for {app_id}")
-                        continue
-                        
-                    # Process each row
-                    for row in data_rows:
-                        if len(row) <= max(impressions_idx, clicks_idx, installs_idx, date_idx):
-                            continue
-                            
-                        date = row[date_idx]
-                        if date not in daily_stats:
-                            daily_stats[date] = {
-                                "impressions": 0,
-                                "clicks": 0,
-                                "installs": 0,
-                                "blocked_installs_rt": 0,
-                                "blocked_installs_pa": 0
-                            }
-                            
-                        daily_stats[date]["impressions"] += safe_int(row[impressions_idx])
-                        daily_stats[date]["clicks"] += safe_int(row[clicks_idx])
-                        daily_stats[date]["installs"] += safe_int(row[installs_idx])
-
-                # Process additional data (blocked installs, events)
-                # Add blocked installs data
-                blocked_rt_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/blocked_installs_report/v5"
-                blocked_rt_resp = make_api_request(blocked_rt_url, params, app_id=app_id, app_name=app_name, period=period)
-                if blocked_rt_resp and blocked_rt_resp.status_code == 200:
-                    rows = blocked_rt_resp.text.strip().split("\n")
-                    if len(rows) > 1:
-                        header = rows[0].split(",")
-                        date_idx = header.index("Install Time") if "Install Time" in header else None
-                        for row in rows[1:]:
-                            cols = row.split(",")
-                            if date_idx is not None and len(cols) > date_idx:
-                                install_date = cols[date_idx].split(" ")[0]
-                                if install_date in daily_stats:
-                                    daily_stats[install_date]["blocked_installs_rt"] += 1
-                                    
-                # Add event data if selected
-                event_data = {}
-                selected = selected_events.get(app_id, [])
-                if selected:
-                    events_url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/in_app_events_report/v5"
-                    events_resp = make_api_request(events_url, params, app_id=app_id, app_name=app_name, period=period)
-                    if events_resp and events_resp.status_code == 200:
-                        rows = events_resp.text.strip().split("\n")
-                        if len(rows) > 1:
-                            header = rows[0].split(",")
-                            event_name_idx = header.index("Event Name") if "Event Name" in header else None
-                            event_time_idx = header.index("Event Time") if "Event Time" in header else None
-                            
-                            for row in rows[1:]:
-                                cols = row.split(",")
-                                if event_name_idx is not None and event_time_idx is not None and len(cols) > max(event_name_idx, event_time_idx):
-                                    event_name = cols[event_name_idx]
-                                    event_date = cols[event_time_idx].split(" ")[0]
-                                    if event_name in selected:
-                                        event_data.setdefault(event_name, {})
-                                        event_data[event_name].setdefault(event_date, 0)
-                                        event_data[event_name][event_date] += 1
-                                        
-                # Prepare daily stats for frontend
-                all_dates = sorted(daily_stats.keys())
-                table = []
-                for date in all_dates:
-                    row = {
-                        "date": date,
-                        "impressions": daily_stats[date]["impressions"],
-                        "clicks": daily_stats[date]["clicks"],
-                        "installs": daily_stats[date]["installs"],
-                        "blocked_installs_rt": daily_stats[date]["blocked_installs_rt"],
-                        "blocked_installs_pa": daily_stats[date]["blocked_installs_pa"]
-                    }
-                    
-                    # Add calculated rates
-                    row["imp_to_click"] = round(row["clicks"] / row["impressions"], 2) if row["impressions"] > 0 else 0
-                    row["click_to_install"] = round(row["installs"] / row["clicks"], 2) if row["clicks"] > 0 else 0
-                    row["blocked_rt_rate"] = round(row["blocked_installs_rt"] / row["installs"], 2) if row["installs"] > 0 else 0
-                    row["blocked_pa_rate"] = round(row["blocked_installs_pa"] / row["installs"], 2) if row["installs"] > 0 else 0
-                    
-                    # Add event counts
-                    if selected:
-                        for event in selected:
-                            row[event] = event_data.get(event, {}).get(date, 0)
-                            
-                    table.append(row)
-                    
-                # Determine if we should skip this app entirely
-                if timeout_count >= 2:  # Multiple API calls timed out
-                    print(f"[REPORT] Skipping app {app_name} ({app_id}) - multiple API calls timed out")
-                    skipped_apps += 1
-                    continue
-                    
-                print(f"[REPORT] Successfully processed app {app_name} ({app_id}) with {timeout_count} timeouts")
+            entry, outcome = process_report_app(app, period, start_date, end_date, selected_events)
+            if outcome == 'processed':
                 processed_apps += 1
-                
-                stats_list.append({
-                    'app_id': app_id,
-                    'app_name': app_name,
-                    'table': table,
-                    'selected_events': selected,
-                    'traffic': sum(r['impressions'] + r['clicks'] for r in table),
-                    'errors': app_errors
-                })
-                
-            except Exception as e:
-                print(f"[REPORT] Error processing app {app_id}: {str(e)}")
-                skipped_apps += 1
-                continue
-            except BrokenPipeError as e:
-                print(f"[REPORT] BrokenPipeError (EPIPE) for app {app_id}: {str(e)}. Skipping to next app.")
+            elif outcome == 'skipped':
                 skipped_apps += 1
-                continue
+            if entry is not None:
+                stats_list.append(entry)
                 
-        # Save to cache
-        if stats_list:
-            app_ids = '-'.join(sorted([app['app_id'] for app in apps]))
-            event1 = ''
-            event2 = ''
-            if apps and selected_events:
-                first_app_id = apps[0]['app_id']
-                events = selected_events.get(first_app_id, [])
-                if len(events) > 0:
-                    event1 = events[0] or ''
-                if len(events) > 1:
-                    event2 = events[1] or ''
-            cache_key = f"{period}:{event1}:{event2}:{app_ids}"
-            
-            result = {
-                'apps': stats_list,
-                'updated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute('REPLACE INTO stats_cache (range, data, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)',
-                     (cache_key, json.dumps(result)))
-            conn.commit()
-            conn.close()
-            
-            print(f"[REPORT] Saved {len(stats_list)} apps to cache with key: {cache_key}")
-        else:
-            print(f"[REPORT] No apps to cache - stats_list is empty")
-            result = {
-                'apps': [],
-                'updated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
+        result = save_report(apps, period, selected_events, stats_list)
         
         # Final completion logging
         print(f"[REPORT] ===== REPORT PROCESSING COMPLETED =====")
@@ -2408,6 +2579,64 @@ def process_report_async(apps, period, selected_events):
         raise
     return {'apps': [], 'error': 'Failed to process report'}
 
+# --- BACKGROUND REPORTS (RQ) ---
+# A report is one RQ subjob per app plus an assembly job that depends on all of
+# them; the assembly job's id is the report's job id. Results are kept until the
+# assembly has run and the dashboard has had time to poll them.
+REPORT_APP_JOB_TIMEOUT = os.getenv('REPORT_APP_JOB_TIMEOUT', '30m')
+REPORT_RESULT_TTL = int(os.getenv('REPORT_RESULT_TTL', '86400'))
+
+def report_app_task(app, period, start_date, end_date, selected_events):
+    """RQ subjob: the stats entry of one app (None if the app is left out)"""
+    entry, outcome = process_report_app(app, period, start_date, end_date, selected_events)
+    return {'entry': entry, 'outcome': outcome}
+
+def assemble_report_task(apps, period, selected_events):
+    """RQ job run after the last app subjob: collect the entries in app order and cache the report"""
+    job = get_current_job()
+    app_jobs = Job.fetch_many([job_id for _, job_id in job.meta.get('app_jobs', [])], connection=job.connection)
+    stats_list, processed_apps, skipped_apps = [], 0, 0
+    for (app_id, _), app_job in zip(job.meta.get('app_jobs', []), app_jobs):
+        result = app_job.result if app_job is not None and app_job.is_finished else None
+        if not result:
+            print(f"[REPORT] Subjob for {app_id} did not finish - leaving the app out")
+            skipped_apps += 1
+            continue
+        if result['outcome'] == 'processed':
+            processed_apps += 1
+        elif result['outcome'] == 'skipped':
+            skipped_apps += 1
+        if result['entry'] is not None:
+            stats_list.append(result['entry'])
+    print(f"[REPORT] Assembled {period} report: {processed_apps} processed, {skipped_apps} skipped of {len(apps)} apps")
+    return save_report(apps, period, selected_events, stats_list)
+
+def enqueue_report(apps, period, selected_events):
+    """Fan a report out into per-app RQ subjobs; returns the assembly job whose id the dashboard polls"""
+    start_date, end_date = get_period_dates(period)
+    app_jobs = [
+        task_queue.enqueue(job_name(report_app_task), app, period, start_date, end_date, selected_events,
+                           job_timeout=REPORT_APP_JOB_TIMEOUT, result_ttl=REPORT_RESULT_TTL,
+                           meta={'app_id': app['app_id'], 'app_name': app['app_name']})
+        for app in apps
+    ]
+    job = task_queue.enqueue(job_name(assemble_report_task), apps, period, selected_events,
+                             depends_on=Dependency(jobs=app_jobs, allow_failure=True) if app_jobs else None,
+                             result_ttl=REPORT_RESULT_TTL,
+                             meta={'app_jobs': [[app['app_id'], app_job.id] for app, app_job in zip(apps, app_jobs)]})
+    print(f"[REPORT] Enqueued {period} report {job.id} as {len(app_jobs)} app subjobs")
+    return job
+
+def report_workers_available():
+    """True when an RQ worker is listening - without one a queued report would never run"""
+    if task_queue is None:
+        return False
+    try:
+        return Worker.count(queue=task_queue) > 0
+    except Exception as e:
+        logger.warning(f"Could not count RQ workers: {e}")
+        return False
+
 @app.route('/start-report', methods=['POST'])
 @login_required
 def start_report():
@@ -2416,7 +2645,15 @@ def start_report():
     period = data.get('period')
     selected_events = data.get('selected_events', [])
 
-    # Run synchronously (not as a background job)
+    if report_workers_available():
+        job = enqueue_report(apps, period, selected_events)
+        return jsonify({
+            'status': 'processing',
+            'job_id': job.id,
+            'total_apps': len(apps)
+        })
+
+    # No Redis or no RQ worker - run synchronously
     result = process_report_async(apps, period, selected_events)
     return jsonify({
         'status': 'completed',
@@ -2444,8 +2681,27 @@ def report_status(job_id):
             'status': 'failed',
             'error': str(job.exc_info)
         })
-    else:
-        return jsonify({'status': 'processing'})
+    
+    # Per-app progress from the report's subjobs
+    app_jobs = job.meta.get('app_jobs', [])
+    subjobs = Job.fetch_many([sub_id for _, sub_id in app_jobs], connection=task_queue.connection)
+    apps_progress = []
+    for (app_id, _), subjob in zip(app_jobs, subjobs):
+        apps_progress.append({
+            'app_id': app_id,
+            'app_name': subjob.meta.get('app_name', app_id) if subjob is not None else app_id,
+            'status': subjob.get_status() if subjob is not None else 'expired'
+        })
+    done = sum(1 for a in apps_progress if a['status'] in ('finished', 'failed', 'stopped', 'canceled', 'expired'))
+    return jsonify({
+        'status': 'processing',
+        'progress': {
+            'done': done,
+            'total': len(apps_progress),
+            'percent': round(100 * done / len(apps_progress)) if apps_progress else 0,
+            'apps': apps_progress
+        }
+    })
 
 # Add this new route to handle app status updates
 @app.route('/update-app-status', methods=['POST'])
@@ -2458,7 +2714,7 @@ def update_app_status():
     if not app_id:
         return jsonify({'success': False, 'message': 'App ID is required'}), 400
         
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect(DB_PATH)
     c = conn.cursor()
     try:
         # First check if there's an existing record
@@ -2494,6 +2750,7 @@ def update_app_status():
             c.execute('UPDATE apps_cache SET data = ? WHERE data = ?', 
                      (json.dumps(cached_data), cache_row[0]))
             conn.commit()
+        hot_cache.invalidate(APPS)
         
         return jsonify({'success': True})
     except Exception as e:
@@ -2531,7 +2788,7 @@ def add_manual_app():
         if status not in ['active', 'inactive']:
             return jsonify({'success': False, 'error': 'Status must be either "active" or "inactive"'}), 400
             
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         
         # Check if app already exists in manual_apps or in AppsFlyer apps
@@ -2563,6 +2820,7 @@ def add_manual_app():
         
         conn.commit()
         conn.close()
+        hot_cache.invalidate(APPS)
         
         return jsonify({
             'success': True, 
@@ -2586,12 +2844,15 @@ def add_manual_app():
 @login_required
 def apps_database_only():
     """Get apps from database/cache only - NO AppsFlyer API calls"""
+    return hot_response('apps-database-only', (APPS,), build_apps_database_only)
+
+def build_apps_database_only():
     try:
         import pytz
         gmt2 = pytz.timezone('Europe/Berlin')
         now = datetime.datetime.now(gmt2)
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         
         # Get active status from database
@@ -2655,36 +2916,13 @@ def apps_database_only():
 
 # Modify the get_active_apps function to include the active status
 def get_active_app_ids():
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect(DB_PATH)
     c = conn.cursor()
     c.execute('SELECT app_id FROM app_event_selections WHERE is_active = 1')
     active_apps = [row[0] for row in c.fetchall()]
     conn.close()
     return active_apps
 
-def parse_raw_csv_data(raw_csv_data):
-    """Parse raw CSV data using proper CSV parser to handle malformed data"""
-    try:
-        if not raw_csv_data or not raw_csv_data.strip():
-            return []
-        
-        import io
-        import csv
-        
-        # Use proper CSV parsing to handle malformed data
-        csv_reader = csv.reader(io.StringIO(raw_csv_data.strip()))
-        rows = list(csv_reader)
-        
-        # Filter out empty rows
-        rows = [row for row in rows if row and any(cell.strip() for cell in row)]
-        
-        return rows
-    except Exception as e:
-        print(f"[CSV_PARSE] Error parsing CSV data: {str(e)}")
-        # Fallback to line splitting if CSV parsing fails
-        lines = raw_csv_data.strip().split('\n')
-        return [line.split(',') for line in lines if line.strip()]
-
 # Raw Data Export Endpoints
 @app.route('/export/stats/raw', methods=['GET'])
 @login_required
@@ -2693,57 +2931,54 @@ def export_stats_raw():
     try:
         range_key = request.args.get('range', 'last10')
         
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+        conn = db.connect(DB_PATH)
         
-        # Get the most recent stats data for the range
-        c.execute("SELECT data, updated_at FROM stats_cache WHERE range LIKE ? ORDER BY updated_at DESC LIMIT 1", (f"{range_key}%",))
-        row = c.fetchone()
-        conn.close()
+        # Get the most recent stats run for the range
+        row = metrics_store.latest_run(conn, STATS, range_key)
         
         if not row:
+            conn.close()
             return jsonify({'error': 'No stats data available. Please generate a report first.'}), 404
             
-        data, updated_at = row
-        stats = json.loads(data)
+        cache_key, updated_at = row
+        apps_count = conn.execute('SELECT COUNT(*) FROM metric_apps WHERE kind = ? AND range = ?',
+                                  (STATS, cache_key)).fetchone()[0]
         
-        # Convert the cached data to raw format for CSV export
+        # Flatten the fact rows to raw format for CSV export
         raw_data = []
-        for app in stats.get('apps', []):
-            app_name = app.get('app_name', 'Unknown App')
-            app_id = app.get('app_id', 'Unknown ID')
+        for app_id, app_name, selected_events, entry in metrics_store.stats_export_rows(conn, cache_key):
+            app_name = app_name or 'Unknown App'
+            app_id = app_id or 'Unknown ID'
+            row_data = {
+                'App Name': app_name,
+                'App ID': app_id,
+                'Date': entry.get('date', ''),
+                'Impressions': entry.get('impressions', 0),
+                'Clicks': entry.get('clicks', 0),
+                'Installs': entry.get('installs', 0),
+                'Blocked Installs RT': entry.get('blocked_installs_rt', 0),
+                'Blocked Installs PA': entry.get('blocked_installs_pa', 0),
+                'Imp to Click Rate': entry.get('imp_to_click', 0),
+                'Click to Install Rate': entry.get('click_to_install', 0),
+                'Blocked RT Rate': entry.get('blocked_rt_rate', 0),
+                'Blocked PA Rate': entry.get('blocked_pa_rate', 0),
+                'Period': f'Last 10 Days',
+                'Data Type': 'Stats Report',
+                'Updated At': updated_at
+            }
             
-            for entry in app.get('table', []):
-                row_data = {
-                    'App Name': app_name,
-                    'App ID': app_id,
-                    'Date': entry.get('date', ''),
-                    'Impressions': entry.get('impressions', 0),
-                    'Clicks': entry.get('clicks', 0),
-                    'Installs': entry.get('installs', 0),
-                    'Blocked Installs RT': entry.get('blocked_installs_rt', 0),
-                    'Blocked Installs PA': entry.get('blocked_installs_pa', 0),
-                    'Imp to Click Rate': entry.get('imp_to_click', 0),
-                    'Click to Install Rate': entry.get('click_to_install', 0),
-                    'Blocked RT Rate': entry.get('blocked_rt_rate', 0),
-                    'Blocked PA Rate': entry.get('blocked_pa_rate', 0),
-                    'Period': f'Last 10 Days',
-                    'Data Type': 'Stats Report',
-                    'Updated At': updated_at
-                }
-                
-                # Add event data if available
-                selected_events = app.get('selected_events', [])
-                for event in selected_events:
-                    if event in entry:
-                        row_data[f'Event: {event}'] = entry.get(event, 0)
-                
-                raw_data.append(row_data)
+            # Add event data if available
+            for event in selected_events:
+                if event in entry:
+                    row_data[f'Event: {event}'] = entry.get(event, 0)
+            
+            raw_data.append(row_data)
+        conn.close()
         
         return jsonify({
             'data': raw_data,
             'total_records': len(raw_data),
-            'apps_count': len(stats.get('apps', [])),
+            'apps_count': apps_count,
             'updated_at': updated_at
         })
         
@@ -2757,19 +2992,17 @@ def export_fraud_raw():
     try:
         range_key = request.args.get('range', 'last10')
         
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+        conn = db.connect(DB_PATH)
         
-        # Get the most recent fraud data for the range
-        c.execute("SELECT data, updated_at FROM fraud_cache WHERE range LIKE ? ORDER BY updated_at DESC LIMIT 1", (f"{range_key}%",))
-        row = c.fetchone()
+        # Get the most recent fraud run for the range
+        row = metrics_store.latest_run(conn, FRAUD, range_key)
+        fraud_data = metrics_store.load_run(conn, FRAUD, row[0]) if row else None
         conn.close()
         
         if not row:
             return jsonify({'error': 'No fraud data available. Please generate a report first.'}), 404
             
-        data, updated_at = row
-        fraud_data = json.loads(data)
+        updated_at = row[1]
         
         # Convert the cached data to raw format for CSV export
         raw_data = []
@@ -2814,539 +3047,75 @@ def export_fraud_raw():
         return jsonify({'error': str(e)}), 500
 
 # Raw AppsFlyer Data Export Endpoints
-@app.route('/export/raw/daily_report', methods=['GET'])
-@login_required
-def export_raw_daily_report():
-    """Export raw daily report data"""
-    try:
-        period = request.args.get('period', 'last10')
-        app_id = request.args.get('app_id')
-        
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        if app_id:
-            # Export for specific app
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE app_id = ? AND endpoint_type = 'daily_report' AND period = ?
-                        ORDER BY created_at DESC LIMIT 1''', (app_id, period))
-        else:
-            # Export for all apps
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE endpoint_type = 'daily_report' AND period = ?
-                        ORDER BY app_name, created_at DESC''', (period,))
-        
-        rows = c.fetchall()
-        conn.close()
-        
-        if not rows:
-            return jsonify({'error': 'No daily report data found'}), 404
-        
-        # Combine all CSV data
-        combined_csv = ""
-        header_added = False
-        
-        for app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at in rows:
-            parsed_rows = parse_raw_csv_data(raw_csv_data)
-            if not header_added and parsed_rows:
-                # Add header with generic info for multi-app export
-                combined_csv += f"# Daily Report Data - Period: {period} ({start_date} to {end_date})\n"
-                combined_csv += f"# Generated: {created_at}\n"
-                # Convert header row to CSV format and add App_Name column
-                header_csv = ','.join(parsed_rows[0]) + ",App_Name\n"
-                combined_csv += header_csv
-                header_added = True
-            
-            # Add data rows with proper CSV formatting
-            for row in parsed_rows[1:]:
-                if row:  # Skip empty rows
-                    row_csv = ','.join(f'"{cell}"' if ',' in cell else cell for cell in row)
-                    combined_csv += row_csv + f",{app_name}\n"
-        
-        # Return as downloadable CSV
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"AppsFlyer_Raw_Daily_Report_{period}_{timestamp}.csv"
-        
-        return Response(
-            combined_csv,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/export/raw/blocked_installs_report', methods=['GET'])
-@login_required
-def export_raw_blocked_installs_report():
-    """Export raw blocked installs report data"""
-    try:
-        period = request.args.get('period', 'last10')
-        app_id = request.args.get('app_id')
-        
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        if app_id:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE app_id = ? AND endpoint_type = 'blocked_installs_report' AND period = ?
-                        ORDER BY created_at DESC LIMIT 1''', (app_id, period))
-        else:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE endpoint_type = 'blocked_installs_report' AND period = ?
-                        ORDER BY app_name, created_at DESC''', (period,))
-        
-        rows = c.fetchall()
-        conn.close()
-        
-        if not rows:
-            return jsonify({'error': 'No blocked installs report data found'}), 404
-        
-        combined_csv = ""
-        header_added = False
-        
-        for app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at in rows:
-            parsed_rows = parse_raw_csv_data(raw_csv_data)
-            if not header_added and parsed_rows:
-                combined_csv += f"# Blocked Installs Report Data - Period: {period} ({start_date} to {end_date})\n"
-                combined_csv += f"# Generated: {created_at}\n"
-                # Convert header row to CSV format and add App_Name column
-                header_csv = ','.join(parsed_rows[0]) + ",App_Name\n"
-                combined_csv += header_csv
-                header_added = True
-            
-            # Add data rows with proper CSV formatting
-            for row in parsed_rows[1:]:
-                if row:  # Skip empty rows
-                    row_csv = ','.join(f'"{cell}"' if ',' in cell else cell for cell in row)
-                    combined_csv += row_csv + f",{app_name}\n"
-        
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"AppsFlyer_Raw_Blocked_Installs_{period}_{timestamp}.csv"
-        
-        return Response(
-            combined_csv,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/export/raw/detection', methods=['GET'])
-@login_required
-def export_raw_detection():
-    """Export raw detection (PA) data"""
-    try:
-        period = request.args.get('period', 'last10')
-        app_id = request.args.get('app_id')
-        
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        if app_id:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE app_id = ? AND endpoint_type = 'detection' AND period = ?
-                        ORDER BY created_at DESC LIMIT 1''', (app_id, period))
-        else:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE endpoint_type = 'detection' AND period = ?
-                        ORDER BY app_name, created_at DESC''', (period,))
-        
-        rows = c.fetchall()
-        conn.close()
-        
-        if not rows:
-            return jsonify({'error': 'No detection data found'}), 404
-        
-        combined_csv = ""
-        header_added = False
-        
-        for app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at in rows:
-            parsed_rows = parse_raw_csv_data(raw_csv_data)
-            if not header_added and parsed_rows:
-                combined_csv += f"# Detection (PA) Data - Period: {period} ({start_date} to {end_date})\n"
-                combined_csv += f"# Generated: {created_at}\n"
-                # Convert header row to CSV format and add App_Name column
-                header_csv = ','.join(parsed_rows[0]) + ",App_Name\n"
-                combined_csv += header_csv
-                header_added = True
-            
-            # Add data rows with proper CSV formatting
-            for row in parsed_rows[1:]:
-                if row:  # Skip empty rows
-                    row_csv = ','.join(f'"{cell}"' if ',' in cell else cell for cell in row)
-                    combined_csv += row_csv + f",{app_name}\n"
-        
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"AppsFlyer_Raw_Detection_PA_{period}_{timestamp}.csv"
-        
-        return Response(
-            combined_csv,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/export/raw/blocked_in_app_events_report', methods=['GET'])
-@login_required
-def export_raw_blocked_in_app_events():
-    """Export raw blocked in-app events data"""
-    try:
-        period = request.args.get('period', 'last10')
-        app_id = request.args.get('app_id')
-        
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        if app_id:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE app_id = ? AND endpoint_type = 'blocked_in_app_events_report' AND period = ?
-                        ORDER BY created_at DESC LIMIT 1''', (app_id, period))
-        else:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE endpoint_type = 'blocked_in_app_events_report' AND period = ?
-                        ORDER BY app_name, created_at DESC''', (period,))
-        
-        rows = c.fetchall()
-        conn.close()
-        
-        if not rows:
-            return jsonify({'error': 'No blocked in-app events data found'}), 404
-        
-        combined_csv = ""
-        header_added = False
-        
-        for app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at in rows:
-            parsed_rows = parse_raw_csv_data(raw_csv_data)
-            if not header_added and parsed_rows:
-                combined_csv += f"# Blocked In-App Events Data - Period: {period} ({start_date} to {end_date})\n"
-                combined_csv += f"# Generated: {created_at}\n"
-                # Convert header row to CSV format and add App_Name column
-                header_csv = ','.join(parsed_rows[0]) + ",App_Name\n"
-                combined_csv += header_csv
-                header_added = True
-            
-            # Add data rows with proper CSV formatting
-            for row in parsed_rows[1:]:
-                if row:  # Skip empty rows
-                    row_csv = ','.join(f'"{cell}"' if ',' in cell else cell for cell in row)
-                    combined_csv += row_csv + f",{app_name}\n"
-        
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"AppsFlyer_Raw_Blocked_InApp_Events_{period}_{timestamp}.csv"
-        
-        return Response(
-            combined_csv,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/export/raw/fraud_post_inapps', methods=['GET'])
-@login_required
-def export_raw_fraud_post_inapps():
-    """Export raw fraud post-inapps data"""
-    try:
-        period = request.args.get('period', 'last10')
-        app_id = request.args.get('app_id')
-        
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        if app_id:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE app_id = ? AND endpoint_type = 'fraud_post_inapps' AND period = ?
-                        ORDER BY created_at DESC LIMIT 1''', (app_id, period))
-        else:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE endpoint_type = 'fraud_post_inapps' AND period = ?
-                        ORDER BY app_name, created_at DESC''', (period,))
-        
-        rows = c.fetchall()
-        conn.close()
-        
-        if not rows:
-            return jsonify({'error': 'No fraud post-inapps data found'}), 404
-        
-        combined_csv = ""
-        header_added = False
-        
-        for app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at in rows:
-            parsed_rows = parse_raw_csv_data(raw_csv_data)
-            if not header_added and parsed_rows:
-                combined_csv += f"# Fraud Post-InApps Data - Period: {period} ({start_date} to {end_date})\n"
-                combined_csv += f"# Generated: {created_at}\n"
-                # Convert header row to CSV format and add App_Name column
-                header_csv = ','.join(parsed_rows[0]) + ",App_Name\n"
-                combined_csv += header_csv
-                header_added = True
-            
-            # Add data rows with proper CSV formatting
-            for row in parsed_rows[1:]:
-                if row:  # Skip empty rows
-                    row_csv = ','.join(f'"{cell}"' if ',' in cell else cell for cell in row)
-                    combined_csv += row_csv + f",{app_name}\n"
-        
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"AppsFlyer_Raw_Fraud_Post_InApps_{period}_{timestamp}.csv"
-        
-        return Response(
-            combined_csv,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+# One route serves every raw report type (raw_export.RAW_EXPORTS). Exports can
+# span every app's reports, so they are streamed: see raw_export.RawExport.
+
+def _list_arg(name):
+    """Values of a query parameter given repeatedly and/or comma-separated"""
+    values = []
+    for value in request.args.getlist(name):
+        values.extend(part.strip() for part in value.split(',') if part.strip())
+    return values
+
+def _date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date().isoformat()
 
-@app.route('/export/raw/blocked_clicks_report', methods=['GET'])
+@app.route('/export/raw/<endpoint_type>', methods=['GET'])
 @login_required
-def export_raw_blocked_clicks():
-    """Export raw blocked clicks data"""
-    try:
-        period = request.args.get('period', 'last10')
-        app_id = request.args.get('app_id')
-        
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        if app_id:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE app_id = ? AND endpoint_type = 'blocked_clicks_report' AND period = ?
-                        ORDER BY created_at DESC LIMIT 1''', (app_id, period))
-        else:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE endpoint_type = 'blocked_clicks_report' AND period = ?
-                        ORDER BY app_name, created_at DESC''', (period,))
-        
-        rows = c.fetchall()
-        conn.close()
-        
-        if not rows:
-            return jsonify({'error': 'No blocked clicks data found'}), 404
-        
-        combined_csv = ""
-        header_added = False
-        
-        for app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at in rows:
-            parsed_rows = parse_raw_csv_data(raw_csv_data)
-            if not header_added and parsed_rows:
-                combined_csv += f"# Blocked Clicks Data - Period: {period} ({start_date} to {end_date})\n"
-                combined_csv += f"# Generated: {created_at}\n"
-                # Convert header row to CSV format and add App_Name column
-                header_csv = ','.join(parsed_rows[0]) + ",App_Name\n"
-                combined_csv += header_csv
-                header_added = True
-            
-            # Add data rows with proper CSV formatting
-            for row in parsed_rows[1:]:
-                if row:  # Skip empty rows
-                    row_csv = ','.join(f'"{cell}"' if ',' in cell else cell for cell in row)
-                    combined_csv += row_csv + f",{app_name}\n"
-        
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"AppsFlyer_Raw_Blocked_Clicks_{period}_{timestamp}.csv"
-        
-        return Response(
-            combined_csv,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+def export_raw_report(endpoint_type):
+    """
+    Export stored raw AppsFlyer reports of one type.
 
-@app.route('/export/raw/blocked_install_postbacks', methods=['GET'])
-@login_required
-def export_raw_blocked_install_postbacks():
-    """Export raw blocked install postbacks data"""
+    Query parameters: period (default last10), app_id (one or more, default
+    all apps), columns (output only these), from / to (YYYY-MM-DD, inclusive),
+    media_source (one or more) and format (csv, zip for one CSV per app,
+    or typed parquet / arrow).
+    """
+    if endpoint_type not in RAW_EXPORTS:
+        return jsonify({'error': f'Unknown raw report type: {endpoint_type}'}), 404
     try:
-        period = request.args.get('period', 'last10')
-        app_id = request.args.get('app_id')
-        
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        if app_id:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE app_id = ? AND endpoint_type = 'blocked_install_postbacks' AND period = ?
-                        ORDER BY created_at DESC LIMIT 1''', (app_id, period))
-        else:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE endpoint_type = 'blocked_install_postbacks' AND period = ?
-                        ORDER BY app_name, created_at DESC''', (period,))
-        
-        rows = c.fetchall()
-        conn.close()
-        
-        if not rows:
-            return jsonify({'error': 'No blocked install postbacks data found'}), 404
-        
-        combined_csv = ""
-        header_added = False
-        
-        for app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at in rows:
-            parsed_rows = parse_raw_csv_data(raw_csv_data)
-            if not header_added and parsed_rows:
-                combined_csv += f"# Blocked Install Postbacks Data - Period: {period} ({start_date} to {end_date})\n"
-                combined_csv += f"# Generated: {created_at}\n"
-                # Convert header row to CSV format and add App_Name column
-                header_csv = ','.join(parsed_rows[0]) + ",App_Name\n"
-                combined_csv += header_csv
-                header_added = True
-            
-            # Add data rows with proper CSV formatting
-            for row in parsed_rows[1:]:
-                if row:  # Skip empty rows
-                    row_csv = ','.join(f'"{cell}"' if ',' in cell else cell for cell in row)
-                    combined_csv += row_csv + f",{app_name}\n"
-        
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"AppsFlyer_Raw_Blocked_Install_Postbacks_{period}_{timestamp}.csv"
-        
-        return Response(
-            combined_csv,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        export_format = request.args.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        if export_format in ('parquet', 'arrow') and not arrow_available():
+            return jsonify({'error': f'{export_format} export needs pyarrow installed on the server'}), 501
+        try:
+            date_from, date_to = _date_arg('from'), _date_arg('to')
+        except ValueError:
+            return jsonify({'error': 'from and to must be dates in YYYY-MM-DD format'}), 400
+
+        export = RawExport(DB_PATH, endpoint_type,
+                           period=request.args.get('period', 'last10'),
+                           app_ids=_list_arg('app_id'),
+                           columns=_list_arg('columns'),
+                           date_from=date_from,
+                           date_to=date_to,
+                           media_sources=_list_arg('media_source'))
+
+        conn = db.connect(DB_PATH)
+        try:
+            reports = export.reports(conn)
+            header = export.header(conn, reports[0]) if reports and export.columns else None
+        finally:
+            conn.close()
+        if not reports:
+            return jsonify({'error': f'No {export.missing} data found'}), 404
+        missing = export.missing_columns(header or [])
+        if missing:
+            return jsonify({'error': f"Unknown columns: {', '.join(missing)}", 'available_columns': header}), 400
 
-@app.route('/export/raw/in_app_events_report', methods=['GET'])
-@login_required
-def export_raw_in_app_events():
-    """Export raw in-app events data"""
-    try:
-        period = request.args.get('period', 'last10')
-        app_id = request.args.get('app_id')
-        
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        if app_id:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE app_id = ? AND endpoint_type = 'in_app_events_report' AND period = ?
-                        ORDER BY created_at DESC LIMIT 1''', (app_id, period))
-        else:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE endpoint_type = 'in_app_events_report' AND period = ?
-                        ORDER BY app_name, created_at DESC''', (period,))
-        
-        rows = c.fetchall()
-        conn.close()
-        
-        if not rows:
-            return jsonify({'error': 'No in-app events data found'}), 404
-        
-        combined_csv = ""
-        header_added = False
-        
-        for app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at in rows:
-            parsed_rows = parse_raw_csv_data(raw_csv_data)
-            if not header_added and parsed_rows:
-                combined_csv += f"# In-App Events Data - Period: {period} ({start_date} to {end_date})\n"
-                combined_csv += f"# Generated: {created_at}\n"
-                # Convert header row to CSV format and add App_Name column
-                header_csv = ','.join(parsed_rows[0]) + ",App_Name\n"
-                combined_csv += header_csv
-                header_added = True
-            
-            # Add data rows with proper CSV formatting
-            for row in parsed_rows[1:]:
-                if row:  # Skip empty rows
-                    row_csv = ','.join(f'"{cell}"' if ',' in cell else cell for cell in row)
-                    combined_csv += row_csv + f",{app_name}\n"
-        
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"AppsFlyer_Raw_InApp_Events_{period}_{timestamp}.csv"
-        
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        # Streamed: the generator reads the reports on its own connection as it goes
         return Response(
-            combined_csv,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
+            stream_with_context(export.iter_format(export_format, reports)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={export.filename(timestamp, extension)}'}
         )
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
 
-@app.route('/export/raw/installs_report', methods=['GET'])
-@login_required
-def export_raw_installs_report():
-    """Export raw installs report data"""
-    try:
-        period = request.args.get('period', 'last10')
-        app_id = request.args.get('app_id')
-        
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        if app_id:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE app_id = ? AND endpoint_type = 'installs_report' AND period = ?
-                        ORDER BY created_at DESC LIMIT 1''', (app_id, period))
-        else:
-            c.execute('''SELECT app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at 
-                        FROM raw_appsflyer_data 
-                        WHERE endpoint_type = 'installs_report' AND period = ?
-                        ORDER BY app_name, created_at DESC''', (period,))
-        
-        rows = c.fetchall()
-        conn.close()
-        
-        if not rows:
-            return jsonify({'error': 'No installs report data found'}), 404
-        
-        combined_csv = ""
-        header_added = False
-        
-        for app_name, endpoint_type, period, raw_csv_data, start_date, end_date, created_at in rows:
-            parsed_rows = parse_raw_csv_data(raw_csv_data)
-            if not header_added and parsed_rows:
-                combined_csv += f"# Installs Report Data - Period: {period} ({start_date} to {end_date})\n"
-                combined_csv += f"# Generated: {created_at}\n"
-                # Convert header row to CSV format and add App_Name column
-                header_csv = ','.join(parsed_rows[0]) + ",App_Name\n"
-                combined_csv += header_csv
-                header_added = True
-            
-            # Add data rows with proper CSV formatting
-            for row in parsed_rows[1:]:
-                if row:  # Skip empty rows
-                    row_csv = ','.join(f'"{cell}"' if ',' in cell else cell for cell in row)
-                    combined_csv += row_csv + f",{app_name}\n"
-        
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"AppsFlyer_Raw_Installs_Report_{period}_{timestamp}.csv"
-        
-        return Response(
-            combined_csv,
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
-        )
-    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -3357,7 +3126,7 @@ def export_raw_installs_report():
 def get_auto_run_status():
     """Get current auto-run status and timing information"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         
         c.execute('''SELECT last_run_time, next_run_time, auto_run_enabled, 
@@ -3409,7 +3178,7 @@ def update_auto_run_status():
     try:
         data = request.get_json()
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         
         # Prepare update fields
@@ -3455,7 +3224,7 @@ def execute_auto_run():
     """Execute auto-run manually or via scheduler"""
     try:
         # Mark as running
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         c.execute('UPDATE auto_run_settings SET is_running = 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1')
         conn.commit()
@@ -3468,7 +3237,7 @@ def execute_auto_run():
         if not active_apps_result or not active_apps_result.get('apps'):
             logger.error("No active apps found for auto-run")
             # Mark as not running
-            conn = sqlite3.connect(DB_PATH)
+            conn = db.connect(DB_PATH)
             c = conn.cursor()
             c.execute('UPDATE auto_run_settings SET is_running = 0, updated_at = CURRENT_TIMESTAMP WHERE id = 1')
             conn.commit()
@@ -3480,7 +3249,7 @@ def execute_auto_run():
         if not active_apps:
             logger.error("No active apps found after filtering")
             # Mark as not running
-            conn = sqlite3.connect(DB_PATH)
+            conn = db.connect(DB_PATH)
             c = conn.cursor()
             c.execute('UPDATE auto_run_settings SET is_running = 0, updated_at = CURRENT_TIMESTAMP WHERE id = 1')
             conn.commit()
@@ -3490,7 +3259,7 @@ def execute_auto_run():
         logger.info(f"Found {len(active_apps)} active apps for auto-run")
         
         # Get event selections
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         c.execute('SELECT app_id, event1, event2 FROM app_event_selections')
         selections = c.fetchall()
@@ -3554,7 +3323,7 @@ def execute_auto_run():
         from datetime import datetime
         current_time = datetime.now().isoformat()
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         c.execute('''UPDATE auto_run_settings 
                     SET last_run_time = ?, is_running = 0, updated_at = CURRENT_TIMESTAMP 
@@ -3574,7 +3343,7 @@ def execute_auto_run():
     except Exception as e:
         # Make sure to mark as not running on error
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = db.connect(DB_PATH)
             c = conn.cursor()
             c.execute('UPDATE auto_run_settings SET is_running = 0, updated_at = CURRENT_TIMESTAMP WHERE id = 1')
             conn.commit()
@@ -3592,6 +3361,7 @@ def all_apps_stats_logic(request_data):
         active_apps = request_data.get('apps', [])
         period = request_data.get('period', 'last10')
         selected_events = request_data.get('selected_events', {})
+        force = request_data.get('force', False)
         
         start_date, end_date = get_period_dates(period)
         logger.info(f"[AUTO-STATS] Processing {len(active_apps)} apps for period: {period} ({start_date} to {end_date})")
@@ -3609,131 +3379,115 @@ def all_apps_stats_logic(request_data):
                 event2 = events[1] or ''
         cache_key = f"{period}:{event1}:{event2}:{app_ids}"
         
-        # Check cache first
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('SELECT data, updated_at FROM stats_cache WHERE range = ?', (cache_key,))
-        row = c.fetchone()
-        if row:
-            data, updated_at = row
-            result = json.loads(data)
-            if result.get('apps') and len(result['apps']) > 0:
-                logger.info(f"[AUTO-STATS] Using cached data for {period}")
-                conn.close()
-                return result
-        conn.close()
+        # Check cache first (unless forced)
+        if not force:
+            conn = db.connect(DB_PATH)
+            if metrics_store.find_run(conn, STATS, cache_key):
+                result = metrics_store.load_run(conn, STATS, cache_key)
+                if result.get('apps') and len(result['apps']) > 0:
+                    logger.info(f"[AUTO-STATS] Using cached data for {period}")
+                    conn.close()
+                    return result
+            conn.close()
         
         # Generate fresh data (simplified version for auto-run)
         # For auto-run, we'll use a simplified approach to avoid timeouts
-        stats_list = []
-        
-        for app in active_apps:
+        def process_app(app):
             try:
                 app_id = app['app_id']
                 app_name = app['app_name']
                 
+                def app_entry(table):
+                    return {
+                        'app_id': app_id,
+                        'app_name': app_name,
+                        'table': table,
+                        'selected_events': selected_events.get(app_id, []),
+                        'traffic': sum(r['impressions'] + r['clicks'] for r in table),
+                        'errors': []
+                    }
+                
+                # Closed days come from day partitions, only the open days are fetched again
+                conn = db.connect(DB_PATH)
+                fetch_from, closed_rows = day_partitions.plan_refresh(conn, 'auto_stats', app_id, '', start_date, end_date)
+                conn.close()
+                if fetch_from is None:
+                    logger.info(f"[AUTO-STATS] All days closed for {app_name}, using stored days")
+                    return app_entry(closed_rows)
+                
                 # Use daily report endpoint
-                url = f"https://hq1.appsflyer.com/api/agg-data/export/app/{app_id}/daily_report/v5"
-                params = {"from": start_date, "to": end_date}
+                url = appsflyer.url(app_id, 'daily_report')
+                params = {"from": fetch_from, "to": end_date}
                 
                 resp = make_api_request(url, params, max_retries=3, retry_delay=5, app_id=app_id, app_name=app_name, period=period)
                 
-                if resp and resp.status_code == 200:
+                if resp and resp != 'timeout' and resp.status_code == 200:
                     # Process the response (simplified)
-                    daily_stats = {}
-                    rows = resp.text.strip().split("\n")
+                    daily_stats = metrics_store.DailyStats()
+                    header, data_rows = open_csv(resp)
+                    first_row = next(data_rows, None)
                     
-                    if len(rows) > 1:
-                        header = rows[0].split(",")
-                        data_rows = [row.split(",") for row in rows[1:]]
-                        
-                        # Find column indices
-                        def find_col(*names):
-                            for name in names:
-                                for i, col in enumerate(header):
-                                    if col.lower().replace('_','').replace(' ','') == name.lower().replace('_','').replace(' ',''):
-                                        return i
-                            return None
+                    if header is not None and first_row is not None:
+                        data_rows = itertools.chain([first_row], data_rows)
                         
-                        impressions_idx = find_col('impressions', 'Impressions')
-                        clicks_idx = find_col('clicks', 'Clicks')
-                        installs_idx = find_col('installs', 'Installs')
-                        date_idx = find_col('date', 'Date')
-                        media_source_idx = find_col('media_source', 'media source', 'Media Source')
+                        columns = csv_schema.resolve('daily_report', header)
+                        impressions_idx = columns['impressions']
+                        clicks_idx = columns['clicks']
+                        installs_idx = columns['installs']
+                        date_idx = columns['date']
+                        media_source_idx = columns['media_source']
                         
-                        if all(idx is not None for idx in [impressions_idx, clicks_idx, installs_idx, date_idx, media_source_idx]):
+                        columns_found = all(idx is not None for idx in [impressions_idx, clicks_idx, installs_idx, date_idx, media_source_idx])
+                        if columns_found:
                             for row in data_rows:
                                 if len(row) > max(impressions_idx, clicks_idx, installs_idx, date_idx, media_source_idx):
-                                    date = row[date_idx]
                                     media_source = row[media_source_idx].strip().lower()
-                                    
-                                    if date not in daily_stats:
-                                        daily_stats[date] = {"impressions": 0, "clicks": 0, "total_installs": 0, "organic_installs": 0}
-                                    
                                     impressions = int(row[impressions_idx]) if row[impressions_idx].isdigit() else 0
                                     clicks = int(row[clicks_idx]) if row[clicks_idx].isdigit() else 0
                                     installs = int(row[installs_idx]) if row[installs_idx].isdigit() else 0
-                                    
-                                    daily_stats[date]["impressions"] += impressions
-                                    daily_stats[date]["clicks"] += clicks
-                                    daily_stats[date]["total_installs"] += installs
-                                    
-                                    if media_source == 'organic':
-                                        daily_stats[date]["organic_installs"] += installs
+                                    # Organic installs are left out of the reported installs
+                                    daily_stats.add_row(row[date_idx], impressions, clicks, installs, organic=media_source == 'organic')
                         
-                        # Calculate non-organic installs
-                        for date in daily_stats:
-                            daily_stats[date]["installs"] = daily_stats[date]["total_installs"] - daily_stats[date]["organic_installs"]
-                            if daily_stats[date]["installs"] < 0:
-                                daily_stats[date]["installs"] = 0
-                        
-                        # Convert to table format
-                        table = []
-                        for date in sorted(daily_stats.keys()):
-                            row = {
-                                "date": date,
-                                "impressions": daily_stats[date]["impressions"],
-                                "clicks": daily_stats[date]["clicks"],
-                                "installs": daily_stats[date]["installs"],
-                                "blocked_installs_rt": 0,
-                                "blocked_installs_pa": 0,
-                            }
-                            
-                            # Calculate rates
-                            row["imp_to_click"] = round(row["clicks"] / row["impressions"], 2) if row["impressions"] > 0 else 0
-                            row["click_to_install"] = round(row["installs"] / row["clicks"], 2) if row["clicks"] > 0 else 0
+                        # Convert to table format (no blocked installs in the simplified run)
+                        def auto_row(date, impressions, clicks, installs, blocked_installs_rt, blocked_installs_pa):
+                            row = metrics_store.stats_row(date, impressions, clicks, installs, 0, 0)
+                            row["click_to_install"] = round(row["click_to_install"], 2)
                             row["blocked_rt_rate"] = 0
                             row["blocked_pa_rate"] = 0
-                            
-                            table.append(row)
+                            return row
+                        table = daily_stats.rows(auto_row)
                         
-                        stats_list.append({
-                            'app_id': app_id,
-                            'app_name': app_name,
-                            'table': table,
-                            'selected_events': selected_events.get(app_id, []),
-                            'traffic': sum(r['impressions'] + r['clicks'] for r in table),
-                            'errors': []
-                        })
+                        if columns_found:
+                            conn = db.connect(DB_PATH)
+                            day_partitions.store_days(conn, 'auto_stats', app_id, '', fetch_from, end_date, table)
+                            conn.commit()
+                            conn.close()
                         
                         logger.info(f"[AUTO-STATS] Processed {app_name} successfully")
+                        return app_entry(closed_rows + table)
+                    elif closed_rows:
+                        logger.info(f"[AUTO-STATS] No new rows for {app_name}, using stored days")
+                        return app_entry(closed_rows)
                 else:
                     logger.error(f"[AUTO-STATS] Failed to get data for {app_name}")
                     
             except Exception as e:
                 logger.error(f"[AUTO-STATS] Error processing {app.get('app_name', app.get('app_id'))}: {str(e)}")
+            return None
+        
+        # Process apps concurrently (bounded by the fetch engine settings)
+        stats_list = [entry for entry in map_apps(process_app, active_apps) if entry]
         
         # Sort by traffic
         stats_list.sort(key=lambda x: x['traffic'], reverse=True)
         
         # Save to cache
         if stats_list:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
+            conn = db.connect(DB_PATH)
             result = {'apps': stats_list}
-            c.execute('REPLACE INTO stats_cache (range, data, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)', 
-                     (cache_key, json.dumps(result)))
+            metrics_store.write_report(conn, STATS, cache_key, stats_list)
             conn.commit()
+            hot_cache.invalidate(STATS)
             conn.close()
             logger.info(f"[AUTO-STATS] Saved {len(stats_list)} apps to cache")
             return result
@@ -3761,14 +3515,10 @@ def get_fraud_logic(request_data):
         
         # Check cache first (unless forced)
         if not force:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute('SELECT data, updated_at FROM fraud_cache WHERE range LIKE ? ORDER BY updated_at DESC LIMIT 1', 
-                     (f"{period}%",))
-            row = c.fetchone()
+            conn = db.connect(DB_PATH)
+            row = metrics_store.latest_run(conn, FRAUD, period)
             if row:
-                data, updated_at = row
-                result = json.loads(data)
+                result = metrics_store.load_run(conn, FRAUD, row[0])
                 if result.get('apps') and len(result['apps']) > 0:
                     logger.info(f"[AUTO-FRAUD] Using cached data for {period}")
                     conn.close()
@@ -3776,42 +3526,46 @@ def get_fraud_logic(request_data):
             conn.close()
         
         # Generate fresh fraud data (simplified for auto-run)
-        fraud_list = []
-        
-        for app in active_apps:
+        def process_app(app):
             try:
                 app_id = app['app_id']
                 app_name = app['app_name']
                 
+                # Closed days come from day partitions, only the open days are fetched again
+                conn = db.connect(DB_PATH)
+                fetch_from, closed_rows = day_partitions.plan_refresh(conn, 'auto_fraud', app_id, '', start_date, end_date)
+                conn.close()
+                if fetch_from is None:
+                    logger.info(f"[AUTO-FRAUD] All days closed for {app_name}, using stored days")
+                    return {'app_id': app_id, 'app_name': app_name, 'table': closed_rows}
+                
                 # Use daily report endpoint for fraud data
-                url = f"https://hq1.appsflyer.com/api/raw-data/export/app/{app_id}/daily_report/v5"
-                params = {"from": start_date, "to": end_date}
+                url = appsflyer.url(app_id, 'raw_daily_report')
+                params = {"from": fetch_from, "to": end_date}
                 
                 resp = make_api_request(url, params, max_retries=3, retry_delay=5, app_id=app_id, app_name=app_name, period=period)
                 
-                if resp and resp.status_code == 200:
+                if resp and resp != 'timeout' and resp.status_code == 200:
                     # Process fraud data (simplified)
                     fraud_data = {}
-                    rows = resp.text.strip().split("\n")
+                    header, rows = open_csv(resp)
+                    first_row = next(rows, None)
                     
-                    if len(rows) > 1:
-                        header = rows[0].split(",")
+                    if header is not None and first_row is not None:
+                        rows = itertools.chain([first_row], rows)
                         
-                        # Find media source column
-                        media_source_idx = find_media_source_idx(header)
-                        date_idx = next((i for i, col in enumerate(header) if 'date' in col.lower()), None)
+                        columns = csv_schema.resolve('daily_report_auto_fraud', header)
+                        media_source_idx = columns['media_source']
+                        date_idx = columns['date']
                         
-                        if media_source_idx is not None and date_idx is not None:
-                            for row in rows[1:]:
-                                cols = row.split(",")
-                                if len(cols) > max(media_source_idx, date_idx):
-                                    date = cols[date_idx]
-                                    media_source = cols[media_source_idx].strip()
-                                    
-                                    if date not in fraud_data:
-                                        fraud_data[date] = {}
-                                    
-                                    fraud_data[date][media_source] = fraud_data[date].get(media_source, 0) + 1
+                        columns_found = media_source_idx is not None and date_idx is not None
+                        if columns_found:
+                            counts = count_by_key(rows, date_idx, media_source_idx, by_media_source=True, default_media_source=None)
+                            for (date, media_source, _), count in counts.items():
+                                if date not in fraud_data:
+                                    fraud_data[date] = {}
+                                
+                                fraud_data[date][media_source] = fraud_data[date].get(media_source, 0) + count
                         
                         # Convert to table format
                         table = []
@@ -3825,27 +3579,38 @@ def get_fraud_logic(request_data):
                                     "blocked_in_app_events": 0
                                 })
                         
-                        fraud_list.append({
-                            'app_id': app_id,
-                            'app_name': app_name,
-                            'table': table
-                        })
+                        if columns_found:
+                            conn = db.connect(DB_PATH)
+                            day_partitions.store_days(conn, 'auto_fraud', app_id, '', fetch_from, end_date, table)
+                            conn.commit()
+                            conn.close()
                         
                         logger.info(f"[AUTO-FRAUD] Processed {app_name} successfully")
+                        return {
+                            'app_id': app_id,
+                            'app_name': app_name,
+                            'table': closed_rows + table
+                        }
+                    elif closed_rows:
+                        logger.info(f"[AUTO-FRAUD] No new rows for {app_name}, using stored days")
+                        return {'app_id': app_id, 'app_name': app_name, 'table': closed_rows}
                 else:
                     logger.error(f"[AUTO-FRAUD] Failed to get data for {app_name}")
                     
             except Exception as e:
                 logger.error(f"[AUTO-FRAUD] Error processing {app.get('app_name', app.get('app_id'))}: {str(e)}")
+            return None
+        
+        # Process apps concurrently (bounded by the fetch engine settings)
+        fraud_list = [entry for entry in map_apps(process_app, active_apps) if entry]
         
         # Save to cache
         if fraud_list:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
+            conn = db.connect(DB_PATH)
             result = {'apps': fraud_list}
-            c.execute('REPLACE INTO fraud_cache (range, data, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)', 
-                     (cache_key, json.dumps(result)))
+            metrics_store.write_report(conn, FRAUD, cache_key, fraud_list)
             conn.commit()
+            hot_cache.invalidate(FRAUD)
             conn.close()
             logger.info(f"[AUTO-FRAUD] Saved {len(fraud_list)} apps to cache")
             return result
@@ -3867,7 +3632,7 @@ def auto_run_background_worker():
     while True:
         try:
             # Check if auto-run should be triggered
-            conn = sqlite3.connect(DB_PATH)
+            conn = db.connect(DB_PATH)
             c = conn.cursor()
             
             c.execute('''SELECT last_run_time, auto_run_enabled, auto_run_interval_hours, is_running 
@@ -3894,7 +3659,7 @@ def auto_run_background_worker():
                                 # Trigger auto-run execution
                                 try:
                                     # Mark as running
-                                    conn = sqlite3.connect(DB_PATH)
+                                    conn = db.connect(DB_PATH)
                                     c = conn.cursor()
                                     c.execute('UPDATE auto_run_settings SET is_running = 1 WHERE id = 1')
                                     conn.commit()
@@ -3912,7 +3677,7 @@ def auto_run_background_worker():
                                     logger.error(f"❌ Error in background auto-run: {str(e)}")
                                     # Make sure to mark as not running
                                     try:
-                                        conn = sqlite3.connect(DB_PATH)
+                                        conn = db.connect(DB_PATH)
                                         c = conn.cursor()
                                         c.execute('UPDATE auto_run_settings SET is_running = 0 WHERE id = 1')
                                         conn.commit()
@@ -3929,6 +3694,17 @@ def auto_run_background_worker():
                     if is_running:
                         logger.debug("🔄 Auto-run already running")
             
+            # Trim the caches every RETENTION_INTERVAL_HOURS (not while a run is writing them)
+            if not (row and row[3]):
+                try:
+                    conn = db.connect(DB_PATH)
+                    try:
+                        retention.run_if_due(conn)
+                    finally:
+                        conn.close()
+                except Exception as e:
+                    logger.error(f"❌ Error enforcing cache retention: {str(e)}")
+            
             # Sleep for 60 seconds before checking again
             time_module.sleep(60)
             
@@ -3955,7 +3731,7 @@ def execute_auto_run_logic():
         logger.info(f"Found {len(active_apps)} active apps for background auto-run")
         
         # Get event selections
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         c.execute('SELECT app_id, event1, event2 FROM app_event_selections')
         selections = c.fetchall()
@@ -3975,7 +3751,8 @@ def execute_auto_run_logic():
                 request_data = {
                     'apps': active_apps,
                     'period': period,
-                    'selected_events': selected_events
+                    'selected_events': selected_events,
+                    'force': True
                 }
                 
                 stats_result = all_apps_stats_logic(request_data)
@@ -4014,7 +3791,7 @@ def execute_auto_run_logic():
         # Update last run time and mark as not running
         current_time = datetime.datetime.now().isoformat()
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         c.execute('''UPDATE auto_run_settings 
                     SET last_run_time = ?, is_running = 0, updated_at = CURRENT_TIMESTAMP 
@@ -4053,12 +3830,10 @@ def get_events_source():
         app_ids = '-'.join(sorted([app['app_id'] for app in active_apps]))
         cache_key = f"{period}:{app_ids}"
         
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+        conn = db.connect(DB_PATH)
         
-        # Try to find fraud cache data that contains the events
-        c.execute("SELECT data, updated_at FROM fraud_cache WHERE range LIKE ? ORDER BY updated_at DESC LIMIT 1", (f"{period}%",))
-        row = c.fetchone()
+        # Try to find the fraud run that contains the events
+        row = metrics_store.latest_run(conn, FRAUD, period)
         
         if not row:
             print(f"[EVENTS_SOURCE] No fraud cache found for period {period}, returning empty result")
@@ -4069,55 +3844,19 @@ def get_events_source():
                 'message': 'No data available. Please run a fraud report first to collect event data.'
             })
         
-        data_json, updated_at = row
-        fraud_data = json.loads(data_json)
+        fraud_key, updated_at = row
+        # Rows with events and the per-app totals are filtered and summed in SQL
+        events_list = metrics_store.events_by_source(conn, fraud_key)
+        conn.close()
         
-        print(f"[EVENTS_SOURCE] Found fraud cache data with {len(fraud_data.get('apps', []))} apps")
+        print(f"[EVENTS_SOURCE] Found fraud cache data with {len(events_list)} apps")
         
-        # Transform fraud data to focus on events only
-        events_list = []
-        
-        for app in fraud_data.get('apps', []):
-            app_id = app.get('app_id')
-            app_name = app.get('app_name')
-            event1_name = app.get('event1_name', 'Event 1')
-            event2_name = app.get('event2_name', 'Event 2')
-            
-            print(f"[EVENTS_SOURCE] Processing app: {app_name} (events: {event1_name}, {event2_name})")
-            
-            # Filter table to only include rows with events
-            events_table = []
-            for row in app.get('table', []):
-                event1_count = row.get('event1', 0)
-                event2_count = row.get('event2', 0)
-                
-                # Only include rows where there are actual events
-                if event1_count > 0 or event2_count > 0:
-                    events_row = {
-                        'date': row.get('date'),
-                        'media_source': row.get('media_source'),
-                        'event1': event1_count,
-                        'event2': event2_count
-                    }
-                    events_table.append(events_row)
-            
-            # Calculate totals for this app
-            total_event1 = sum(row.get('event1', 0) for row in events_table)
-            total_event2 = sum(row.get('event2', 0) for row in events_table)
-            
-            print(f"[EVENTS_SOURCE] App {app_name}: {len(events_table)} rows with events, totals: {event1_name}={total_event1}, {event2_name}={total_event2}")
-            
-            events_list.append({
-                'app_id': app_id,
-                'app_name': app_name,
-                'table': events_table,
-                'event1_name': event1_name.strip() if event1_name and event1_name.strip() else 'Event 1',
-                'event2_name': event2_name.strip() if event2_name and event2_name.strip() else 'Event 2',
-                'total_event1': total_event1,
-                'total_event2': total_event2
-            })
-        
-        conn.close()
+        for app in events_list:
+            event1_name = app['event1_name'] or 'Event 1'
+            event2_name = app['event2_name'] or 'Event 2'
+            print(f"[EVENTS_SOURCE] App {app['app_name']}: {len(app['table'])} rows with events, totals: {event1_name}={app['total_event1']}, {event2_name}={app['total_event2']}")
+            app['event1_name'] = event1_name.strip() if event1_name.strip() else 'Event 1'
+            app['event2_name'] = event2_name.strip() if event2_name.strip() else 'Event 2'
         
         result = {
             'apps': events_list,
@@ -4137,49 +3876,19 @@ def get_events_source():
 def get_events_source_subpage_10d():
     """Get cached events source data for 10d period"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+        conn = db.connect(DB_PATH)
         
-        # Get the most recent fraud cache (which contains events data)
-        c.execute("SELECT data, updated_at FROM fraud_cache WHERE range LIKE 'last10%' ORDER BY updated_at DESC LIMIT 1")
-        row = c.fetchone()
+        # Get the most recent fraud run (which contains events data)
+        row = metrics_store.latest_run(conn, FRAUD, 'last10')
         
         if not row:
             print("[EVENTS_SOURCE_SUBPAGE] No fraud cache found for 10d period")
             conn.close()
             return jsonify({'apps': [], 'updated_at': None})
         
-        data_json, updated_at = row
-        fraud_data = json.loads(data_json)
-        
-        # Transform to events-only format
-        events_list = []
-        for app in fraud_data.get('apps', []):
-            # Filter to events only
-            events_table = []
-            for row in app.get('table', []):
-                event1_count = row.get('event1', 0)
-                event2_count = row.get('event2', 0)
-                
-                if event1_count > 0 or event2_count > 0:
-                    events_table.append({
-                        'date': row.get('date'),
-                        'media_source': row.get('media_source'),
-                        'event1': event1_count,
-                        'event2': event2_count
-                    })
-            
-            if events_table:  # Only include apps with events
-                events_list.append({
-                    'app_id': app.get('app_id'),
-                    'app_name': app.get('app_name'),
-                    'table': events_table,
-                    'event1_name': app.get('event1_name', 'Event 1'),
-                    'event2_name': app.get('event2_name', 'Event 2'),
-                    'total_event1': sum(row.get('event1', 0) for row in events_table),
-                    'total_event2': sum(row.get('event2', 0) for row in events_table)
-                })
-        
+        fraud_key, updated_at = row
+        # Only include apps with events
+        events_list = [app for app in metrics_store.events_by_source(conn, fraud_key) if app['table']]
         conn.close()
         
         result = {
@@ -4206,7 +3915,7 @@ def remove_single_app():
         if not app_id:
             return jsonify({'success': False, 'error': 'App ID is required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         
         # Check if it's a manual app
@@ -4240,6 +3949,7 @@ def remove_single_app():
         
         conn.commit()
         conn.close()
+        hot_cache.invalidate(APPS)
         
         return jsonify({
             'success': True, 
@@ -4262,7 +3972,7 @@ def remove_multiple_apps():
         if not app_ids:
             return jsonify({'success': False, 'error': 'App IDs are required'}), 400
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         
         removed_manual = []
@@ -4302,6 +4012,7 @@ def remove_multiple_apps():
         
         conn.commit()
         conn.close()
+        hot_cache.invalidate(APPS)
         
         return jsonify({
             'success': True, 
@@ -4319,7 +4030,7 @@ def remove_multiple_apps():
 def debug_db_status():
     """Debug endpoint to check database status and persistent storage"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = db.connect(DB_PATH)
         c = conn.cursor()
         
         # Check if apps_cache table exists and count rows
@@ -0,0 +1,141 @@
+import os
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Every AppsFlyer call of the dashboard goes through one AppsFlyerClient, which
+# keeps a pooled requests.Session per process: connections to hq1.appsflyer.com
+# stay open between reports instead of paying a TLS handshake per request.
+
+CONNECT_TIMEOUT = float(os.getenv('APPSFLYER_CONNECT_TIMEOUT', '10'))
+DEFAULT_READ_TIMEOUT = float(os.getenv('APPSFLYER_READ_TIMEOUT', '90'))
+# Idle keep-alive connections kept per host - at least FETCH_PER_HOST_LIMIT
+POOL_SIZE = int(os.getenv('APPSFLYER_POOL_SIZE', '16'))
+
+# endpoint_type -> (API family, URL name). endpoint_type is the name the raw data
+# tables and the export endpoints use, the URL name is the one in the API path.
+# The daily report exists in both families with different columns, so the
+# raw-data one (read by the auto-run fraud pass) is an endpoint type of its own.
+ENDPOINTS = {
+    'daily_report': ('agg-data', 'daily_report'),
+    'raw_daily_report': ('raw-data', 'daily_report'),
+    'installs_report': ('raw-data', 'installs_report'),
+    'blocked_installs_report': ('raw-data', 'blocked_installs_report'),
+    'detection': ('raw-data', 'detection'),
+    'blocked_in_app_events_report': ('raw-data', 'blocked_in_app_events_report'),
+    'fraud_post_inapps': ('raw-data', 'fraud-post-inapps'),
+    'blocked_clicks_report': ('raw-data', 'blocked_clicks_report'),
+    'blocked_install_postbacks': ('raw-data', 'blocked_install_postbacks'),
+    'in_app_events_report': ('raw-data', 'in_app_events_report'),
+}
+_URL_NAMES = {path: endpoint_type for endpoint_type, path in ENDPOINTS.items()}
+_PATH_RE = re.compile(r'/api/(agg-data|raw-data)/export/app/([^/]+)/([^/]+)/v5')
+
+# Read timeouts per endpoint: the aggregated daily report is small, in-app events
+# are by far the largest raw export. Override with e.g.
+# APPSFLYER_TIMEOUTS="in_app_events_report=240,daily_report=45"
+ENDPOINT_READ_TIMEOUTS = {
+    'daily_report': 60,
+    'in_app_events_report': 180,
+    'blocked_in_app_events_report': 120,
+}
+for _item in filter(None, os.getenv('APPSFLYER_TIMEOUTS', '').split(',')):
+    _name, _, _seconds = _item.partition('=')
+    try:
+        ENDPOINT_READ_TIMEOUTS[_name.strip()] = float(_seconds)
+    except ValueError:
+        print(f"[AF CLIENT] Ignoring invalid APPSFLYER_TIMEOUTS entry: {_item}")
+
+
+def endpoint_type_for(url):
+    """endpoint_type of an AppsFlyer export URL (None if it isn't one)"""
+    match = _PATH_RE.search(url or '')
+    return _URL_NAMES.get((match.group(1), match.group(3))) if match else None
+
+
+def app_id_for(url):
+    """App id of an AppsFlyer export URL (None if it isn't one)"""
+    match = _PATH_RE.search(url or '')
+    return match.group(2) if match else None
+
+
+def timeout_for(endpoint_type):
+    """(connect, read) timeout for an endpoint"""
+    return CONNECT_TIMEOUT, ENDPOINT_READ_TIMEOUTS.get(endpoint_type, DEFAULT_READ_TIMEOUT)
+
+
+class AppsFlyerClient:
+    """
+    Pooled, keep-alive HTTP client for the AppsFlyer export APIs.
+
+    The session is created lazily per process (gunicorn workers and forked RQ
+    jobs each get their own connection pool) and is shared by all threads of
+    that process. An optional limiter (api_quota.RateLimiter) is asked for a
+    token before every call - by get(), or by the caller through
+    wait_for_token() when the wait must happen outside a held resource.
+    """
+
+    def __init__(self, base_url, api_key, limiter=None):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.limiter = limiter
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Authorization': f"Bearer {self.api_key}",
+            'Accept-Encoding': 'gzip, deflate',
+        })
+        return session
+
+    @property
+    def session(self):
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._lock:
+                if self._session is None or self._session_pid != pid:
+                    self._session = self._build_session()
+                    self._session_pid = pid
+        return self._session
+
+    def url(self, app_id, endpoint_type):
+        """Export URL of an endpoint for one app"""
+        family, url_name = ENDPOINTS[endpoint_type]
+        return f"{self.base_url}/api/{family}/export/app/{app_id}/{url_name}/v5"
+
+    def wait_for_token(self, url):
+        """Block until the limiter grants a call to url's endpoint (no-op without a limiter)"""
+        if self.limiter is not None:
+            self.limiter.acquire(endpoint_type_for(url))
+
+    def get(self, url, params=None, accept='text/csv', stream=True, timeout=None, token_taken=False):
+        """
+        GET an AppsFlyer URL over the pooled session.
+
+        The timeout defaults to the per-endpoint timeout for the URL. With
+        stream=True the body is left to the caller (SpooledResponse.from_response).
+        token_taken=True skips the limiter when the caller already called
+        wait_for_token().
+        """
+        endpoint_type = endpoint_type_for(url)
+        if not token_taken:
+            self.wait_for_token(url)
+        if timeout is None:
+            timeout = timeout_for(endpoint_type)
+        headers = {'accept': accept} if accept else None
+        return self.session.get(url, params=params, headers=headers, timeout=timeout, stream=stream)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._session_pid = None
@@ -0,0 +1,182 @@
+import hashlib
+import threading
+import time
+
+# Column resolution for AppsFlyer CSV headers.
+#
+# Every fetch used to search its report's header for the columns it needs,
+# normalizing every column name again for every candidate name, although a run
+# sees the same few header layouts thousands of times. resolve() looks up all
+# the fields an endpoint type needs once per distinct header (keyed by a
+# fingerprint of the header row) and memoizes the indices. The first layout
+# seen for an endpoint type is its baseline; a different one later is schema
+# drift - logged with the columns that appeared and disappeared and counted in
+# status(), together with fields a layout doesn't have.
+
+# Distinct (endpoint type, header) layouts kept; the cache starts over beyond that
+SCHEMA_CACHE_MAX = 512
+
+
+def _norm(col):
+    return col.lower().replace('_', '').replace(' ', '')
+
+
+def aliases(*names):
+    """First column equal to one of names (tried in order), ignoring case, spaces and underscores"""
+    wanted = [_norm(name) for name in names]
+
+    def match(header):
+        normalized = [_norm(col) for col in header]
+        for name in wanted:
+            if name in normalized:
+                return normalized.index(name)
+        return None
+    return match
+
+
+def exact(name):
+    """The column named exactly name"""
+    def match(header):
+        return header.index(name) if name in header else None
+    return match
+
+
+def containing(text):
+    """First column whose lowercased name contains text"""
+    def match(header):
+        return next((i for i, col in enumerate(header) if text in col.lower()), None)
+    return match
+
+
+def media_source(header):
+    """'Media Source' in any spelling, else the first column mentioning both media and source"""
+    normalized = [_norm(col).replace('(', '').replace(')', '') for col in header]
+    if 'mediasource' in normalized:
+        return normalized.index('mediasource')
+    return next((i for i, col in enumerate(normalized) if 'media' in col and 'source' in col), None)
+
+
+_DAILY_REPORT = {
+    'date': aliases('date', 'Date'),
+    'impressions': aliases('impressions', 'Impressions'),
+    'clicks': aliases('clicks', 'Clicks'),
+    'installs': aliases('installs', 'Installs'),
+    'media_source': aliases('media_source', 'media source', 'Media Source', 'Media Source (pid)',
+                            'media_source (pid)', 'pid', 'Media Source (PID)', 'media_source (PID)'),
+}
+_INSTALL_TIME = {'time': exact('Install Time'), 'media_source': media_source}
+_EVENT_TIME = {'time': exact('Event Time'), 'media_source': media_source, 'event_name': exact('Event Name')}
+
+# Fields each endpoint type's report is read with
+SCHEMAS = {
+    'daily_report': _DAILY_REPORT,
+    # The auto-run fraud pass reads the daily report for its date and media source only
+    'daily_report_auto_fraud': {'date': containing('date'), 'media_source': media_source},
+    'installs_report': _INSTALL_TIME,
+    'blocked_installs_report': _INSTALL_TIME,
+    'detection': _INSTALL_TIME,
+    'blocked_install_postbacks': _INSTALL_TIME,
+    'in_app_events_report': _EVENT_TIME,
+    'blocked_in_app_events_report': _EVENT_TIME,
+    'fraud_post_inapps': _EVENT_TIME,
+    'blocked_clicks_report': {'time': exact('Click Time'), 'media_source': media_source},
+}
+
+
+def fingerprint(header):
+    return hashlib.sha1('\x1f'.join(header).encode('utf-8')).hexdigest()[:12]
+
+
+class SchemaRegistry:
+    """Memoized header -> column indices per endpoint type, with drift tracking"""
+
+    def __init__(self, schemas=None):
+        self.schemas = SCHEMAS if schemas is None else schemas
+        self._resolved = {}
+        self._lock = threading.Lock()
+        self._baselines = {}
+        self._stats = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, endpoint_type, header):
+        """
+        Column index of every field of endpoint_type in header (None where missing).
+
+        The dict returned is shared between callers - don't modify it.
+        """
+        key = (endpoint_type, tuple(header))
+        with self._lock:
+            columns = self._resolved.get(key)
+            if columns is not None:
+                self.hits += 1
+                return columns
+        columns = {field: match(header) for field, match in self.schemas[endpoint_type].items()}
+        with self._lock:
+            self.misses += 1
+            if len(self._resolved) >= SCHEMA_CACHE_MAX:
+                self._resolved.clear()
+            self._resolved[key] = columns
+            self._record(endpoint_type, header, columns)
+        return columns
+
+    def _record(self, endpoint_type, header, columns):
+        stats = self._stats.setdefault(endpoint_type, {'layouts': set(), 'drift_events': 0, 'last_drift': None,
+                                                        'missing_fields': {}})
+        layout = fingerprint(header)
+        if layout in stats['layouts']:
+            return
+        stats['layouts'].add(layout)
+        missing = [field for field, index in columns.items() if index is None]
+        for field in missing:
+            stats['missing_fields'][field] = stats['missing_fields'].get(field, 0) + 1
+        if missing:
+            print(f"[SCHEMA] {endpoint_type} header {layout} has no {', '.join(missing)} column: {header}")
+        baseline = self._baselines.get(endpoint_type)
+        if baseline is None:
+            self._baselines[endpoint_type] = (layout, list(header))
+            return
+        added = [col for col in header if col not in baseline[1]]
+        removed = [col for col in baseline[1] if col not in header]
+        stats['drift_events'] += 1
+        stats['last_drift'] = {
+            'fingerprint': layout,
+            'added': added,
+            'removed': removed,
+            'reordered': not added and not removed,
+            'seen_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        print(f"[SCHEMA] {endpoint_type} header drifted from {baseline[0]} to {layout}: "
+              f"added {added or '-'}, removed {removed or '-'}")
+
+    def status(self):
+        """Cache counters and, per endpoint type, its baseline layout and drift seen (this process only)"""
+        with self._lock:
+            endpoints = {
+                endpoint_type: {
+                    'baseline': self._baselines[endpoint_type][0],
+                    'layouts': len(stats['layouts']),
+                    'drift_events': stats['drift_events'],
+                    'last_drift': stats['last_drift'],
+                    'missing_fields': dict(stats['missing_fields']),
+                }
+                for endpoint_type, stats in self._stats.items()
+            }
+            return {
+                'lookups': self.hits + self.misses,
+                'hits': self.hits,
+                'cached_layouts': len(self._resolved),
+                'endpoints': endpoints,
+            }
+
+
+_registry = SchemaRegistry()
+
+
+def resolve(endpoint_type, header):
+    """Column indices of endpoint_type's fields in header, memoized per header layout"""
+    return _registry.resolve(endpoint_type, header)
+
+
+def status():
+    return _registry.status()
@@ -0,0 +1,344 @@
+import codecs
+import csv
+import os
+import tempfile
+from io import StringIO
+from collections import Counter
+
+# Bodies up to this size stay in memory, anything larger is spilled to a temp file
+CSV_SPOOL_MAX_MEMORY = int(os.getenv('CSV_SPOOL_MAX_MEMORY', str(8 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+
+# count_by_key parses spooled reports of at least this size with pyarrow and
+# groups them with NumPy instead of counting row by row (needs both installed;
+# CSV_VECTORIZE=0 turns it off)
+CSV_VECTORIZE = os.getenv('CSV_VECTORIZE', '1') == '1'
+CSV_VECTORIZE_MIN_BYTES = int(os.getenv('CSV_VECTORIZE_MIN_BYTES', str(1024 * 1024)))
+CSV_VECTORIZE_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def _response_encoding(resp):
+    # requests falls back to ISO-8859-1 for text/* without a charset, but AppsFlyer sends UTF-8
+    content_type = resp.headers.get('Content-Type', '') if resp.headers else ''
+    if 'charset' in content_type.lower() and resp.encoding:
+        return resp.encoding
+    return 'utf-8-sig'
+
+
+class SpooledResponse:
+    """
+    A successful AppsFlyer response whose body has been downloaded in chunks
+    into a spooled temp file, so large reports never sit in memory as one string.
+    """
+
+    def __init__(self, status_code=200, headers=None, url=None, encoding='utf-8-sig'):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.url = url
+        self.encoding = encoding
+        self.from_cache = False
+        self._body = tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_MAX_MEMORY)
+        self.size = 0
+
+    @classmethod
+    def from_response(cls, resp):
+        """Spool a streamed requests response (the response is closed afterwards)"""
+        spooled = cls(resp.status_code, resp.headers, resp.url, _response_encoding(resp))
+        try:
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                if chunk:
+                    spooled._body.write(chunk)
+        finally:
+            resp.close()
+        spooled.size = spooled._body.tell()
+        return spooled
+
+    @classmethod
+    def from_text(cls, text, url=None):
+        """Wrap an already downloaded report, e.g. one served from the raw data cache"""
+        spooled = cls(200, {'Content-Type': 'text/csv; charset=utf-8'}, url, 'utf-8')
+        for start in range(0, len(text), CHUNK_SIZE):
+            spooled._body.write(text[start:start + CHUNK_SIZE].encode('utf-8'))
+        spooled.size = spooled._body.tell()
+        return spooled
+
+    def iter_chunks(self):
+        """Yield the raw body bytes in fixed-size chunks"""
+        self._body.seek(0)
+        for chunk in iter(lambda: self._body.read(CHUNK_SIZE), b''):
+            yield chunk
+
+    def iter_lines(self):
+        """Yield decoded lines (with their line endings) without loading the whole body"""
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        pending = ''
+        for chunk in self.iter_chunks():
+            pending += decoder.decode(chunk)
+            lines = pending.split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending
+
+    def open_body(self):
+        """The raw body as a binary file, positioned at the start"""
+        self._body.seek(0)
+        return self._body
+
+    @property
+    def text(self):
+        """Full decoded body - only for callers that really need the whole report"""
+        return ''.join(self.iter_lines())
+
+    def close(self):
+        self._body.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class CsvRows:
+    """Lazy rows of a report opened with open_csv; keeps the response so count_by_key can parse it vectorized"""
+
+    def __init__(self, resp, header, reader):
+        self.resp = resp
+        self.header = header
+        self.started = False
+        self._reader = reader
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.started = True
+        return next(self._reader)
+
+
+def open_csv(resp):
+    """
+    Start streaming a CSV report.
+
+    Returns:
+        (header, rows) where header is the first row (or None for an empty body)
+        and rows is a lazy iterator over the remaining non-empty rows.
+    """
+    reader = (row for row in csv.reader(resp.iter_lines()) if row)
+    header = next(reader, None)
+    return header, CsvRows(resp, header, reader)
+
+
+def count_by_key(rows, date_idx, media_source_idx=None, by_media_source=False,
+                 default_media_source='Unknown', event_name_idx=None, event_names=None):
+    """
+    Count rows per (date, media_source, event_name) in a single pass.
+
+    Memory is bounded by the number of distinct keys, not by the number of rows.
+    The date is the part of the time column before the first space. Rows
+    straight from open_csv of a large spooled report are counted vectorized
+    (see _count_vectorized), anything else row by row.
+
+    Args:
+        rows: iterator of parsed CSV rows (header already consumed)
+        date_idx: index of the time/date column
+        media_source_idx: index of the media source column (None if not present)
+        by_media_source: group by media source; when False the key holds None
+        default_media_source: used when the row has no media source value;
+            pass None to skip such rows instead
+        event_name_idx: index of the event name column (None to ignore events)
+        event_names: only count rows whose event name is in this collection
+    """
+    if _vectorizable(rows):
+        counts = _count_vectorized(rows.resp, rows.header, date_idx, media_source_idx, by_media_source,
+                                   default_media_source, event_name_idx, event_names)
+        if counts is not None:
+            return counts
+        # The body has been read past - start over from the top
+        _, rows = open_csv(rows.resp)
+    counts = Counter()
+    _count_rows(counts, rows, date_idx, media_source_idx, by_media_source,
+                default_media_source, event_name_idx, event_names)
+    return counts
+
+
+def _count_rows(counts, rows, date_idx, media_source_idx, by_media_source,
+                default_media_source, event_name_idx, event_names):
+    required = [date_idx]
+    if event_name_idx is not None:
+        required.append(event_name_idx)
+    if by_media_source and default_media_source is None and media_source_idx is not None:
+        required.append(media_source_idx)
+    min_len = max(required) + 1
+    ms_len = media_source_idx + 1 if media_source_idx is not None else None
+
+    for row in rows:
+        if len(row) < min_len:
+            continue
+        event_name = None
+        if event_name_idx is not None:
+            event_name = row[event_name_idx]
+            if event_names is not None and event_name not in event_names:
+                continue
+        media_source = None
+        if by_media_source:
+            if ms_len is not None and len(row) >= ms_len:
+                media_source = row[media_source_idx].strip()
+            elif default_media_source is None:
+                continue
+            else:
+                media_source = default_media_source
+        counts[(row[date_idx].split(" ")[0], media_source, event_name)] += 1
+
+
+def _vector_modules():
+    try:
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        return None
+    return np, pa, pc, pa_csv
+
+
+def _vectorizable(rows):
+    return (CSV_VECTORIZE and isinstance(rows, CsvRows) and not rows.started and rows.header
+            and hasattr(rows.resp, 'open_body') and rows.resp.size >= CSV_VECTORIZE_MIN_BYTES
+            and rows.resp.encoding.lower().replace('_', '-') in ('utf-8', 'utf-8-sig', 'utf8')
+            and _vector_modules() is not None)
+
+
+def _count_vectorized(resp, header, date_idx, media_source_idx, by_media_source,
+                      default_media_source, event_name_idx, event_names):
+    """
+    count_by_key over a whole spooled report, parsed by pyarrow a block at a time.
+
+    The time column is cut to its date in Arrow and every key column is
+    dictionary-encoded, so each row becomes integer codes (dates become day
+    ordinals). Only the distinct values are decoded and normalized in Python
+    (stripped media source), the per-row codes are combined into one key and
+    counted with NumPy - the result is exactly count_by_key's. Rows whose
+    field count differs from the header go to the row-by-row counter.
+    Returns None if the report can't be parsed this way.
+    """
+    np, pa, pc, pa_csv = _vector_modules()
+    use_ms = by_media_source and media_source_idx is not None
+    if by_media_source and media_source_idx is None and default_media_source is None:
+        # Rows without a media source are skipped - that is all of them
+        return Counter()
+    key_columns = [date_idx] + ([media_source_idx] if use_ms else []) + \
+        ([event_name_idx] if event_name_idx is not None else [])
+    # The date is cut from the time column in Arrow, before encoding
+    normalizers = [None] + ([str.strip] if use_ms else []) + ([None] if event_name_idx is not None else [])
+    if max(key_columns) >= len(header):
+        return None
+    names = [f'c{i}' for i in range(len(header))]
+    counts = Counter()
+
+    def irregular_row(row):
+        _count_rows(counts, csv.reader([row.text]), date_idx, media_source_idx, by_media_source,
+                    default_media_source, event_name_idx, event_names)
+        return 'skip'
+
+    try:
+        reader = pa_csv.open_csv(
+            resp.open_body(),
+            read_options=pa_csv.ReadOptions(column_names=names, skip_rows=1, block_size=CSV_VECTORIZE_BLOCK_SIZE),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True, invalid_row_handler=irregular_row),
+            # Raw bytes: decoding and normalizing happen once per distinct value
+            convert_options=pa_csv.ConvertOptions(include_columns=[names[i] for i in key_columns],
+                                                  column_types={names[i]: pa.binary() for i in key_columns}))
+        for batch in reader:
+            if batch.num_rows == 0:
+                continue
+            codes, values = [], []
+            for position, (i, normalize) in enumerate(zip(key_columns, normalizers)):
+                column = batch.column(names[i])
+                if position == 0:
+                    column = pc.list_element(pc.split_pattern(column, b' ', max_splits=1), 0)
+                encoded = pc.dictionary_encode(column)
+                code = encoded.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+                column_values = [value.decode('utf-8', 'replace') for value in encoded.dictionary.to_pylist()]
+                if normalize is not None:
+                    positions = {}
+                    remap = np.array([positions.setdefault(normalize(value), len(positions)) for value in column_values],
+                                     dtype=np.int64)
+                    code = remap[code]
+                    column_values = list(positions)
+                codes.append(code)
+                values.append(column_values)
+            if event_name_idx is not None and event_names is not None:
+                wanted = np.array([value in event_names for value in values[-1]], dtype=bool)
+                mask = wanted[codes[-1]]
+                codes = [code[mask] for code in codes]
+            key = codes[0]
+            for code, column_values in zip(codes[1:], values[1:]):
+                key = key * len(column_values) + code
+            if np.prod([len(column_values) for column_values in values]) <= max(len(key), 1 << 16):
+                key_counts = np.bincount(key)
+                keys = np.flatnonzero(key_counts)
+                key_counts = key_counts[keys]
+            else:
+                keys, key_counts = np.unique(key, return_counts=True)
+            for combined, count in zip(keys.tolist(), key_counts.tolist()):
+                parts = []
+                for column_values in reversed(values[1:]):
+                    combined, code = divmod(combined, len(column_values))
+                    parts.append(column_values[code])
+                parts.append(values[0][combined])
+                parts.reverse()
+                date = parts[0]
+                if use_ms:
+                    media_source = parts[1]
+                else:
+                    media_source = default_media_source if by_media_source else None
+                event_name = parts[-1] if event_name_idx is not None else None
+                counts[(date, media_source, event_name)] += count
+    except (pa.ArrowException, ValueError) as e:
+        print(f"[CSV] Vectorized count failed, counting row by row: {e}")
+        return None
+    return counts
+
+
+# Columns AppsFlyer filters the from/to window on, most specific first
+WINDOW_DATE_COLUMNS = ['Event Time', 'Click Time', 'Install Time', 'Date']
+
+
+def window_date_idx(header):
+    """Index of the column a report's date window applies to (None if unknown)"""
+    for name in WINDOW_DATE_COLUMNS:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+def splice_csv_window(old_text, new_text, keep_from, keep_until):
+    """
+    Combine a stored report with a fresher slice of the same report.
+
+    Rows of old_text dated keep_from <= date < keep_until are kept and the rows
+    of new_text (which covers keep_until onwards) are appended. Returns None if
+    the two reports can't be combined (different or unknown layout).
+    """
+    old_reader = csv.reader(StringIO(old_text))
+    old_header = next(old_reader, None)
+    header_end = new_text.find('\n')
+    header_line = new_text if header_end < 0 else new_text[:header_end + 1]
+    new_header = next(csv.reader([header_line]), None)
+    date_idx = window_date_idx(old_header) if old_header else None
+    if not new_header or old_header != new_header or date_idx is None:
+        return None
+    out = StringIO()
+    out.write(header_line if header_line.endswith('\n') else header_line + '\n')
+    writer = csv.writer(out, lineterminator='\n')
+    for row in old_reader:
+        if len(row) > date_idx and keep_from <= row[date_idx].split(" ")[0] < keep_until:
+            writer.writerow(row)
+    if header_end >= 0:
+        out.write(new_text[header_end + 1:])
+    return out.getvalue()
@@ -0,0 +1,89 @@
+import datetime
+import json
+import os
+
+# Day-partitioned store for the stats and fraud pipelines.
+#
+# Every successful per-app fetch is split into one row per (source, app, day).
+# A day counts as closed once it was fetched at least INCREMENTAL_OPEN_DAYS days
+# after it ended (AppsFlyer keeps attributing late installs/events for a while),
+# so rolling periods like last10/30d only refetch the trailing open days and
+# merge them with the stored closed ones. Set INCREMENTAL_OPEN_DAYS=0 to disable.
+INCREMENTAL_OPEN_DAYS = int(os.getenv('INCREMENTAL_OPEN_DAYS', '2'))
+
+
+def init_day_partitions(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS day_partitions (
+        source TEXT NOT NULL,
+        app_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        variant TEXT NOT NULL DEFAULT '',
+        rows TEXT NOT NULL,
+        fetched_on TEXT NOT NULL,
+        PRIMARY KEY (source, app_id, date)
+    )''')
+
+
+def window_days(start_date, end_date):
+    """All YYYY-MM-DD days from start_date to end_date inclusive"""
+    day = datetime.date.fromisoformat(start_date)
+    end = datetime.date.fromisoformat(end_date)
+    days = []
+    while day <= end:
+        days.append(day.isoformat())
+        day += datetime.timedelta(days=1)
+    return days
+
+
+def is_closed(date, fetched_on, open_days=None):
+    """A day is final once it was fetched open_days (or more) days after it"""
+    open_days = INCREMENTAL_OPEN_DAYS if open_days is None else open_days
+    return (datetime.date.fromisoformat(fetched_on) - datetime.date.fromisoformat(date)).days >= open_days
+
+
+def plan_refresh(conn, source, app_id, variant, start_date, end_date):
+    """
+    Work out which part of the window still has to be fetched.
+
+    Returns:
+        (fetch_from, closed_rows) - fetch_from is the first day that must be
+        fetched again (None if every day is closed) and closed_rows are the
+        stored table rows of the closed days before it, in date order.
+    """
+    days = window_days(start_date, end_date)
+    if INCREMENTAL_OPEN_DAYS <= 0:
+        return start_date, []
+    c = conn.cursor()
+    c.execute('''SELECT date, variant, rows, fetched_on FROM day_partitions
+                 WHERE source = ? AND app_id = ? AND date BETWEEN ? AND ?''',
+              (source, app_id, start_date, end_date))
+    stored = {date: (stored_variant, rows, fetched_on) for date, stored_variant, rows, fetched_on in c.fetchall()}
+    closed_rows = []
+    for day in days:
+        partition = stored.get(day)
+        if partition is None or partition[0] != variant or not is_closed(day, partition[2]):
+            return day, closed_rows
+        closed_rows.extend(json.loads(partition[1]))
+    return None, closed_rows
+
+
+def store_days(conn, source, app_id, variant, start_date, end_date, table):
+    """Save the rows of a complete fetch of start_date..end_date as one partition per day"""
+    if INCREMENTAL_OPEN_DAYS <= 0:
+        return
+    by_day = {day: [] for day in window_days(start_date, end_date)}
+    for row in table:
+        if row.get('date') in by_day:
+            by_day[row['date']].append(row)
+    today = datetime.date.today().isoformat()
+    conn.executemany('''INSERT OR REPLACE INTO day_partitions (source, app_id, date, variant, rows, fetched_on)
+                        VALUES (?, ?, ?, ?, ?, ?)''',
+                     [(source, app_id, day, variant, json.dumps(rows), today) for day, rows in by_day.items()])
+
+
+def clear_partitions(conn, *sources):
+    """Forget stored days so the next run refetches the whole window"""
+    if sources:
+        conn.executemany('DELETE FROM day_partitions WHERE source = ?', [(source,) for source in sources])
+    else:
+        conn.execute('DELETE FROM day_partitions')
@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import threading
+
+# Shared SQLite connection layer.
+#
+# Every database access goes through connect(): it hands out a pooled
+# connection of the calling thread instead of opening a new one, and close()
+# puts it back (rolling back anything left uncommitted) rather than closing it.
+# Connections are opened with a busy timeout and the pragmas below, and the
+# database is switched to WAL so the auto-run thread and the RQ worker can
+# write while the gunicorn workers keep reading. Pools are per process - a
+# forked worker (gunicorn --preload) starts with none of its parent's.
+
+# How long a statement waits for a lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '30'))
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+# Page cache per connection, in KiB
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', str(16 * 1024)))
+# Idle connections kept per thread and database; more are closed when released
+SQLITE_POOL_IDLE = int(os.getenv('SQLITE_POOL_IDLE', '2'))
+
+
+class PooledConnection:
+    """
+    A pooled sqlite3 connection. Behaves like the connection itself, except
+    that close() hands it back to the pool, and using it as a context manager
+    commits (or rolls back on error) and then hands it back.
+    """
+
+    def __init__(self, pool, path, conn):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_path', path)
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_thread', threading.get_ident())
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def close(self):
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, '_conn', None)
+            # Only the owning thread may touch it; elsewhere (garbage collection) it is just dropped
+            if threading.get_ident() == self._thread:
+                self._pool.release(self._path, conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        # A connection that was never closed still goes back to the pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Per-thread pools of configured connections, one set per database file"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._prepared = set()
+
+    def _idle(self, path):
+        if self._pid != os.getpid():
+            # Forked: connections opened by the parent must not be used here
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._local = threading.local()
+                    self._prepared = set()
+                    self._pid = os.getpid()
+        pools = getattr(self._local, 'pools', None)
+        if pools is None:
+            pools = self._local.pools = {}
+        return pools.setdefault(path, [])
+
+    def connect(self, path):
+        idle = self._idle(path)
+        conn = idle.pop() if idle else self._open(path)
+        return PooledConnection(self, path, conn)
+
+    def release(self, path, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            conn.text_factory = str
+        except sqlite3.Error:
+            conn.close()
+            return
+        idle = self._idle(path)
+        if len(idle) < SQLITE_POOL_IDLE:
+            idle.append(conn)
+        else:
+            conn.close()
+
+    def _open(self, path):
+        conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT)
+        if path not in self._prepared:
+            # journal_mode is stored in the database file - set it once per process
+            mode = conn.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}').fetchone()[0]
+            if mode.lower() != SQLITE_JOURNAL_MODE.lower():
+                print(f"[DB] journal_mode {SQLITE_JOURNAL_MODE} not available for {path}, using {mode}")
+            with self._lock:
+                self._prepared.add(path)
+        conn.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+        conn.execute(f'PRAGMA cache_size={-SQLITE_CACHE_SIZE_KB}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+
+_pool = ConnectionPool()
+
+
+def connect(path):
+    """Pooled connection to the database at path - close() it when done, as with sqlite3"""
+    return _pool.connect(path)
@@ -0,0 +1,114 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Concurrency settings - can be tuned per deployment via environment variables
+FETCH_MAX_APPS = int(os.getenv('FETCH_MAX_APPS', '8'))
+FETCH_MAX_ENDPOINTS = int(os.getenv('FETCH_MAX_ENDPOINTS', '16'))
+FETCH_PER_HOST_LIMIT = int(os.getenv('FETCH_PER_HOST_LIMIT', '6'))
+
+_host_semaphores = {}
+_host_lock = threading.Lock()
+_endpoint_pool = None
+_endpoint_pool_lock = threading.Lock()
+
+
+def configure(max_apps=None, max_endpoints=None, per_host_limit=None):
+    """Override the concurrency settings (used by benchmarks and tests)"""
+    global FETCH_MAX_APPS, FETCH_MAX_ENDPOINTS, FETCH_PER_HOST_LIMIT, _endpoint_pool
+    with _host_lock:
+        if max_apps is not None:
+            FETCH_MAX_APPS = max(1, int(max_apps))
+        if per_host_limit is not None:
+            FETCH_PER_HOST_LIMIT = max(1, int(per_host_limit))
+            _host_semaphores.clear()
+    with _endpoint_pool_lock:
+        if max_endpoints is not None:
+            FETCH_MAX_ENDPOINTS = max(1, int(max_endpoints))
+            if _endpoint_pool is not None:
+                _endpoint_pool.shutdown(wait=False)
+                _endpoint_pool = None
+
+
+def _get_host_semaphore(url):
+    host = urlparse(url).netloc or url
+    with _host_lock:
+        sem = _host_semaphores.get(host)
+        if sem is None:
+            sem = threading.BoundedSemaphore(FETCH_PER_HOST_LIMIT)
+            _host_semaphores[host] = sem
+        return sem
+
+
+@contextmanager
+def host_slot(url):
+    """Hold one of the per-host connection slots while a request is in flight"""
+    sem = _get_host_semaphore(url)
+    sem.acquire()
+    try:
+        yield
+    finally:
+        sem.release()
+
+
+def _get_endpoint_pool():
+    global _endpoint_pool
+    with _endpoint_pool_lock:
+        if _endpoint_pool is None:
+            _endpoint_pool = ThreadPoolExecutor(max_workers=FETCH_MAX_ENDPOINTS, thread_name_prefix='af-endpoint')
+        return _endpoint_pool
+
+
+def fetch_endpoints(calls):
+    """
+    Run independent endpoint calls concurrently.
+
+    Args:
+        calls: dict of name -> (func, args, kwargs)
+
+    Returns:
+        dict of name -> result. A call that raised is reported as None so one
+        failing endpoint never takes down the rest of the app.
+    """
+    if not calls:
+        return {}
+    pool = _get_endpoint_pool()
+    futures = {name: pool.submit(func, *args, **kwargs) for name, (func, args, kwargs) in calls.items()}
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            print(f"[FETCH] Endpoint call '{name}' failed: {e}")
+            results[name] = None
+    return results
+
+
+def map_apps(func, apps, max_workers=None):
+    """Apply func to every app with bounded concurrency, returning results in input order"""
+    apps = list(apps)
+    if not apps:
+        return []
+    workers = min(max_workers or FETCH_MAX_APPS, len(apps))
+    if workers <= 1:
+        return [func(app) for app in apps]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='af-app') as pool:
+        return list(pool.map(func, apps))
+
+
+def iter_apps(func, apps, max_workers=None):
+    """Like map_apps, but yield (index, result) as each app finishes instead of waiting for all of them"""
+    apps = list(apps)
+    if not apps:
+        return
+    workers = min(max_workers or FETCH_MAX_APPS, len(apps))
+    if workers <= 1:
+        for index, app in enumerate(apps):
+            yield index, func(app)
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='af-app') as pool:
+        futures = {pool.submit(func, app): index for index, app in enumerate(apps)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import os
+
+from redis.exceptions import RedisError, WatchError
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Read-through Redis cache for the dashboard's tab-switch responses.
+#
+# A cached response is one Redis hash holding its ETag and the body in every
+# encoding the dashboard may ask for (identity, gzip, br), all computed once
+# when the response is built - a hit is a single HMGET of the ETag and the one
+# encoding needed, with no hashing or compression per request. Each entry
+# belongs to one or more scopes ('stats', 'fraud', 'apps') and writers call
+# invalidate(scope) after committing: that bumps the scope's
+# generation and deletes its entries. An entry is only stored if the
+# generations it was built under are unchanged (WATCH), so a response built
+# from data that was replaced mid-build is never cached. HOT_CACHE_TTL bounds
+# how long an entry can outlive a write that forgot to invalidate.
+
+HOT_CACHE_TTL = int(os.getenv('HOT_CACHE_TTL', '300'))
+# Smaller bodies are sent as they are
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+
+APPS = 'apps'
+
+# Content codings we can serve, preferred first
+ENCODINGS = (['br'] if brotli is not None else []) + ['gzip', 'identity']
+
+
+def etag_for(body):
+    """Validator for a response body (served weak: same content in every encoding)"""
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def encode(body, encoding):
+    """body in a content coding; b'' when it isn't worth compressing"""
+    if encoding == 'identity':
+        return body
+    if len(body) < COMPRESS_MIN_BYTES:
+        return b''
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def variants(body, encodings=ENCODINGS):
+    """{'etag': ..., <encoding>: bytes} for storing a response with put()"""
+    fields = {'etag': etag_for(body)}
+    for encoding in encodings:
+        fields[encoding] = encode(body, encoding)
+    return fields
+
+
+class HotCache:
+    """Scoped response cache; does nothing without a Redis connection (or with HOT_CACHE_TTL=0)"""
+
+    def __init__(self, redis_conn=None, ttl=None, prefix='hot'):
+        self.redis = redis_conn
+        self.ttl = HOT_CACHE_TTL if ttl is None else ttl
+        self.prefix = prefix
+
+    @property
+    def enabled(self):
+        return self.redis is not None and self.ttl > 0
+
+    def _entry(self, name):
+        return f"{self.prefix}:entry:{name}"
+
+    def _gen(self, scope):
+        return f"{self.prefix}:gen:{scope}"
+
+    def _members(self, scope):
+        return f"{self.prefix}:keys:{scope}"
+
+    def get(self, name, fields):
+        """Values of the given fields of a cached response, or None if it isn't cached"""
+        if not self.enabled:
+            return None
+        try:
+            values = self.redis.hmget(self._entry(name), fields)
+        except RedisError as e:
+            print(f"[HOT_CACHE] Read of {name} failed: {e}")
+            return None
+        return None if values[0] is None else values
+
+    def generations(self, scopes):
+        """Current generations of scopes - take them before building a response"""
+        if not self.enabled:
+            return None
+        try:
+            return tuple(self.redis.mget([self._gen(scope) for scope in scopes]))
+        except RedisError as e:
+            print(f"[HOT_CACHE] Could not read generations: {e}")
+            return None
+
+    def put(self, name, scopes, fields, generations):
+        """Store a response (see variants()) unless one of the scopes was invalidated since generations were taken"""
+        if not self.enabled or generations is None:
+            return False
+        gen_keys = [self._gen(scope) for scope in scopes]
+        key = self._entry(name)
+        try:
+            with self.redis.pipeline() as pipe:
+                pipe.watch(*gen_keys)
+                if tuple(pipe.mget(gen_keys)) != generations:
+                    return False
+                pipe.multi()
+                pipe.delete(key)
+                pipe.hset(key, mapping=fields)
+                pipe.expire(key, self.ttl)
+                for scope in scopes:
+                    pipe.sadd(self._members(scope), key)
+                pipe.execute()
+            return True
+        except WatchError:
+            return False
+        except RedisError as e:
+            print(f"[HOT_CACHE] Write of {name} failed: {e}")
+            return False
+
+    def invalidate(self, *scopes):
+        """Drop every entry of the given scopes (call after the write has been committed)"""
+        if self.redis is None:
+            return
+        try:
+            # Bump first: builds that started before this can no longer store their result
+            pipe = self.redis.pipeline()
+            for scope in scopes:
+                pipe.incr(self._gen(scope))
+                pipe.smembers(self._members(scope))
+                pipe.delete(self._members(scope))
+            results = pipe.execute()
+            keys = set()
+            for members in results[1::3]:
+                keys.update(members)
+            if keys:
+                self.redis.delete(*keys)
+        except RedisError as e:
+            print(f"[HOT_CACHE] Invalidation of {', '.join(scopes)} failed: {e}")
@@ -0,0 +1,564 @@
+import hashlib
+import json
+
+# Normalized store for the stats and fraud reports.
+#
+# stats_cache / fraud_cache keep one row per report run (range key + updated_at);
+# the report itself lives here as one row per app in metric_apps and one row per
+# (app, date, media_source) in metric_facts, so dashboard reads are SQL aggregates
+# instead of json.loads over the whole report. Besides the range key
+# (period:event1:event2:app_ids for stats, period:app_ids for fraud) each run
+# row carries the period and hashes of the events and app set, so "latest run
+# for a period" is an index lookup on (period, updated_at). The overview's
+# rollups (daily totals of a stats run, top fraud sources of a fraud run) are
+# computed once when a run is written and kept in run_summaries. Whatever of an
+# app entry or table row load_run() can't rebuild from these columns (fields
+# outside them, values that differ from the derived ones) is kept as JSON in
+# the rows' extra column, so a run reads back exactly as it was written.
+
+STATS = 'stats'
+FRAUD = 'fraud'
+
+FACT_COLUMNS = [
+    'impressions', 'clicks', 'installs', 'blocked_installs_rt', 'blocked_installs_pa',
+    'blocked_in_app_events', 'fraud_post_inapps', 'blocked_clicks', 'blocked_install_postbacks',
+    'event1', 'event2'
+]
+STATS_COLUMNS = ['impressions', 'clicks', 'installs', 'blocked_installs_rt', 'blocked_installs_pa']
+FRAUD_COLUMNS = [
+    'blocked_installs_rt', 'blocked_installs_pa', 'blocked_in_app_events', 'fraud_post_inapps',
+    'blocked_clicks', 'blocked_install_postbacks', 'event1', 'event2'
+]
+
+_CACHE_TABLES = {STATS: 'stats_cache', FRAUD: 'fraud_cache'}
+
+
+def run_key_parts(kind, range_key):
+    """(period, events_hash, apps_hash) of a run's range key"""
+    period, _, rest = range_key.partition(':')
+    if kind == STATS:
+        events, _, app_ids = rest.rpartition(':')
+    else:
+        events, app_ids = '', rest
+    return period, _digest(events), _digest(app_ids)
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _init_run_index(c, kind, table):
+    # Older databases: add the lookup columns and fill them in from the range keys
+    columns = [row[1] for row in c.execute(f'PRAGMA table_info({table})')]
+    for column in ('period', 'events_hash', 'apps_hash'):
+        if column not in columns:
+            c.execute(f'ALTER TABLE {table} ADD COLUMN {column} TEXT')
+    c.execute(f'SELECT range FROM {table} WHERE period IS NULL')
+    c.executemany(f'UPDATE {table} SET period = ?, events_hash = ?, apps_hash = ? WHERE range = ?',
+                  [(*run_key_parts(kind, range_key), range_key) for range_key, in c.fetchall()])
+    c.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_period ON {table} (period, updated_at)')
+
+
+def _add_columns(c, table, columns):
+    existing = [row[1] for row in c.execute(f'PRAGMA table_info({table})')]
+    for column, definition in columns:
+        if column not in existing:
+            c.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def init_metrics_store(conn):
+    """Create the metric tables and move any legacy JSON blobs into them"""
+    c = conn.cursor()
+    for kind, table in _CACHE_TABLES.items():
+        _init_run_index(c, kind, table)
+    c.execute('''CREATE TABLE IF NOT EXISTS metric_apps (
+        kind TEXT NOT NULL,
+        range TEXT NOT NULL,
+        app_id TEXT NOT NULL,
+        app_name TEXT,
+        position INTEGER NOT NULL,
+        event1_name TEXT,
+        event2_name TEXT,
+        selected_events TEXT,
+        errors TEXT,
+        error TEXT,
+        extra TEXT,
+        PRIMARY KEY (kind, range, app_id)
+    )''')
+    c.execute(f'''CREATE TABLE IF NOT EXISTS metric_facts (
+        kind TEXT NOT NULL,
+        range TEXT NOT NULL,
+        app_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        media_source TEXT NOT NULL DEFAULT '',
+        {', '.join(f'{col} INTEGER NOT NULL DEFAULT 0' for col in FACT_COLUMNS)},
+        position INTEGER,
+        extra TEXT,
+        PRIMARY KEY (kind, range, app_id, date, media_source)
+    )''')
+    # Older databases: rows written before these columns load in (date, media_source) order
+    _add_columns(c, 'metric_apps', [('extra', 'TEXT')])
+    _add_columns(c, 'metric_facts', [('position', 'INTEGER'), ('extra', 'TEXT')])
+    # Per-date rollups across apps (overview trend, exports by date)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_metric_facts_date ON metric_facts (kind, range, date)')
+    c.execute('''CREATE TABLE IF NOT EXISTS run_summaries (
+        kind TEXT NOT NULL,
+        range TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        PRIMARY KEY (kind, range)
+    )''')
+
+    for kind, table in _CACHE_TABLES.items():
+        c.execute(f'''SELECT range, data FROM {table}
+                      WHERE data IS NOT NULL AND data != ''
+                        AND range NOT IN (SELECT range FROM metric_apps WHERE kind = ?)''', (kind,))
+        for range_key, data in c.fetchall():
+            try:
+                save_run(conn, kind, range_key, json.loads(data).get('apps', []))
+            except (ValueError, AttributeError) as e:
+                print(f"[METRICS] Could not migrate {table} row {range_key}: {e}")
+                continue
+            c.execute(f'UPDATE {table} SET data = NULL WHERE range = ?', (range_key,))
+            print(f"[METRICS] Migrated {table} row {range_key} to metric tables")
+
+
+def write_report(conn, kind, range_key, apps):
+    """Record a finished report run: its cache row plus the normalized app and fact rows"""
+    conn.execute(f'''REPLACE INTO {_CACHE_TABLES[kind]} (range, data, updated_at, period, events_hash, apps_hash)
+                     VALUES (?, NULL, CURRENT_TIMESTAMP, ?, ?, ?)''', (range_key, *run_key_parts(kind, range_key)))
+    save_run(conn, kind, range_key, apps)
+    save_summary(conn, kind, range_key)
+
+
+def summarize(conn, kind, range_key):
+    """
+    Overview rollup of a run: for stats the per-date totals across apps
+    ({'dates', 'impressions', 'clicks', 'installs'} lists plus their
+    'totals'), for fraud the top fraud sources ({'top_sources_by_app'}).
+    """
+    if kind == STATS:
+        summary = {'dates': [], 'impressions': [], 'clicks': [], 'installs': []}
+        for date, impressions, clicks, installs in daily_totals(conn, range_key):
+            summary['dates'].append(date)
+            summary['impressions'].append(impressions)
+            summary['clicks'].append(clicks)
+            summary['installs'].append(installs)
+        summary['totals'] = {col: sum(summary[col]) for col in ('impressions', 'clicks', 'installs')}
+        return summary
+    return {'top_sources_by_app': top_fraud_sources(conn, range_key)}
+
+
+def save_summary(conn, kind, range_key):
+    summary = summarize(conn, kind, range_key)
+    conn.execute('REPLACE INTO run_summaries (kind, range, summary) VALUES (?, ?, ?)',
+                 (kind, range_key, json.dumps(summary)))
+    return summary
+
+
+def load_summary(conn, kind, range_key):
+    """Stored rollup of a run; runs written before summaries existed get theirs computed and stored now"""
+    row = conn.execute('SELECT summary FROM run_summaries WHERE kind = ? AND range = ?', (kind, range_key)).fetchone()
+    if row:
+        return json.loads(row[0])
+    summary = save_summary(conn, kind, range_key)
+    conn.commit()
+    return summary
+
+
+def find_run(conn, kind, range_key):
+    """(range, updated_at) of the run with exactly this range key, or None"""
+    return conn.execute(f'SELECT range, updated_at FROM {_CACHE_TABLES[kind]} WHERE range = ?',
+                        (range_key,)).fetchone()
+
+
+def latest_run(conn, kind, period):
+    """(range, updated_at) of the most recent run for a period (any events / apps), or None"""
+    return conn.execute(f'''SELECT range, updated_at FROM {_CACHE_TABLES[kind]}
+                            WHERE period = ? ORDER BY updated_at DESC LIMIT 1''', (period,)).fetchone()
+
+
+def _event_names(app_entry, kind):
+    if kind == FRAUD:
+        return app_entry.get('event1_name'), app_entry.get('event2_name')
+    selected = app_entry.get('selected_events') or []
+    return (selected[0] if len(selected) > 0 else None), (selected[1] if len(selected) > 1 else None)
+
+
+def _extra(stored, rebuilt, skip=()):
+    """JSON [fields of stored that rebuilt lacks or has otherwise, fields only rebuilt has], or None if they match"""
+    changed = {key: value for key, value in stored.items()
+               if key not in skip and (key not in rebuilt or type(rebuilt[key]) is not type(value)
+                                       or rebuilt[key] != value)}
+    absent = [key for key in rebuilt if key not in stored and key not in skip]
+    return json.dumps([changed, absent]) if changed or absent else None
+
+
+def _apply_extra(rebuilt, extra):
+    if extra:
+        changed, absent = json.loads(extra)
+        rebuilt.update(changed)
+        for key in absent:
+            rebuilt.pop(key, None)
+    return rebuilt
+
+
+def _app_entry(kind, app_id, app_name, event1_name, event2_name, selected_events, errors, error):
+    """An app entry as rebuilt from its metric_apps columns (table still empty)"""
+    entry = {'app_id': app_id, 'app_name': app_name, 'table': []}
+    if kind == STATS:
+        entry['selected_events'] = json.loads(selected_events) if selected_events else []
+        entry['traffic'] = 0
+    else:
+        entry['event1_name'] = event1_name
+        entry['event2_name'] = event2_name
+    if errors is not None:
+        entry['errors'] = json.loads(errors)
+    if error is not None:
+        entry['error'] = error
+    return entry
+
+
+def _table_row(kind, entry, event1_name, event2_name, date, media_source, values):
+    """A table row as rebuilt from its metric_facts columns (values in FACT_COLUMNS order)"""
+    facts = dict(zip(FACT_COLUMNS, values))
+    if kind == FRAUD:
+        row = {'date': date, 'media_source': media_source}
+        row.update((col, facts[col]) for col in FRAUD_COLUMNS)
+        return row
+    row = stats_row(date, *[facts[col] for col in STATS_COLUMNS])
+    if entry['selected_events']:
+        for event in entry['selected_events']:
+            row[event] = 0
+        if event2_name is not None:
+            row[event2_name] = facts['event2']
+        if event1_name is not None:
+            row[event1_name] = facts['event1']
+    return row
+
+
+def save_run(conn, kind, range_key, apps):
+    """Replace the stored report for (kind, range_key) with the given app entries"""
+    c = conn.cursor()
+    c.execute('DELETE FROM metric_apps WHERE kind = ? AND range = ?', (kind, range_key))
+    c.execute('DELETE FROM metric_facts WHERE kind = ? AND range = ?', (kind, range_key))
+    app_rows = []
+    fact_rows = []
+    for position, entry in enumerate(apps):
+        event1_name, event2_name = _event_names(entry, kind)
+        columns = (
+            entry.get('app_id'), entry.get('app_name'), event1_name, event2_name,
+            json.dumps(entry['selected_events']) if 'selected_events' in entry else None,
+            json.dumps(entry['errors']) if 'errors' in entry else None,
+            entry.get('error')
+        )
+        rebuilt = _app_entry(kind, *columns)
+        for row_position, row in enumerate(entry.get('table', [])):
+            values = {col: row.get(col, 0) for col in FACT_COLUMNS}
+            if kind == STATS:
+                # Stats rows carry their event counts under the event names themselves
+                values['event1'] = row.get(event1_name, 0) if event1_name in row else 0
+                values['event2'] = row.get(event2_name, 0) if event2_name in row else 0
+            values = [values[col] for col in FACT_COLUMNS]
+            date = row.get('date', '')
+            media_source = row.get('media_source', '') if kind == FRAUD else ''
+            stored = _table_row(kind, rebuilt, event1_name, event2_name, date, media_source, values)
+            if kind == STATS:
+                rebuilt['traffic'] += stored['impressions'] + stored['clicks']
+            fact_rows.append((kind, range_key, entry.get('app_id'), date, media_source, *values,
+                              row_position, _extra(row, stored)))
+        app_rows.append((kind, range_key, columns[0], columns[1], position, *columns[2:],
+                         _extra(entry, rebuilt, skip=('table',))))
+    c.executemany('''INSERT OR REPLACE INTO metric_apps
+                     (kind, range, app_id, app_name, position, event1_name, event2_name, selected_events, errors, error,
+                      extra)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', app_rows)
+    c.executemany(f'''INSERT OR REPLACE INTO metric_facts
+                      (kind, range, app_id, date, media_source, {', '.join(FACT_COLUMNS)}, position, extra)
+                      VALUES ({', '.join(['?'] * (7 + len(FACT_COLUMNS)))})''', fact_rows)
+
+
+def delete_runs(conn, kind, range_key=None):
+    """Drop stored reports of one kind (all of them, or a single range key)"""
+    c = conn.cursor()
+    if range_key is None:
+        c.execute('DELETE FROM metric_apps WHERE kind = ?', (kind,))
+        c.execute('DELETE FROM metric_facts WHERE kind = ?', (kind,))
+        c.execute('DELETE FROM run_summaries WHERE kind = ?', (kind,))
+    else:
+        c.execute('DELETE FROM metric_apps WHERE kind = ? AND range = ?', (kind, range_key))
+        c.execute('DELETE FROM metric_facts WHERE kind = ? AND range = ?', (kind, range_key))
+        c.execute('DELETE FROM run_summaries WHERE kind = ? AND range = ?', (kind, range_key))
+
+
+def stats_row(date, impressions, clicks, installs, blocked_installs_rt, blocked_installs_pa):
+    """Build a stats table row, including the derived rates"""
+    row = {
+        "date": date,
+        "impressions": impressions,
+        "clicks": clicks,
+        "installs": installs,
+        "blocked_installs_rt": blocked_installs_rt,
+        "blocked_installs_pa": blocked_installs_pa,
+    }
+    row["imp_to_click"] = round(row["clicks"] / row["impressions"], 2) if row["impressions"] > 0 else 0
+    row["click_to_install"] = (row["installs"] / row["clicks"]) if row["clicks"] > 0 else 0
+    row["blocked_rt_rate"] = round(row["blocked_installs_rt"] / row["installs"], 2) if row["installs"] > 0 else 0
+    row["blocked_pa_rate"] = round(row["blocked_installs_pa"] / row["installs"], 2) if row["installs"] > 0 else 0
+    return row
+
+
+class DailyStats:
+    """
+    Per-date stats of one app while a daily report is aggregated.
+
+    Fixed columns instead of a dict per date: dates get a position in
+    first-seen order and every metric (and selected event) is a list indexed
+    by it, so a report row costs one lookup and a few integer adds. rows()
+    turns it into the report's table in one step. With net_of_organic,
+    installs are reported without the organic ones (never below 0).
+    """
+
+    __slots__ = ('_index', 'dates', 'impressions', 'clicks', 'installs', 'organic_installs',
+                 'blocked_installs_rt', 'blocked_installs_pa', 'events', 'net_of_organic')
+
+    METRICS = ('impressions', 'clicks', 'installs', 'organic_installs', 'blocked_installs_rt', 'blocked_installs_pa')
+
+    def __init__(self, events=(), net_of_organic=True):
+        self._index = {}
+        self.dates = []
+        for metric in self.METRICS:
+            setattr(self, metric, [])
+        self.events = {event: [] for event in events}
+        self.net_of_organic = net_of_organic
+
+    def position(self, date):
+        """Position of date, adding it (with zeroed metrics) if it is new"""
+        position = self._index.get(date)
+        if position is None:
+            position = self._index[date] = len(self.dates)
+            self.dates.append(date)
+            for metric in self.METRICS:
+                getattr(self, metric).append(0)
+            for column in self.events.values():
+                column.append(0)
+        return position
+
+    def add_row(self, date, impressions, clicks, installs, organic=False):
+        """Add one daily_report row"""
+        position = self._index.get(date)
+        if position is None:
+            position = self.position(date)
+        self.impressions[position] += impressions
+        self.clicks[position] += clicks
+        self.installs[position] += installs
+        if organic:
+            self.organic_installs[position] += installs
+
+    def add_counts(self, metric, counts):
+        """Add a count_by_key result to metric, for the dates already present"""
+        column = getattr(self, metric)
+        index = self._index
+        for (date, _, _), count in counts.items():
+            position = index.get(date)
+            if position is not None:
+                column[position] += count
+
+    def add_event_counts(self, counts):
+        """Add a count_by_key result keyed by event name to the selected events, for the dates already present"""
+        index = self._index
+        for (date, _, event_name), count in counts.items():
+            position = index.get(date)
+            column = self.events.get(event_name)
+            if position is not None and column is not None:
+                column[position] += count
+
+    def __len__(self):
+        return len(self.dates)
+
+    def rows(self, build=None, skip_empty=False):
+        """
+        The table rows, sorted by date.
+
+        build(date, impressions, clicks, installs, blocked_installs_rt,
+        blocked_installs_pa) makes a row (stats_row by default) and the
+        selected events are added to it. skip_empty leaves out dates without
+        any positive metric.
+        """
+        build = build or stats_row
+        installs = self.installs
+        if self.net_of_organic:
+            installs = [max(total - organic, 0) for total, organic in zip(installs, self.organic_installs)]
+        columns = (self.impressions, self.clicks, installs, self.blocked_installs_rt, self.blocked_installs_pa)
+        table = []
+        for date, position in sorted(self._index.items()):
+            values = [column[position] for column in columns]
+            if skip_empty and not any(value > 0 for value in values):
+                continue
+            row = build(date, *values)
+            for event, column in self.events.items():
+                row[event] = column[position]
+            table.append(row)
+        return table
+
+
+class FraudTable:
+    """
+    Fraud table of one app, accumulated per (date, media_source).
+
+    A row is a plain list of FRAUD_COLUMNS counts rather than a dict, and the
+    per-metric totals are kept up to date as counts are added, so they need no
+    pass over the table. rows() builds the report's dict rows once, sorted.
+    """
+
+    __slots__ = ('_rows', 'totals')
+
+    _INDEX = {column: i for i, column in enumerate(FRAUD_COLUMNS)}
+    _KEYS = ('date', 'media_source', *FRAUD_COLUMNS)
+
+    def __init__(self):
+        self._rows = {}
+        self.totals = dict.fromkeys(FRAUD_COLUMNS, 0)
+
+    def add(self, date, media_source, metric, count=1):
+        row = self._rows.get((date, media_source))
+        if row is None:
+            row = self._rows[(date, media_source)] = [0] * len(FRAUD_COLUMNS)
+        row[self._INDEX[metric]] += count
+        self.totals[metric] += count
+
+    def add_counts(self, metric, counts):
+        """Merge a count_by_key result ((date, media_source, _) -> count) into one metric"""
+        index = self._INDEX[metric]
+        rows = self._rows
+        width = len(FRAUD_COLUMNS)
+        total = 0
+        for (date, media_source, _), count in counts.items():
+            row = rows.get((date, media_source))
+            if row is None:
+                row = rows[(date, media_source)] = [0] * width
+            row[index] += count
+            total += count
+        self.totals[metric] += total
+        return total
+
+    def __len__(self):
+        return len(self._rows)
+
+    def media_sources(self):
+        return sorted({media_source for _, media_source in self._rows})
+
+    def rows(self):
+        """Dict rows sorted by (date, media_source), every metric included even when zero"""
+        rows = self._rows
+        return [dict(zip(self._KEYS, (*key, *rows[key]))) for key in sorted(rows)]
+
+
+def _load_apps(c, kind, range_key):
+    c.execute('''SELECT app_id, app_name, event1_name, event2_name, selected_events, errors, error
+                 FROM metric_apps WHERE kind = ? AND range = ? ORDER BY position''', (kind, range_key))
+    return c.fetchall()
+
+
+def load_run(conn, kind, range_key):
+    """Rebuild the {'apps': [...]} report payload for (kind, range_key), as save_run() was given it"""
+    c = conn.cursor()
+    apps = []
+    entries = {}
+    extras = []
+    c.execute('''SELECT app_id, app_name, event1_name, event2_name, selected_events, errors, error, extra
+                 FROM metric_apps WHERE kind = ? AND range = ? ORDER BY position''', (kind, range_key))
+    for *columns, extra in c.fetchall():
+        entry = _app_entry(kind, *columns)
+        apps.append(entry)
+        entries[columns[0]] = (entry, columns[2], columns[3])
+        extras.append((entry, extra))
+
+    c.execute(f'''SELECT app_id, date, media_source, {', '.join(FACT_COLUMNS)}, extra FROM metric_facts
+                  WHERE kind = ? AND range = ? ORDER BY app_id, position, date, media_source''', (kind, range_key))
+    for app_id, date, media_source, *values, extra in c.fetchall():
+        entry, event1_name, event2_name = entries[app_id]
+        row = _table_row(kind, entry, event1_name, event2_name, date, media_source, values)
+        if kind == STATS:
+            entry['traffic'] += row['impressions'] + row['clicks']
+        entry['table'].append(_apply_extra(row, extra))
+    for entry, extra in extras:
+        _apply_extra(entry, extra)
+    return {'apps': apps}
+
+
+def daily_totals(conn, range_key):
+    """[(date, impressions, clicks, installs)] summed across all apps of a stats run"""
+    c = conn.cursor()
+    c.execute('''SELECT date, SUM(impressions), SUM(clicks), SUM(installs) FROM metric_facts
+                 WHERE kind = ? AND range = ? GROUP BY date ORDER BY date''', (STATS, range_key))
+    return c.fetchall()
+
+
+def top_fraud_sources(conn, range_key, max_sources=5, max_apps=5):
+    """Top blocked-install (PA + RT) media sources per app, for the apps with the most fraud"""
+    c = conn.cursor()
+    apps = [{'app_id': app_id, 'app_name': app_name or '', 'sources': [], 'total_fraud': 0}
+            for app_id, app_name, *_ in _load_apps(c, FRAUD, range_key)]
+    by_id = {app['app_id']: app for app in apps}
+    # Ties keep the order in which the sources first appear in the (date, media_source) sorted table
+    c.execute('''SELECT app_id, media_source, SUM(blocked_installs_pa) AS pa, SUM(blocked_installs_rt) AS rt
+                 FROM metric_facts
+                 WHERE kind = ? AND range = ? AND (blocked_installs_pa > 0 OR blocked_installs_rt > 0)
+                 GROUP BY app_id, media_source
+                 ORDER BY app_id, pa + rt DESC, MIN(date), media_source''', (FRAUD, range_key))
+    for app_id, media_source, pa, rt in c.fetchall():
+        app = by_id.get(app_id)
+        if app is None or len(app['sources']) >= max_sources:
+            continue
+        app['sources'].append({'media_source': media_source, 'pa_fraud': pa, 'rt_fraud': rt})
+        app['total_fraud'] += pa + rt
+    apps.sort(key=lambda x: x['total_fraud'], reverse=True)
+    return apps[:max_apps]
+
+
+def events_by_source(conn, range_key):
+    """
+    Event counts per (date, media_source) for every app of a fraud run.
+
+    Returns a list of dicts with app_id, app_name, event1_name, event2_name,
+    table (rows with at least one event) and total_event1/total_event2.
+    """
+    c = conn.cursor()
+    apps = []
+    by_id = {}
+    for app_id, app_name, event1_name, event2_name, *_ in _load_apps(c, FRAUD, range_key):
+        app = {'app_id': app_id, 'app_name': app_name, 'event1_name': event1_name, 'event2_name': event2_name,
+               'table': [], 'total_event1': 0, 'total_event2': 0}
+        apps.append(app)
+        by_id[app_id] = app
+    c.execute('''SELECT app_id, date, media_source, event1, event2 FROM metric_facts
+                 WHERE kind = ? AND range = ? AND (event1 > 0 OR event2 > 0)
+                 ORDER BY app_id, date, media_source''', (FRAUD, range_key))
+    for app_id, date, media_source, event1, event2 in c.fetchall():
+        app = by_id[app_id]
+        app['table'].append({'date': date, 'media_source': media_source, 'event1': event1, 'event2': event2})
+        app['total_event1'] += event1
+        app['total_event2'] += event2
+    return apps
+
+
+def stats_export_rows(conn, range_key):
+    """Yield (app_id, app_name, selected_events, stats row) for every row of a stats run, in report order"""
+    c = conn.cursor()
+    c.execute(f'''SELECT a.app_id, a.app_name, a.selected_events, a.event1_name, a.event2_name,
+                         f.date, {', '.join('f.' + col for col in STATS_COLUMNS)}, f.event1, f.event2
+                  FROM metric_apps a JOIN metric_facts f
+                    ON f.kind = a.kind AND f.range = a.range AND f.app_id = a.app_id
+                  WHERE a.kind = ? AND a.range = ?
+                  ORDER BY a.position, f.date''', (STATS, range_key))
+    for app_id, app_name, selected_events, event1_name, event2_name, date, *values in c:
+        selected = json.loads(selected_events) if selected_events else []
+        row = stats_row(date, *values[:5])
+        if selected:
+            for event in selected:
+                row[event] = 0
+            if event2_name is not None:
+                row[event2_name] = values[6]
+            if event1_name is not None:
+                row[event1_name] = values[5]
+        yield app_id, app_name, selected, row
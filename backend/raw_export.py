@@ -0,0 +1,403 @@
+import csv
+import io
+import os
+import re
+import zipfile
+from io import StringIO
+
+import db
+import raw_store
+from csv_stream import window_date_idx
+
+# Export engine behind /export/raw/<endpoint_type>.
+#
+# Every raw report export is the same job: pick the newest stored report of
+# each app for an endpoint and period, then stream its rows back out. Reports
+# are read one at a time and inflated as they are parsed (raw_store.open_text),
+# rows are optionally filtered by date / media source and projected to a subset
+# of columns, and output leaves in EXPORT_CHUNK_SIZE pieces - either one
+# combined CSV with an App_Name column, a zip with one CSV per app, or typed
+# Parquet / Arrow IPC written a row group at a time (pyarrow, imported lazily
+# so the CSV exports work without it).
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Rows per Parquet row group / Arrow record batch - the rows of one group are held in memory
+ARROW_BATCH_ROWS = int(os.getenv('RAW_EXPORT_BATCH_ROWS', '16384'))
+PARQUET_COMPRESSION = os.getenv('RAW_EXPORT_PARQUET_COMPRESSION', 'zstd')
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'zip': ('application/zip', 'zip'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+# Typed columns for Parquet / Arrow: 'Date' and '... Time' columns are parsed too, anything else stays a string
+ARROW_INT_COLUMNS = {'Impressions', 'Clicks', 'Installs', 'Sessions', 'Loyal Users', 'Install App Store',
+                     'Retention Day', 'Is Retargeting', 'Is Primary Attribution'}
+ARROW_FLOAT_COLUMNS = {'Event Revenue', 'Event Revenue USD', 'Cost Value', 'Total Revenue', 'Total Cost',
+                       'ROI', 'ARPU', 'Average eCPI', 'CTR', 'Conversion Rate', 'Loyal Users/Installs'}
+ARROW_CATEGORY_COLUMNS = {'Media Source', 'Media Source (pid)', 'Event Name', 'Country Code', 'Platform',
+                          'Partner', 'Channel', 'Event Source', 'Attributed Touch Type', 'Match Type',
+                          'Blocked Reason', 'Blocked Sub Reason', 'Fraud Reason', 'Fraud Sub Reason',
+                          'Rejected Reason', 'Device Category', 'App_Name'}
+_INT_RE = r'^-?\d+$'
+_FLOAT_RE = r'^-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$'
+
+# endpoint_type -> (title in the CSV comment, file name part, what the 404 says is missing)
+RAW_EXPORTS = {
+    'daily_report': ("Daily Report Data", "Daily_Report", "daily report"),
+    'blocked_installs_report': ("Blocked Installs Report Data", "Blocked_Installs", "blocked installs report"),
+    'detection': ("Detection (PA) Data", "Detection_PA", "detection"),
+    'blocked_in_app_events_report': ("Blocked In-App Events Data", "Blocked_InApp_Events", "blocked in-app events"),
+    'fraud_post_inapps': ("Fraud Post-InApps Data", "Fraud_Post_InApps", "fraud post-inapps"),
+    'blocked_clicks_report': ("Blocked Clicks Data", "Blocked_Clicks", "blocked clicks"),
+    'blocked_install_postbacks': ("Blocked Install Postbacks Data", "Blocked_Install_Postbacks", "blocked install postbacks"),
+    'in_app_events_report': ("In-App Events Data", "InApp_Events", "in-app events"),
+    'installs_report': ("Installs Report Data", "Installs_Report", "installs report"),
+}
+
+
+def _norm(col):
+    return col.lower().replace(' ', '').replace('_', '').replace('(', '').replace(')', '')
+
+
+def media_source_idx(header):
+    """Index of the media source column ('Media Source', 'Media Source (pid)', ...) or None"""
+    for i, col in enumerate(header):
+        if _norm(col) in ('mediasource', 'mediasourcepid'):
+            return i
+    for i, col in enumerate(header):
+        if 'media' in _norm(col) and 'source' in _norm(col):
+            return i
+    return None
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _arrow_type(pa, name):
+    if name == 'Date':
+        return pa.date32()
+    if name.endswith(' Time'):
+        return pa.timestamp('s')
+    if name in ARROW_INT_COLUMNS:
+        return pa.int64()
+    if name in ARROW_FLOAT_COLUMNS:
+        return pa.float64()
+    if name in ARROW_CATEGORY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+
+def _arrow_column(pa, pc, values, type_):
+    """Typed array from CSV strings; empty and unparseable cells become null"""
+    strings = pa.array(values, type=pa.string())
+    strings = pc.if_else(pc.equal(strings, ''), pa.scalar(None, pa.string()), strings)
+    if pa.types.is_dictionary(type_):
+        return strings.dictionary_encode()
+    if pa.types.is_timestamp(type_):
+        return pc.strptime(strings, format='%Y-%m-%d %H:%M:%S', unit='s', error_is_null=True)
+    if pa.types.is_date32(type_):
+        return pc.strptime(strings, format='%Y-%m-%d', unit='s', error_is_null=True).cast(pa.date32())
+    if pa.types.is_integer(type_) or pa.types.is_floating(type_):
+        valid = pc.match_substring_regex(strings, _INT_RE if pa.types.is_integer(type_) else _FLOAT_RE)
+        return pc.if_else(valid, strings, pa.scalar(None, pa.string())).cast(type_)
+    return strings
+
+
+class _Sink(io.RawIOBase):
+    """Write-only stream that collects what zipfile / pyarrow write so it can be yielded"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        # Parquet records column chunk offsets; zipfile still sees a non-seekable stream
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class RawExport:
+    """
+    One export request: an endpoint, a period and optional filters.
+
+    Args:
+        db_path: SQLite database holding raw_appsflyer_data
+        endpoint_type: one of RAW_EXPORTS
+        period: stored period ('last10', '30d', ...)
+        app_ids: only these apps (None for every app)
+        columns: output only these columns, in this order (None for all)
+        date_from / date_to: ISO dates, inclusive, matched against the
+            report's date column (Event Time, Install Time, Date, ...)
+        media_sources: only rows from these media sources (case-insensitive)
+    """
+
+    def __init__(self, db_path, endpoint_type, period='last10', app_ids=None, columns=None,
+                 date_from=None, date_to=None, media_sources=None):
+        if endpoint_type not in RAW_EXPORTS:
+            raise ValueError(f"Unknown raw report type: {endpoint_type}")
+        self.db_path = db_path
+        self.endpoint_type = endpoint_type
+        self.period = period
+        self.app_ids = list(app_ids) if app_ids else None
+        self.columns = list(columns) if columns else None
+        self.date_from = date_from
+        self.date_to = date_to
+        self.media_sources = {m.strip().lower() for m in media_sources} if media_sources else None
+        self.title, self.file_label, self.missing = RAW_EXPORTS[endpoint_type]
+
+    def reports(self, conn):
+        """
+        Newest stored report per app, ordered by app name, as
+        (id, app_id, app_name, start_date, end_date, created_at) tuples.
+
+        Reports whose window can't overlap the date filter are left out
+        without reading their bodies.
+        """
+        sql = '''SELECT id, app_id, app_name, start_date, end_date, MAX(created_at)
+                 FROM raw_appsflyer_data WHERE endpoint_type = ? AND period = ?'''
+        params = [self.endpoint_type, self.period]
+        if self.app_ids:
+            sql += f" AND app_id IN ({','.join('?' * len(self.app_ids))})"
+            params += self.app_ids
+        if self.date_from:
+            sql += ' AND end_date >= ?'
+            params.append(self.date_from)
+        if self.date_to:
+            sql += ' AND start_date <= ?'
+            params.append(self.date_to)
+        # SQLite fills the bare columns from the row holding MAX(created_at)
+        sql += ' GROUP BY app_id ORDER BY app_name'
+        return conn.execute(sql, params).fetchall()
+
+    def header(self, conn, report):
+        """Header row of a stored report (None for an empty body)"""
+        return next(self._open(conn, report), None)
+
+    def missing_columns(self, header):
+        """Requested columns the report doesn't have"""
+        return [col for col in self.columns or [] if col not in header]
+
+    def _open(self, conn, report):
+        row = conn.execute(f'SELECT {raw_store.RAW_CSV_SQL} FROM raw_appsflyer_data WHERE id = ?',
+                           (report[0],)).fetchone()
+        body = row[0] if row else None
+        return (r for r in csv.reader(raw_store.open_text(body)) if r and any(cell.strip() for cell in r))
+
+    def rows(self, conn, report):
+        """
+        Stream one report through the filters.
+
+        Returns:
+            (header, rows) - the projected header (None for an empty body) and
+            a lazy iterator over the projected rows that pass the filters.
+        """
+        reader = self._open(conn, report)
+        header = next(reader, None)
+        if header is None:
+            return None, iter(())
+
+        checks = []
+        if self.date_from or self.date_to:
+            date_idx = window_date_idx(header)
+            if date_idx is not None:
+                date_from, date_to = self.date_from or '', self.date_to or '9999-12-31'
+                checks.append(lambda row: len(row) > date_idx and
+                              date_from <= row[date_idx].split(" ")[0] <= date_to)
+        if self.media_sources:
+            ms_idx = media_source_idx(header)
+            # A report without a media source column has nothing to match
+            if ms_idx is None:
+                return header, iter(())
+            sources = self.media_sources
+            checks.append(lambda row: len(row) > ms_idx and row[ms_idx].strip().lower() in sources)
+
+        if self.columns:
+            positions = [header.index(col) if col in header else None for col in self.columns]
+            project = lambda row: [row[i] if i is not None and i < len(row) else '' for i in positions]
+            header = list(self.columns)
+        else:
+            project = None
+
+        def generate():
+            for row in reader:
+                if all(check(row) for check in checks):
+                    yield project(row) if project else row
+        return header, generate()
+
+    def _comment(self, report):
+        _, _, _, start_date, end_date, created_at = report
+        return (f"# {self.title} - Period: {self.period} ({start_date} to {end_date})\n"
+                f"# Generated: {created_at}\n")
+
+    def iter_csv(self, reports):
+        """
+        Yield one combined CSV chunk by chunk.
+
+        The first report's header gets an App_Name column; later headers are
+        skipped. Opens its own connection so it can outlive the request handler.
+        """
+        conn = db.connect(self.db_path)
+        buffer = StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        header_added = False
+        try:
+            for report in reports:
+                header, rows = self.rows(conn, report)
+                if header is None:
+                    continue
+                if not header_added:
+                    buffer.write(self._comment(report))
+                    writer.writerow(header + ['App_Name'])
+                    header_added = True
+                app_name = report[2]
+                for row in rows:
+                    writer.writerow(row + [app_name])
+                    if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            conn.close()
+
+    def iter_zip(self, reports):
+        """Yield a zip with one CSV per app, built and sent chunk by chunk"""
+        conn = db.connect(self.db_path)
+        sink = _Sink()
+        buffer = StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        used = set()
+        try:
+            with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+                for report in reports:
+                    header, rows = self.rows(conn, report)
+                    if header is None:
+                        continue
+                    name = self._entry_name(report, used)
+                    with bundle.open(name, 'w') as entry:
+                        buffer.write(self._comment(report))
+                        writer.writerow(header)
+                        for row in rows:
+                            writer.writerow(row)
+                            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                                entry.write(buffer.getvalue().encode('utf-8'))
+                                buffer.seek(0)
+                                buffer.truncate()
+                                data = sink.drain()
+                                if data:
+                                    yield data
+                        entry.write(buffer.getvalue().encode('utf-8'))
+                        buffer.seek(0)
+                        buffer.truncate()
+                    data = sink.drain()
+                    if data:
+                        yield data
+            # Central directory
+            data = sink.drain()
+            if data:
+                yield data
+        finally:
+            conn.close()
+
+    def iter_arrow(self, reports, export_format='parquet'):
+        """
+        Yield the combined export as typed Parquet or an Arrow IPC stream.
+
+        Columns come from the first report's header plus App_Name; timestamps,
+        dates and numbers are parsed (see ARROW_*_COLUMNS) and low-cardinality
+        columns are dictionary-encoded. Rows are converted and written every
+        ARROW_BATCH_ROWS rows, so only one row group is held in memory.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        conn = db.connect(self.db_path)
+        sink = _Sink()
+        writer = None
+        try:
+            for report in reports:
+                header, rows = self.rows(conn, report)
+                if header is None:
+                    continue
+                if writer is None:
+                    names = header + ['App_Name']
+                    schema = pa.schema([(name, _arrow_type(pa, name)) for name in names])
+                    if export_format == 'parquet':
+                        writer = pq.ParquetWriter(sink, schema, compression=PARQUET_COMPRESSION)
+                    else:
+                        writer = pa.ipc.new_stream(sink, schema)
+                    width = len(names) - 1
+                    batch = []
+                # Later reports are matched to the first one's columns by name
+                positions = [header.index(name) if name in header else None for name in names[:-1]]
+                if positions == list(range(len(header))):
+                    positions = None
+                app_name = report[2]
+                for row in rows:
+                    if positions is not None:
+                        row = [row[i] if i is not None and i < len(row) else '' for i in positions]
+                    elif len(row) != width:
+                        row = (row + [''] * width)[:width]
+                    row.append(app_name)
+                    batch.append(row)
+                    if len(batch) >= ARROW_BATCH_ROWS:
+                        self._write_batch(pa, pc, writer, schema, batch)
+                        batch = []
+                        yield sink.drain()
+            if writer is not None:
+                if batch:
+                    self._write_batch(pa, pc, writer, schema, batch)
+                writer.close()
+            data = sink.drain()
+            if data:
+                yield data
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _write_batch(pa, pc, writer, schema, batch):
+        columns = zip(*batch)
+        arrays = [_arrow_column(pa, pc, list(values), field.type) for values, field in zip(columns, schema)]
+        writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+    def iter_format(self, export_format, reports):
+        """Body generator for one of EXPORT_FORMATS"""
+        if export_format == 'zip':
+            return self.iter_zip(reports)
+        if export_format in ('parquet', 'arrow'):
+            return self.iter_arrow(reports, export_format)
+        return self.iter_csv(reports)
+
+    def _entry_name(self, report, used):
+        base = re.sub(r'[^\w.-]+', '_', report[2] or report[1]).strip('_') or report[1]
+        name = f"{base}_{self.file_label}_{self.period}.csv"
+        if name in used:
+            name = f"{base}_{report[1]}_{self.file_label}_{self.period}.csv"
+        used.add(name)
+        return name
+
+    def filename(self, timestamp, extension='csv'):
+        return f"AppsFlyer_Raw_{self.file_label}_{self.period}_{timestamp}.{extension}"
@@ -0,0 +1,167 @@
+import hashlib
+import io
+import os
+import zlib
+
+# Compressed, content-addressed storage for the raw AppsFlyer CSV reports.
+#
+# raw_appsflyer_data keeps one row per (app, endpoint, period, start, end) but
+# the CSV body now lives in raw_blobs, keyed by the SHA-256 of the text and
+# stored zlib-compressed. Rows with identical bodies (a fetch cache hit copied
+# under another period, a slice that covers the whole window, an unchanged
+# refetch) share one blob. Legacy rows with the body in raw_csv_data are
+# compressed when the store is initialized; readers handle both through
+# RAW_CSV_SQL + unpack().
+
+ZLIB_LEVEL = int(os.getenv('RAW_STORE_ZLIB_LEVEL', '6'))
+
+# Codec marker in front of every blob so other codecs can be added without a migration
+_ZLIB = b'z'
+
+# Select the stored body of a raw_appsflyer_data row: the blob, or the legacy TEXT column
+RAW_CSV_SQL = ("COALESCE((SELECT data FROM raw_blobs WHERE raw_blobs.hash = raw_appsflyer_data.blob_hash), "
+               "raw_appsflyer_data.raw_csv_data)")
+
+
+def init_raw_store(conn):
+    """Create raw_blobs, add raw_appsflyer_data.blob_hash and compress any legacy rows"""
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS raw_blobs (
+        hash TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        raw_size INTEGER NOT NULL,
+        stored_size INTEGER NOT NULL
+    )''')
+    columns = [row[1] for row in c.execute('PRAGMA table_info(raw_appsflyer_data)')]
+    if 'blob_hash' not in columns:
+        c.execute('ALTER TABLE raw_appsflyer_data ADD COLUMN blob_hash TEXT')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_raw_data_blob ON raw_appsflyer_data (blob_hash)')
+    migrated, before, after = migrate_legacy_rows(conn)
+    if migrated:
+        print(f"[RAW_STORE] Compressed {migrated} legacy raw reports: {format_size(before)} -> {format_size(after)}")
+        # One-off: hand the freed pages back to the volume
+        conn.commit()
+        conn.execute('VACUUM')
+
+
+def pack(text):
+    return _ZLIB + zlib.compress(text.encode('utf-8'), ZLIB_LEVEL)
+
+
+def unpack(value):
+    """CSV text of a stored body - a compressed blob or a legacy TEXT value"""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value[:1] == _ZLIB:
+        return zlib.decompress(value[1:]).decode('utf-8')
+    raise ValueError(f"Unknown raw blob codec {value[:1]!r}")
+
+
+class _InflateReader(io.RawIOBase):
+    """Readable stream over a zlib blob that inflates it a chunk at a time"""
+
+    CHUNK = 64 * 1024
+
+    def __init__(self, data):
+        self._data = memoryview(data)
+        self._pos = 0
+        self._inflate = zlib.decompressobj()
+        self._pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            if self._pos >= len(self._data):
+                self._pending = memoryview(self._inflate.flush())
+                if not self._pending:
+                    return 0
+                break
+            chunk = self._data[self._pos:self._pos + self.CHUNK]
+            self._pos += len(chunk)
+            self._pending = memoryview(self._inflate.decompress(chunk))
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+def open_text(value):
+    """Text stream over a stored body, inflated as it is read - for exports of large reports"""
+    if value is None or isinstance(value, str):
+        return io.StringIO(value or '', newline='')
+    value = bytes(value)
+    if value[:1] == _ZLIB:
+        return io.TextIOWrapper(io.BufferedReader(_InflateReader(value[1:])), encoding='utf-8', newline='')
+    raise ValueError(f"Unknown raw blob codec {value[:1]!r}")
+
+
+def put(conn, text):
+    """Store a CSV body once and return its hash"""
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    if conn.execute('SELECT 1 FROM raw_blobs WHERE hash = ?', (digest,)).fetchone() is None:
+        data = pack(text)
+        conn.execute('INSERT OR IGNORE INTO raw_blobs (hash, data, raw_size, stored_size) VALUES (?, ?, ?, ?)',
+                     (digest, data, len(text.encode('utf-8')), len(data)))
+    return digest
+
+
+def prune(conn):
+    """Drop blobs no raw_appsflyer_data row points at any more; returns how many went"""
+    cur = conn.execute('''DELETE FROM raw_blobs WHERE hash NOT IN
+                          (SELECT blob_hash FROM raw_appsflyer_data WHERE blob_hash IS NOT NULL)''')
+    return cur.rowcount
+
+
+def migrate_legacy_rows(conn, batch_size=50):
+    """Move legacy TEXT bodies into raw_blobs; returns (rows, text bytes before, blob bytes after)"""
+    migrated, before = 0, 0
+    while True:
+        rows = conn.execute('''SELECT id, raw_csv_data FROM raw_appsflyer_data
+                               WHERE blob_hash IS NULL AND raw_csv_data != '' LIMIT ?''', (batch_size,)).fetchall()
+        if not rows:
+            break
+        for row_id, text in rows:
+            conn.execute("UPDATE raw_appsflyer_data SET blob_hash = ?, raw_csv_data = '' WHERE id = ?",
+                         (put(conn, text), row_id))
+            before += len(text.encode('utf-8'))
+        conn.commit()
+        migrated += len(rows)
+    after = 0
+    if migrated:
+        after = conn.execute('SELECT COALESCE(SUM(stored_size), 0) FROM raw_blobs').fetchone()[0]
+    return migrated, before, after
+
+
+def size_report(conn):
+    """Logical size of the stored reports vs. what they take on disk"""
+    rows, logical, legacy = conn.execute('''SELECT COUNT(*),
+               COALESCE(SUM(COALESCE(b.raw_size, LENGTH(CAST(r.raw_csv_data AS BLOB)))), 0),
+               COALESCE(SUM(CASE WHEN r.blob_hash IS NULL THEN LENGTH(CAST(r.raw_csv_data AS BLOB)) ELSE 0 END), 0)
+        FROM raw_appsflyer_data r LEFT JOIN raw_blobs b ON b.hash = r.blob_hash''').fetchone()
+    blobs, blob_raw, blob_stored = conn.execute('''SELECT COUNT(*), COALESCE(SUM(raw_size), 0),
+               COALESCE(SUM(stored_size), 0) FROM raw_blobs''').fetchone()
+    stored = blob_stored + legacy
+    return {
+        'rows': rows,
+        'blobs': blobs,
+        'uncompressed_bytes': logical,
+        'deduplicated_bytes': blob_raw + legacy,
+        'stored_bytes': stored,
+        'legacy_text_bytes': legacy,
+        'uncompressed': format_size(logical),
+        'stored': format_size(stored),
+        'ratio': round(logical / stored, 2) if stored else None
+    }
+
+
+def format_size(size):
+    if size < 1024:
+        return f"{size} bytes"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
@@ -1,23 +1,16 @@
 import json
-import sqlite3
 from datetime import datetime
 import pytz
 import requests
 import time
-from rq import Queue
-from redis import Redis
 import logging
 import os
+import db
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Redis connection
-redis_conn = Redis(host='localhost', port=6379, db=0)
-# Initialize RQ queue
-task_queue = Queue(connection=redis_conn)
-
 # Database path - use persistent volume in Railway, fallback to local for development
 # More reliable Railway detection - Railway sets multiple environment variables
 def is_railway_environment():
@@ -45,15 +38,13 @@ def is_railway_environment():
 DB_PATH = os.getenv('DB_PATH', '/data/event_selections.db' if is_railway_environment() else 'event_selections.db')
 
 def process_report_async(apps, period, selected_events):
-    """Process report asynchronously using RQ"""
+    """Process report asynchronously using RQ - one subjob per app, see app.enqueue_report"""
     logger.info(f"Starting report generation for period: {period}")
     logger.info(f"Number of apps to process: {len(apps) if apps else 'all active apps'}")
     
-    job = task_queue.enqueue(
-        'app.process_report_task',
-        args=(apps, period, selected_events),
-        job_timeout='1h'
-    )
+    # Imported here: app.py owns the queue (REDIS_URL) and the job functions
+    from app import enqueue_report
+    job = enqueue_report(apps, period, selected_events)
     logger.info(f"Report generation job enqueued with ID: {job.id}")
     return job.id
 
@@ -68,7 +59,7 @@ def get_fraud_data(apps, period):
 def get_active_app_ids():
     """Get list of active app IDs from database"""
     logger.info("Retrieving active app IDs from database")
-    conn = sqlite3.connect(DB_PATH)
+    conn = db.connect(DB_PATH)
     c = conn.cursor()
     c.execute('SELECT app_id FROM app_event_selections WHERE is_active = 1')
     active_apps = [row[0] for row in c.fetchall()]
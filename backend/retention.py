@@ -0,0 +1,177 @@
+import json
+import os
+
+import metrics_store
+import raw_store
+from metrics_store import STATS, FRAUD
+
+# Retention for the SQLite caches on the persistent volume.
+#
+# stats_cache / fraud_cache gain a run for every app-set / event combination,
+# raw_appsflyer_data a row for every fetched window and day_partitions a row
+# per app and day, and nothing else ever removes them. enforce() trims them:
+#   - report runs: keep the newest CACHE_MAX_RUNS_PER_PERIOD per period and
+#     drop runs not updated for CACHE_MAX_AGE_DAYS (the newest run of a period
+#     is always kept, so the dashboard never loses its last report)
+#   - raw reports: evict until the stored blobs fit RAW_DATA_MAX_BYTES, windows
+#     superseded by a newer fetch of the same app/endpoint/period first, then
+#     the oldest
+#   - day partitions older than DAY_PARTITION_MAX_AGE_DAYS
+# A limit of 0 disables it. The auto-run worker calls run_if_due() every
+# RETENTION_INTERVAL_HOURS; each run is recorded in retention_runs.
+
+CACHE_MAX_RUNS_PER_PERIOD = int(os.getenv('CACHE_MAX_RUNS_PER_PERIOD', '10'))
+CACHE_MAX_AGE_DAYS = int(os.getenv('CACHE_MAX_AGE_DAYS', '30'))
+RAW_DATA_MAX_BYTES = int(os.getenv('RAW_DATA_MAX_BYTES', str(512 * 1024 * 1024)))
+# Longest period is 30d / mtd - keep a margin on top
+DAY_PARTITION_MAX_AGE_DAYS = int(os.getenv('DAY_PARTITION_MAX_AGE_DAYS', '62'))
+RETENTION_INTERVAL_HOURS = float(os.getenv('RETENTION_INTERVAL_HOURS', '6'))
+# VACUUM after a run once at least this much of the file is free pages
+RETENTION_VACUUM_MIN_BYTES = int(os.getenv('RETENTION_VACUUM_MIN_BYTES', str(64 * 1024 * 1024)))
+
+_CACHE_TABLES = {STATS: 'stats_cache', FRAUD: 'fraud_cache'}
+
+
+def init_retention(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS retention_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ran_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        report TEXT NOT NULL
+    )''')
+
+
+def trim_runs(conn, kind, max_runs=None, max_age_days=None):
+    """Drop old report runs of one kind (and their metric rows); returns how many went"""
+    max_runs = CACHE_MAX_RUNS_PER_PERIOD if max_runs is None else max_runs
+    max_age_days = CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    if max_runs <= 0 and max_age_days <= 0:
+        return 0
+    table = _CACHE_TABLES[kind]
+    conditions = []
+    params = []
+    if max_runs > 0:
+        conditions.append('rank > ?')
+        params.append(max_runs)
+    if max_age_days > 0:
+        conditions.append("updated_at < datetime('now', ?)")
+        params.append(f'-{max_age_days} days')
+    ranges = [row[0] for row in conn.execute(f'''
+        SELECT range FROM (
+            SELECT range, updated_at,
+                   ROW_NUMBER() OVER (PARTITION BY period ORDER BY updated_at DESC, range) AS rank
+            FROM {table})
+        WHERE rank > 1 AND ({' OR '.join(conditions)})''', params)]
+    for range_key in ranges:
+        metrics_store.delete_runs(conn, kind, range_key)
+    conn.executemany(f'DELETE FROM {table} WHERE range = ?', [(range_key,) for range_key in ranges])
+    return len(ranges)
+
+
+def evict_raw(conn, max_bytes=None):
+    """
+    Evict raw reports until the stored bodies fit max_bytes.
+
+    Returns:
+        (rows deleted, stored bytes freed)
+    """
+    max_bytes = RAW_DATA_MAX_BYTES if max_bytes is None else max_bytes
+    if max_bytes <= 0:
+        return 0, 0
+    used = raw_store.size_report(conn)['stored_bytes']
+    if used <= max_bytes:
+        return 0, 0
+    refs = dict(conn.execute('''SELECT blob_hash, COUNT(*) FROM raw_appsflyer_data
+                                WHERE blob_hash IS NOT NULL GROUP BY blob_hash'''))
+    sizes = dict(conn.execute('SELECT hash, stored_size FROM raw_blobs'))
+    candidates = conn.execute('''
+        SELECT id, blob_hash, LENGTH(CAST(raw_csv_data AS BLOB)),
+               ROW_NUMBER() OVER (PARTITION BY app_id, endpoint_type, period
+                                  ORDER BY created_at DESC, id DESC) > 1 AS superseded
+        FROM raw_appsflyer_data
+        ORDER BY superseded DESC, created_at, id''')
+    evicted, freed = [], 0
+    for row_id, blob_hash, legacy_size, _ in candidates:
+        if used - freed <= max_bytes:
+            break
+        evicted.append((row_id,))
+        freed += legacy_size or 0
+        if blob_hash is not None:
+            refs[blob_hash] -= 1
+            # A shared body only goes with the last row that points at it
+            if refs[blob_hash] == 0:
+                freed += sizes.get(blob_hash, 0)
+    candidates.close()
+    conn.executemany('DELETE FROM raw_appsflyer_data WHERE id = ?', evicted)
+    raw_store.prune(conn)
+    return len(evicted), freed
+
+
+def trim_day_partitions(conn, max_age_days=None):
+    """Drop per-day results older than max_age_days; returns how many rows went"""
+    max_age_days = DAY_PARTITION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    if max_age_days <= 0:
+        return 0
+    return conn.execute("DELETE FROM day_partitions WHERE date < date('now', ?)",
+                        (f'-{max_age_days} days',)).rowcount
+
+
+def _free_bytes(conn):
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    return conn.execute('PRAGMA freelist_count').fetchone()[0] * page_size
+
+
+def enforce(conn):
+    """Apply every retention limit, record the run and return what it freed"""
+    report = {
+        'stats_runs_deleted': trim_runs(conn, STATS),
+        'fraud_runs_deleted': trim_runs(conn, FRAUD),
+    }
+    report['raw_rows_deleted'], report['raw_bytes_freed'] = evict_raw(conn)
+    report['day_partitions_deleted'] = trim_day_partitions(conn)
+    conn.commit()
+    report['free_bytes'] = _free_bytes(conn)
+    report['vacuumed'] = False
+    if RETENTION_VACUUM_MIN_BYTES > 0 and report['free_bytes'] >= RETENTION_VACUUM_MIN_BYTES:
+        conn.execute('VACUUM')
+        report['vacuumed'] = True
+    conn.execute('INSERT INTO retention_runs (report) VALUES (?)', (json.dumps(report),))
+    conn.commit()
+    print(f"[RETENTION] Deleted {report['stats_runs_deleted']} stats / {report['fraud_runs_deleted']} fraud runs, "
+          f"{report['raw_rows_deleted']} raw reports ({raw_store.format_size(report['raw_bytes_freed'])}), "
+          f"{report['day_partitions_deleted']} day partitions; "
+          f"{raw_store.format_size(report['free_bytes'])} free{' - vacuumed' if report['vacuumed'] else ''}")
+    return report
+
+
+def run_if_due(conn, interval_hours=None):
+    """enforce() if the last recorded run is older than interval_hours; returns its report or None"""
+    interval_hours = RETENTION_INTERVAL_HOURS if interval_hours is None else interval_hours
+    if interval_hours <= 0:
+        return None
+    recent = conn.execute("SELECT 1 FROM retention_runs WHERE ran_at >= datetime('now', ?) LIMIT 1",
+                          (f'-{interval_hours * 3600:.0f} seconds',)).fetchone()
+    if recent:
+        return None
+    return enforce(conn)
+
+
+def status(conn, limit=10):
+    """Configured limits, current usage and the latest runs"""
+    runs = [dict(json.loads(report), ran_at=ran_at) for ran_at, report in conn.execute(
+        'SELECT ran_at, report FROM retention_runs ORDER BY id DESC LIMIT ?', (limit,))]
+    return {
+        'limits': {
+            'cache_max_runs_per_period': CACHE_MAX_RUNS_PER_PERIOD,
+            'cache_max_age_days': CACHE_MAX_AGE_DAYS,
+            'raw_data_max_bytes': RAW_DATA_MAX_BYTES,
+            'day_partition_max_age_days': DAY_PARTITION_MAX_AGE_DAYS,
+            'interval_hours': RETENTION_INTERVAL_HOURS,
+        },
+        'usage': {
+            'stats_runs': conn.execute('SELECT COUNT(*) FROM stats_cache').fetchone()[0],
+            'fraud_runs': conn.execute('SELECT COUNT(*) FROM fraud_cache').fetchone()[0],
+            'raw': raw_store.size_report(conn),
+            'day_partitions': conn.execute('SELECT COUNT(*) FROM day_partitions').fetchone()[0],
+        },
+        'runs': runs,
+    }
@@ -0,0 +1,142 @@
+import datetime
+import heapq
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+
+# Deferred retries for AppsFlyer fetches.
+#
+# A failed endpoint fetch is not retried by sleeping inside the request that
+# asked for it - that pins a gunicorn worker for minutes. Instead the fetch is
+# re-enqueued to run later: as an RQ delayed job when an RQ worker is listening
+# (it runs with the RQ scheduler), otherwise on an in-process timer thread -
+# with Redis but no worker a delayed job would never run. A successful retry lands in raw_appsflyer_data, where the raw fetch
+# cache serves it to the next dashboard run.
+
+# Backoff for attempt n is base * 2**n capped at RETRY_MAX_DELAY, half of it jittered
+RETRY_MAX_DELAY = float(os.getenv('AF_RETRY_MAX_DELAY', '900'))
+# A pending retry blocks duplicates for its delay plus this long (covers a slow or lost job)
+RETRY_PENDING_GRACE = int(os.getenv('AF_RETRY_PENDING_GRACE', '600'))
+
+
+def backoff_delay(attempt, base, retry_after=None, cap=None):
+    """Seconds before retry number `attempt` (0-based): exponential with equal jitter, never below Retry-After"""
+    cap = RETRY_MAX_DELAY if cap is None else cap
+    ceiling = min(cap, base * (2 ** attempt))
+    delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+    return max(delay, float(retry_after or 0))
+
+
+def job_name(func):
+    """
+    Dotted path RQ uses to find func in the worker.
+
+    app.py started as a script (python app.py) has the module name __main__,
+    which means nothing to a worker - use the script's file name instead.
+    """
+    module = func.__module__
+    if module == '__main__':
+        module = os.path.splitext(os.path.basename(sys.modules['__main__'].__file__))[0]
+    return f"{module}.{func.__qualname__}"
+
+
+class RetryScheduler:
+    """
+    Runs a function after a delay without blocking the caller.
+
+    With an RQ queue and a worker to run it (workers_available(), checked per
+    retry) the call becomes a delayed job (queue.enqueue_in) and is picked up by
+    whichever worker is free; otherwise a daemon timer thread in this process
+    runs it. Each retry has a key, and only one retry per key is pending at a
+    time - shared through Redis when it is available.
+    """
+
+    def __init__(self, queue=None, redis_conn=None, workers_available=None):
+        self.queue = queue
+        self.redis_conn = redis_conn
+        self.workers_available = workers_available
+        self._pending = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._thread_pid = None
+
+    def _claim(self, key, delay):
+        ttl = int(delay) + RETRY_PENDING_GRACE
+        if self.redis_conn is not None:
+            try:
+                return bool(self.redis_conn.set(f"af_retry:{key}", '1', nx=True, ex=ttl))
+            except Exception as e:
+                print(f"[RETRY] Redis unavailable for pending retries, tracking them locally: {e}")
+                self.redis_conn = None
+        now = time.monotonic()
+        with self._cond:
+            if self._pending.get(key, 0) > now:
+                return False
+            self._pending[key] = now + ttl
+            return True
+
+    def done(self, key):
+        """Forget the pending retry for key (called by the retry itself when it starts)"""
+        if self.redis_conn is not None:
+            try:
+                self.redis_conn.delete(f"af_retry:{key}")
+            except Exception as e:
+                print(f"[RETRY] Could not clear pending retry {key}: {e}")
+        with self._cond:
+            self._pending.pop(key, None)
+
+    def schedule(self, key, delay, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) in `delay` seconds.
+
+        Returns False when a retry for key is already pending (nothing is
+        scheduled), True otherwise.
+        """
+        if not self._claim(key, delay):
+            print(f"[RETRY] Retry for {key} already pending")
+            return False
+        if self.queue is not None and (self.workers_available is None or self.workers_available()):
+            try:
+                self.queue.enqueue_in(datetime.timedelta(seconds=delay), job_name(func), *args, **kwargs)
+                print(f"[RETRY] Enqueued retry for {key} in {delay:.1f}s")
+                return True
+            except Exception as e:
+                print(f"[RETRY] Could not enqueue retry for {key}, using local timer: {e}")
+        self._ensure_thread()
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), func, args, kwargs))
+            self._cond.notify()
+        print(f"[RETRY] Scheduled retry for {key} in {delay:.1f}s")
+        return True
+
+    def _ensure_thread(self):
+        # Timer threads don't survive a fork - each gunicorn worker starts its own
+        pid = os.getpid()
+        with self._cond:
+            if self._thread is not None and self._thread_pid == pid:
+                return
+            self._heap = []
+            self._thread = threading.Thread(target=self._run, name='af-retry-timer', daemon=True)
+            self._thread_pid = pid
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, func, args, kwargs = heapq.heappop(self._heap)
+            # Fetches take a while - run each retry on its own thread so the timer stays on time
+            threading.Thread(target=self._call, args=(func, args, kwargs), name='af-retry', daemon=True).start()
+
+    @staticmethod
+    def _call(func, args, kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            print(f"[RETRY] Retry {getattr(func, '__name__', func)} failed: {e}")
@@ -6,11 +6,12 @@ from rq import Worker, Queue, Connection
 # Add the project root to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Redis connection
-redis_conn = Redis(host='localhost', port=6379, db=0)
+# Redis connection - the same REDIS_URL the web app enqueues report jobs on
+redis_conn = Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379'))
 
 if __name__ == '__main__':
     # Start worker
     with Connection(redis_conn):
         worker = Worker([Queue('default')])
-        worker.work() 
\ No newline at end of file
+        # with_scheduler runs the delayed jobs (deferred AppsFlyer retries) when they are due
+        worker.work(with_scheduler=True)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Local AppsFlyer API stand-in for benchmarks
+============================================
+
+Serves deterministic CSV reports on the same URL layout as hq1.appsflyer.com
+(/api/agg-data/export/app/<app_id>/daily_report/v5 and
+/api/raw-data/export/app/<app_id>/<report>/v5) with a configurable latency,
+so the dashboard can be pointed at it through APPSFLYER_BASE_URL. Speaks
+HTTP/1.1 keep-alive and gzips bodies for clients that accept it, and counts
+requests, connections and bytes served.
+
+Usage:
+    python benchmarks/appsflyer_standin.py [--port 8765] [--latency 0.25] [--rows 200]
+"""
+
+import argparse
+import datetime
+import gzip
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+MEDIA_SOURCES = ['organic', 'googleadwords_int', 'Facebook Ads', 'tiktokglobal_int', 'unityads_int', 'applovin_int']
+EVENT_NAMES = ['af_purchase', 'af_complete_registration', 'af_level_achieved', 'af_tutorial_completion']
+
+# Column layouts mirror the real AppsFlyer exports closely enough for the parsers
+RAW_TIME_COLUMN = {
+    'installs_report': 'Install Time',
+    'blocked_installs_report': 'Install Time',
+    'detection': 'Install Time',
+    'blocked_install_postbacks': 'Install Time',
+    'blocked_in_app_events_report': 'Event Time',
+    'fraud-post-inapps': 'Event Time',
+    'in_app_events_report': 'Event Time',
+    'blocked_clicks_report': 'Click Time',
+}
+
+PATH_RE = re.compile(r'^/api/(agg-data|raw-data)/export/app/([^/]+)/([^/]+)/v5$')
+
+
+def _dates(params):
+    today = datetime.date.today()
+    start = params.get('from', [(today - datetime.timedelta(days=9)).isoformat()])[0]
+    end = params.get('to', [today.isoformat()])[0]
+    start_dt = datetime.date.fromisoformat(start)
+    end_dt = datetime.date.fromisoformat(end)
+    days = []
+    while start_dt <= end_dt:
+        days.append(start_dt.isoformat())
+        start_dt += datetime.timedelta(days=1)
+    return days
+
+
+def build_daily_report(app_id, params):
+    lines = ['Date,Media Source (pid),Campaign,Impressions,Clicks,Installs']
+    for day in _dates(params):
+        # Seeded per day so overlapping windows report the same numbers for the same day
+        rnd = random.Random(f"{app_id}:daily:{day}")
+        for ms in MEDIA_SOURCES:
+            lines.append(f"{day},{ms},\"campaign, {ms}\",{rnd.randint(0, 5000)},{rnd.randint(0, 900)},{rnd.randint(0, 120)}")
+    return '\n'.join(lines) + '\n'
+
+
+def build_raw_report(app_id, report, params, rows_per_day):
+    time_col = RAW_TIME_COLUMN.get(report, 'Event Time')
+    lines = [f'{time_col},Event Name,Media Source,Campaign,Country Code,AppsFlyer ID']
+    for day in _dates(params):
+        rnd = random.Random(f"{app_id}:{report}:{day}")
+        for i in range(rows_per_day):
+            ms = rnd.choice(MEDIA_SOURCES)
+            event = rnd.choice(EVENT_NAMES)
+            lines.append(f"{day} {i % 24:02d}:{i % 60:02d}:00,{event},{ms},\"camp, {i % 7}\",US,{rnd.getrandbits(64):x}")
+    return '\n'.join(lines) + '\n'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.25
+    rows_per_day = 200
+    request_count = 0
+    connection_count = 0
+    bytes_served = 0
+    count_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with StandInHandler.count_lock:
+            StandInHandler.connection_count += 1
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        match = PATH_RE.match(parsed.path)
+        if not match:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        with StandInHandler.count_lock:
+            StandInHandler.request_count += 1
+        kind, app_id, report = match.groups()
+        params = parse_qs(parsed.query)
+        time.sleep(self.latency)
+        if kind == 'agg-data':
+            body = build_daily_report(app_id, params)
+        else:
+            body = build_raw_report(app_id, report, params, self.rows_per_day)
+        payload = body.encode('utf-8')
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            payload = gzip.compress(payload, compresslevel=6)
+        with StandInHandler.count_lock:
+            StandInHandler.bytes_served += len(payload)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_standin(port=0, latency=0.25, rows_per_day=200):
+    """Start the stand-in in a background thread and return (server, base_url)"""
+    StandInHandler.latency = latency
+    StandInHandler.rows_per_day = rows_per_day
+    StandInHandler.request_count = 0
+    StandInHandler.connection_count = 0
+    StandInHandler.bytes_served = 0
+    server = ThreadingHTTPServer(('127.0.0.1', port), StandInHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local AppsFlyer API stand-in")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.25, help="Artificial latency per request in seconds")
+    parser.add_argument("--rows", type=int, default=200, help="Raw report rows per day")
+    args = parser.parse_args()
+
+    server, base_url = start_standin(args.port, args.latency, args.rows)
+    print(f"🚀 AppsFlyer stand-in listening on {base_url}")
+    print(f"   Set APPSFLYER_BASE_URL={base_url} to use it")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
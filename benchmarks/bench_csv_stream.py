@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: in-memory vs streaming CSV aggregation
+==================================================
+
+Downloads a large in_app_events_report from the local AppsFlyer stand-in and
+aggregates it per (date, media_source, event) twice: the old way
+(resp.text -> split -> list of rows) and through csv_stream (chunked spool +
+csv.reader + on-the-fly counting). Prints peak Python memory and wall time.
+
+Usage:
+    python benchmarks/bench_csv_stream.py [--rows-per-day 20000] [--days 10]
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'backend'))
+
+import requests
+from csv_stream import SpooledResponse, open_csv, count_by_key
+
+
+def start_standin_process(rows_per_day):
+    """Run the stand-in in its own process so its memory doesn't count against the parsers"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    proc = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, 'appsflyer_standin.py'),
+                             '--port', str(port), '--latency', '0', '--rows', str(rows_per_day)],
+                            stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def aggregate_in_memory(url, params):
+    resp = requests.get(url, params=params, timeout=90)
+    rows = list(csv.reader(io.StringIO(resp.text.strip())))
+    header = rows[0]
+    date_idx, name_idx, ms_idx = header.index("Event Time"), header.index("Event Name"), header.index("Media Source")
+    counts = {}
+    for row in rows[1:]:
+        if len(row) > max(date_idx, name_idx, ms_idx):
+            key = (row[date_idx].split(" ")[0], row[ms_idx].strip(), row[name_idx])
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def aggregate_streaming(url, params):
+    resp = SpooledResponse.from_response(requests.get(url, params=params, timeout=90, stream=True))
+    header, rows = open_csv(resp)
+    date_idx, name_idx, ms_idx = header.index("Event Time"), header.index("Event Name"), header.index("Media Source")
+    counts = count_by_key(rows, date_idx, ms_idx, by_media_source=True, default_media_source=None, event_name_idx=name_idx)
+    resp.close()
+    return dict(counts)
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming CSV aggregation")
+    parser.add_argument("--rows-per-day", type=int, default=20000, help="Report rows per day")
+    parser.add_argument("--days", type=int, default=10, help="Days in the report window")
+    args = parser.parse_args()
+
+    proc, base_url = start_standin_process(args.rows_per_day)
+    today = datetime.date.today()
+    params = {'from': (today - datetime.timedelta(days=args.days - 1)).isoformat(), 'to': today.isoformat()}
+    url = f"{base_url}/api/raw-data/export/app/id_bench/in_app_events_report/v5"
+
+    print("🚀 CSV aggregation benchmark")
+    print("=" * 40)
+    print(f"Rows: {args.rows_per_day * args.days:,}")
+    old, old_time, old_peak = measure(aggregate_in_memory, url, params)
+    print(f"In-memory:  {old_time:6.2f}s  peak {old_peak / (1024 * 1024):8.1f} MB")
+    new, new_time, new_peak = measure(aggregate_streaming, url, params)
+    print(f"Streaming:  {new_time:6.2f}s  peak {new_peak / (1024 * 1024):8.1f} MB")
+    print(f"Identical results: {'✅' if old == new else '❌'}")
+    proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
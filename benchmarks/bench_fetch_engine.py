@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sequential vs concurrent /all-apps-stats and /get_fraud
+===================================================================
+
+Runs the real /all-apps-stats (or /get_fraud) handler against the local AppsFlyer stand-in,
+once with the fetch engine forced to one app / one request at a time (the old
+behaviour) and once with the configured concurrency, and prints the wall-clock
+speedup.
+
+Usage:
+    python benchmarks/bench_fetch_engine.py [--report stats|fraud] [--apps 20] [--latency 0.25] [--max-apps 8] [--per-host 6]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'backend')
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from appsflyer_standin import start_standin, StandInHandler
+
+
+def load_app(base_url, db_path):
+    """Import the dashboard app configured against the stand-in"""
+    os.environ.setdefault('DASHBOARD_USERNAME', 'bench')
+    os.environ.setdefault('DASHBOARD_PASSWORD', 'bench')
+    os.environ.setdefault('EMAIL', 'bench@example.com')
+    os.environ.setdefault('PASSWORD', 'bench')
+    os.environ.setdefault('APPSFLYER_API_KEY', 'bench-api-key')
+    os.environ['APPSFLYER_BASE_URL'] = base_url
+    os.environ['DB_PATH'] = db_path
+    os.environ['REDIS_URL'] = os.getenv('BENCH_REDIS_URL', 'redis://127.0.0.1:1')
+    import app as dashboard
+    return dashboard
+
+
+REPORTS = {
+    'stats': ('/all-apps-stats', 'stats_cache'),
+    'fraud': ('/get_fraud', 'fraud_cache'),
+}
+
+
+def run_once(dashboard, report, apps, period, selected_events):
+    route, cache_table = REPORTS[report]
+    client = dashboard.app.test_client()
+    with client.session_transaction() as sess:
+        sess['logged_in'] = True
+    # Clear the report cache and stored days so every run really hits the API
+    conn = dashboard.sqlite3.connect(dashboard.DB_PATH)
+    conn.execute(f'DELETE FROM {cache_table}')
+    conn.execute('DELETE FROM day_partitions')
+    conn.execute('DELETE FROM raw_appsflyer_data')
+    conn.commit()
+    conn.close()
+    start = time.perf_counter()
+    resp = client.post(route, json={'apps': apps, 'period': period, 'selected_events': selected_events, 'force': True})
+    elapsed = time.perf_counter() - start
+    return elapsed, resp.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the concurrent /all-apps-stats and /get_fraud fetch engine")
+    parser.add_argument("--report", choices=sorted(REPORTS), default="stats", help="Report endpoint to run")
+    parser.add_argument("--apps", type=int, default=20, help="Number of apps to fetch")
+    parser.add_argument("--latency", type=float, default=0.25, help="Stand-in latency per request (seconds)")
+    parser.add_argument("--rows", type=int, default=50, help="Raw report rows per day")
+    parser.add_argument("--period", default="last10", help="Report period")
+    parser.add_argument("--max-apps", type=int, default=8, help="Apps fetched in parallel")
+    parser.add_argument("--per-host", type=int, default=6, help="Concurrent requests per host")
+    args = parser.parse_args()
+
+    server, base_url = start_standin(latency=args.latency, rows_per_day=args.rows)
+    db_dir = tempfile.mkdtemp(prefix='af_bench_')
+    dashboard = load_app(base_url, os.path.join(db_dir, 'bench.db'))
+    import fetch_engine
+
+    apps = [{'app_id': f'id{1000 + i}', 'app_name': f'Bench App {i}'} for i in range(args.apps)]
+    selected_events = {app['app_id']: ['af_purchase', 'af_complete_registration'] for app in apps}
+
+    print(f"🚀 {REPORTS[args.report][0]} fetch engine benchmark")
+    print("=" * 40)
+    print(f"Apps: {args.apps}, stand-in latency: {args.latency}s, period: {args.period}")
+
+    fetch_engine.configure(max_apps=1, max_endpoints=1, per_host_limit=1)
+    StandInHandler.request_count = 0
+    StandInHandler.connection_count = 0
+    seq_time, seq_result = run_once(dashboard, args.report, apps, args.period, selected_events)
+    seq_requests = StandInHandler.request_count
+    print(f"Sequential:  {seq_time:7.2f}s  ({seq_requests} requests, {StandInHandler.connection_count} connections)")
+
+    fetch_engine.configure(max_apps=args.max_apps, max_endpoints=args.max_apps * 4, per_host_limit=args.per_host)
+    StandInHandler.request_count = 0
+    StandInHandler.connection_count = 0
+    par_time, par_result = run_once(dashboard, args.report, apps, args.period, selected_events)
+    par_requests = StandInHandler.request_count
+    print(f"Concurrent:  {par_time:7.2f}s  ({par_requests} requests, {StandInHandler.connection_count} connections, "
+          f"{args.max_apps} apps / {args.per_host} per host)")
+
+    same = sorted(seq_result['apps'], key=lambda a: a['app_id']) == sorted(par_result['apps'], key=lambda a: a['app_id'])
+    print(f"Speedup:     {seq_time / par_time:7.2f}x")
+    print(f"Identical results: {'✅' if same else '❌'}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: row-by-row vs vectorized fraud aggregation
+=====================================================
+
+Builds a blocked_clicks_report-sized CSV in memory and counts it per
+(date, media_source) the way the fraud path does, once with the row-by-row
+csv.reader counter and once with the pyarrow + NumPy backend of
+csv_stream.count_by_key, and checks that both give the same counts.
+
+Usage:
+    python benchmarks/bench_fraud_aggregation.py [--rows 1000000] [--days 10] [--sources 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'backend'))
+
+import csv_stream
+from csv_stream import SpooledResponse, open_csv, count_by_key
+
+HEADER = ['Click Time', 'Media Source', 'Campaign', 'Site ID', 'Blocked Reason', 'IP', 'Country Code']
+
+
+def build_report(rows, days, sources):
+    rnd = random.Random(7)
+    media_sources = [f"network_{n}_int" for n in range(sources)] + ['Facebook Ads', 'googleadwords_int']
+    lines = [','.join(HEADER)]
+    for _ in range(rows):
+        lines.append(f"2024-03-{rnd.randint(1, days):02d} {rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:00,"
+                     f"{rnd.choice(media_sources)},\"Campaign, {rnd.randint(1, 40)}\",site_{rnd.randint(1, 500)},"
+                     f"click_flood,10.0.{rnd.randint(0, 255)}.{rnd.randint(0, 255)},US")
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def spooled(body):
+    resp = SpooledResponse()
+    resp._body.write(body)
+    resp.size = len(body)
+    return resp
+
+
+def run(body, vectorize):
+    csv_stream.CSV_VECTORIZE = vectorize
+    csv_stream.CSV_VECTORIZE_MIN_BYTES = 0
+    header, rows = open_csv(spooled(body))
+    date_idx = header.index('Click Time')
+    start = time.perf_counter()
+    counts = count_by_key(rows, date_idx, header.index('Media Source'), by_media_source=True)
+    return time.perf_counter() - start, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized fraud aggregation")
+    parser.add_argument("--rows", type=int, default=1000000, help="Report rows")
+    parser.add_argument("--days", type=int, default=10, help="Distinct days")
+    parser.add_argument("--sources", type=int, default=200, help="Distinct media sources")
+    args = parser.parse_args()
+
+    if csv_stream._vector_modules() is None:
+        print("pyarrow and numpy are required for the vectorized backend")
+        return
+    body = build_report(args.rows, args.days, args.sources)
+    print("🧮 Fraud aggregation benchmark")
+    print("=" * 40)
+    print(f"Rows: {args.rows}, report size: {len(body) / 1024 / 1024:.1f} MB")
+
+    row_time, row_counts = run(body, vectorize=False)
+    vec_time, vec_counts = run(body, vectorize=True)
+    print(f"Row by row:  {row_time:7.2f}s  ({args.rows / row_time:12,.0f} rows/s)")
+    print(f"Vectorized:  {vec_time:7.2f}s  ({args.rows / vec_time:12,.0f} rows/s)")
+    print(f"Speedup:     {row_time / vec_time:7.2f}x")
+    print(f"Identical results: {'✅' if row_counts == vec_counts else '❌'} ({len(row_counts)} keys)")
+
+
+if __name__ == "__main__":
+    main()
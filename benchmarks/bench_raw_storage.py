@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: raw_appsflyer_data size before/after compressed blob storage
+=======================================================================
+
+Fills a database with stand-in raw reports the way the dashboard stores them
+(several apps x endpoints x the last10 / 10d / 30d / mtd periods) in the legacy
+layout - the CSV body as TEXT in raw_appsflyer_data - then runs the raw_store
+migration and reports the database file size before and after, plus a check
+that every body reads back unchanged.
+
+Usage:
+    python benchmarks/bench_raw_storage.py [--apps 10] [--rows-per-day 200]
+"""
+
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'backend')
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from appsflyer_standin import build_daily_report, build_raw_report
+import raw_store
+
+ENDPOINTS = ['daily_report', 'installs_report', 'blocked_installs_report', 'detection', 'in_app_events_report']
+
+
+def periods():
+    today = datetime.date.today()
+    return {
+        'last10': ((today - datetime.timedelta(days=9)).isoformat(), today.isoformat()),
+        # '10d' is the auto-run's name for the same window
+        '10d': ((today - datetime.timedelta(days=9)).isoformat(), today.isoformat()),
+        '30d': ((today - datetime.timedelta(days=29)).isoformat(), today.isoformat()),
+        'mtd': (today.replace(day=1).isoformat(), today.isoformat()),
+    }
+
+
+def fill_legacy(db_path, apps, rows_per_day):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''CREATE TABLE raw_appsflyer_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        app_id TEXT NOT NULL,
+        app_name TEXT NOT NULL,
+        endpoint_type TEXT NOT NULL,
+        period TEXT NOT NULL,
+        raw_csv_data TEXT NOT NULL,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(app_id, endpoint_type, period, start_date, end_date)
+    )''')
+    bodies = {}
+    for n in range(apps):
+        app_id = f"id_bench_{n}"
+        for endpoint in ENDPOINTS:
+            for period, (start, end) in periods().items():
+                params = {'from': [start], 'to': [end]}
+                if endpoint == 'daily_report':
+                    body = build_daily_report(app_id, params)
+                else:
+                    body = build_raw_report(app_id, endpoint, params, rows_per_day)
+                cur = conn.execute('''INSERT INTO raw_appsflyer_data
+                                      (app_id, app_name, endpoint_type, period, raw_csv_data, start_date, end_date)
+                                      VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                                   (app_id, app_id, endpoint, period, body, start, end))
+                bodies[cur.lastrowid] = body
+    conn.commit()
+    conn.close()
+    return bodies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compressed raw report storage")
+    parser.add_argument("--apps", type=int, default=10, help="Apps to store reports for")
+    parser.add_argument("--rows-per-day", type=int, default=200, help="Raw report rows per day")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        db_path = os.path.join(db_dir, 'bench.db')
+        bodies = fill_legacy(db_path, args.apps, args.rows_per_day)
+        before = os.path.getsize(db_path)
+
+        conn = sqlite3.connect(db_path)
+        raw_store.init_raw_store(conn)
+        conn.commit()
+        report = raw_store.size_report(conn)
+        rows = conn.execute(f'SELECT id, {raw_store.RAW_CSV_SQL} FROM raw_appsflyer_data').fetchall()
+        identical = all(raw_store.unpack(value) == bodies[row_id] for row_id, value in rows)
+        conn.close()
+        after = os.path.getsize(db_path)
+
+    print("🗜️  Raw report storage benchmark")
+    print("=" * 40)
+    print(f"Reports stored:     {report['rows']}  ({report['blobs']} distinct bodies)")
+    print(f"CSV text:           {raw_store.format_size(report['uncompressed_bytes'])}")
+    print(f"After dedup:        {raw_store.format_size(report['deduplicated_bytes'])}")
+    print(f"Compressed blobs:   {raw_store.format_size(report['stored_bytes'])}")
+    print(f"Database file:      {raw_store.format_size(before)} -> {raw_store.format_size(after)} "
+          f"({before / after:.1f}x smaller)")
+    print(f"Bodies read back identical: {'✅' if identical else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
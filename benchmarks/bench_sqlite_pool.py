@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark: fresh sqlite3.connect() per call vs. the pooled WAL connections
+=========================================================================
+
+Reproduces the production access pattern: several processes (the gunicorn
+workers) serve short cached reads while another (the auto-run thread / RQ
+worker) keeps writing report-sized rows in transactions. Runs it once with a
+new default-configured connection per operation (rollback journal, 5s busy
+timeout) and once through backend/db.py, and reports throughput, read
+latency and "database is locked" failures.
+
+Usage:
+    python benchmarks/bench_sqlite_pool.py [--readers 4] [--seconds 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import db
+
+KEYS = 500
+PAYLOAD = os.urandom(64 * 1024).hex()
+
+
+def setup(path):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE stats_cache (key TEXT PRIMARY KEY, data TEXT, updated_at TIMESTAMP)')
+    conn.execute('CREATE TABLE raw_reports (id INTEGER PRIMARY KEY, app_id TEXT, body TEXT)')
+    conn.executemany('INSERT INTO stats_cache VALUES (?, ?, CURRENT_TIMESTAMP)',
+                     [(f"key_{n}", PAYLOAD[:2048]) for n in range(KEYS)])
+    conn.commit()
+    conn.close()
+
+
+def open_conn(mode, path):
+    return db.connect(path) if mode == 'pooled' else sqlite3.connect(path)
+
+
+def reader(mode, path, seconds, results):
+    reads, locked, latency = 0, 0, []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            conn = open_conn(mode, path)
+            try:
+                conn.execute('SELECT data FROM stats_cache WHERE key = ?', (f"key_{random.randrange(KEYS)}",)).fetchone()
+            finally:
+                conn.close()
+            reads += 1
+            latency.append(time.perf_counter() - start)
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    results.put(('read', reads, locked, latency))
+
+
+def writer(mode, path, seconds, results):
+    writes, locked = 0, 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            conn = open_conn(mode, path)
+            try:
+                # One save_raw_appsflyer_data-sized transaction
+                for _ in range(4):
+                    conn.execute('INSERT INTO raw_reports (app_id, body) VALUES (?, ?)', ('id_bench', PAYLOAD))
+                conn.execute("UPDATE stats_cache SET updated_at = CURRENT_TIMESTAMP WHERE key = 'key_0'")
+                conn.commit()
+            finally:
+                conn.close()
+            writes += 1
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    results.put(('write', writes, locked, []))
+
+
+def run(mode, readers, seconds):
+    with tempfile.TemporaryDirectory() as db_dir:
+        path = os.path.join(db_dir, 'bench.db')
+        setup(path)
+        ctx = multiprocessing.get_context('fork')
+        results = ctx.Queue()
+        procs = [ctx.Process(target=writer, args=(mode, path, seconds, results))]
+        procs += [ctx.Process(target=reader, args=(mode, path, seconds, results)) for _ in range(readers)]
+        for proc in procs:
+            proc.start()
+        collected = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+    reads = sum(r[1] for r in collected if r[0] == 'read')
+    writes = sum(r[1] for r in collected if r[0] == 'write')
+    locked = sum(r[2] for r in collected)
+    latency = sorted(l for r in collected for l in r[3])
+    p99 = latency[int(len(latency) * 0.99)] * 1000 if latency else 0
+    return reads / seconds, writes / seconds, locked, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled WAL SQLite connections")
+    parser.add_argument("--readers", type=int, default=4, help="Reader processes (gunicorn workers)")
+    parser.add_argument("--seconds", type=float, default=5, help="Duration of each run")
+    args = parser.parse_args()
+
+    print("🗄️  SQLite connection benchmark")
+    print("=" * 40)
+    for mode, label in (('fresh', 'connect() per call'), ('pooled', 'db.connect() pool + WAL')):
+        reads, writes, locked, p99 = run(mode, args.readers, args.seconds)
+        print(f"{label:24} reads/s {reads:9.0f}   write txns/s {writes:6.1f}   "
+              f"read p99 {p99:7.2f} ms   locked errors {locked}")
+
+
+if __name__ == "__main__":
+    main()
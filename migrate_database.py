@@ -16,11 +16,16 @@ Options:
 """
 
 import os
+import sys
 import sqlite3
 import shutil
 import argparse
 from datetime import datetime
 
+# Same connection settings (WAL, busy timeout) as the app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+import db
+
 def create_backup(source_path):
     """Create a backup of the existing database"""
     if not os.path.exists(source_path):
@@ -50,11 +55,11 @@ def migrate_apps_data(source_path, destination_path):
     
     try:
         # Connect to source database
-        source_conn = sqlite3.connect(source_path)
+        source_conn = db.connect(source_path)
         source_cursor = source_conn.cursor()
         
         # Connect to destination database
-        dest_conn = sqlite3.connect(destination_path)
+        dest_conn = db.connect(destination_path)
         dest_cursor = dest_conn.cursor()
         
         # Create tables (using the same schema as in app.py)
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), 'backend'))
+
+import db
+import metrics_store
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """Pooled connection to a fresh database file"""
+    conn = db.connect(str(tmp_path / 'test.db'))
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def store(conn):
+    """conn with the report caches and their metric tables"""
+    for table in ('stats_cache', 'fraud_cache'):
+        conn.execute(f'CREATE TABLE {table} (range TEXT PRIMARY KEY, data TEXT, '
+                     f'updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+    metrics_store.init_metrics_store(conn)
+    return conn
+
+
+@pytest.fixture
+def raw_conn(conn):
+    """conn with raw_appsflyer_data as created before raw_store (bodies in raw_csv_data)"""
+    conn.execute('''CREATE TABLE raw_appsflyer_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        app_id TEXT NOT NULL,
+        app_name TEXT NOT NULL,
+        endpoint_type TEXT NOT NULL,
+        period TEXT NOT NULL,
+        raw_csv_data TEXT NOT NULL,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(app_id, endpoint_type, period, start_date, end_date)
+    )''')
+    return conn
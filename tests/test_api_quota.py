@@ -0,0 +1,36 @@
+import api_quota
+
+
+def test_raw_data_refusal_leaves_daily_report_alone(conn):
+    api_quota.init_quota_ledger(conn)
+    refused = api_quota.quota_error("Your current subscription package doesn't include raw data reports",
+                                    'installs_report')
+    api_quota.mark_exhausted(conn, 'app1', *refused)
+
+    for endpoint_type in ('installs_report', 'in_app_events_report', 'raw_daily_report'):
+        assert api_quota.reserve(conn, 'app2', endpoint_type) == refused[2]
+    assert api_quota.reserve(conn, 'app2', 'daily_report') is None
+
+
+def test_daily_report_refusals_stay_in_their_family(conn):
+    api_quota.init_quota_ledger(conn)
+    message = "Limit reached for daily-report"
+    api_quota.mark_exhausted(conn, 'app1', *api_quota.quota_error(message, 'raw_daily_report'))
+    assert api_quota.reserve(conn, 'app1', 'raw_daily_report') is not None
+    assert api_quota.reserve(conn, 'app1', 'daily_report') is None
+
+    api_quota.mark_exhausted(conn, 'app2', *api_quota.quota_error(message, 'daily_report'))
+    assert api_quota.reserve(conn, 'app2', 'daily_report') is not None
+    assert api_quota.reserve(conn, 'app2', 'raw_daily_report') is None
+
+
+def test_app_limit_and_release(conn, monkeypatch):
+    api_quota.init_quota_ledger(conn)
+    monkeypatch.setitem(api_quota.DAILY_APP_LIMITS, 'installs', 2)
+    assert api_quota.reserve(conn, 'app1', 'detection') is None
+    assert api_quota.reserve(conn, 'app1', 'blocked_installs_report') is None
+    assert 'allowance of 2 used up' in api_quota.reserve(conn, 'app1', 'installs_report')
+    assert api_quota.reserve(conn, 'app2', 'installs_report') is None
+
+    api_quota.release(conn, 'app1', 'detection')
+    assert api_quota.reserve(conn, 'app1', 'detection') is None
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+pytest.importorskip('requests')
+
+from appsflyer_client import AppsFlyerClient
+
+
+class FakeLimiter:
+    def __init__(self):
+        self.calls = []
+
+    def acquire(self, endpoint_type):
+        self.calls.append(endpoint_type)
+
+
+class FakeSession:
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return kwargs
+
+
+@pytest.fixture
+def client():
+    client = AppsFlyerClient('https://hq1.appsflyer.com', 'key', limiter=FakeLimiter())
+    client._session, client._session_pid = FakeSession(), os.getpid()
+    return client
+
+
+def test_get_takes_a_token_per_call(client):
+    url = client.url('id1', 'detection')
+    client.get(url)
+    client.get(client.url('id1', 'raw_daily_report'))
+    assert client.limiter.calls == ['detection', 'raw_daily_report']
+    assert client.session.urls[0] == url
+
+
+def test_token_taken_before_the_call_is_not_taken_twice(client):
+    url = client.url('id1', 'installs_report')
+    client.wait_for_token(url)
+    client.get(url, token_taken=True)
+    assert client.limiter.calls == ['installs_report']
+    assert client.session.urls == [url]
@@ -0,0 +1,69 @@
+import csv_schema
+from csv_schema import SchemaRegistry
+
+HEADER = ['Install Time', 'Media Source', 'Campaign']
+
+
+def test_resolve_memoizes_per_layout():
+    registry = SchemaRegistry()
+    columns = registry.resolve('detection', HEADER)
+    assert columns == {'time': 0, 'media_source': 1}
+    assert registry.resolve('detection', list(HEADER)) is columns
+    assert registry.resolve('installs_report', HEADER) == columns
+    status = registry.status()
+    assert (status['lookups'], status['hits'], status['cached_layouts']) == (3, 1, 2)
+
+
+def test_first_layout_is_the_baseline():
+    registry = SchemaRegistry()
+    registry.resolve('detection', HEADER)
+    registry.resolve('detection', HEADER)
+    assert registry.status()['endpoints']['detection'] == {
+        'baseline': csv_schema.fingerprint(HEADER),
+        'layouts': 1,
+        'drift_events': 0,
+        'last_drift': None,
+        'missing_fields': {},
+    }
+
+
+def test_a_new_layout_is_recorded_as_drift():
+    registry = SchemaRegistry()
+    registry.resolve('detection', HEADER)
+    drifted = ['Install Time', 'Media Source (pid)', 'Campaign', 'Site ID']
+    assert registry.resolve('detection', drifted) == {'time': 0, 'media_source': 1}
+    registry.resolve('detection', drifted)
+
+    endpoint = registry.status()['endpoints']['detection']
+    assert endpoint['baseline'] == csv_schema.fingerprint(HEADER)
+    assert (endpoint['layouts'], endpoint['drift_events']) == (2, 1)
+    last_drift = endpoint['last_drift']
+    assert last_drift['fingerprint'] == csv_schema.fingerprint(drifted)
+    assert last_drift['added'] == ['Media Source (pid)', 'Site ID']
+    assert last_drift['removed'] == ['Media Source']
+    assert last_drift['reordered'] is False
+
+    registry.resolve('detection', ['Campaign', 'Media Source', 'Install Time'])
+    endpoint = registry.status()['endpoints']['detection']
+    assert endpoint['drift_events'] == 2
+    assert endpoint['last_drift']['reordered'] is True
+    assert (endpoint['last_drift']['added'], endpoint['last_drift']['removed']) == ([], [])
+
+
+def test_missing_fields_are_counted_once_per_layout():
+    registry = SchemaRegistry()
+    for _ in range(3):
+        assert registry.resolve('in_app_events_report', ['Event Time', 'Campaign']) == {
+            'time': 0, 'media_source': None, 'event_name': None}
+    registry.resolve('in_app_events_report', ['Event Time', 'Event Name'])
+    endpoint = registry.status()['endpoints']['in_app_events_report']
+    assert endpoint['missing_fields'] == {'media_source': 2, 'event_name': 1}
+    assert endpoint['drift_events'] == 1
+
+
+def test_endpoint_types_drift_separately():
+    registry = SchemaRegistry()
+    registry.resolve('detection', HEADER)
+    registry.resolve('blocked_clicks_report', ['Click Time', 'Media Source'])
+    endpoints = registry.status()['endpoints']
+    assert [endpoints[name]['drift_events'] for name in ('detection', 'blocked_clicks_report')] == [0, 0]
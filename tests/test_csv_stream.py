@@ -0,0 +1,92 @@
+import pytest
+
+import csv_stream
+from csv_stream import SpooledResponse, open_csv, count_by_key
+
+HEADER = 'Event Time,Media Source,Event Name,Campaign\r\n'
+ROWS = [
+    '2024-03-01 10:00:00,network_a,af_purchase,plain\r\n',
+    '2024-03-01 11:00:00,"network_a",af_purchase,"Campaign, with comma"\r\n',
+    '2024-03-01 12:00:00, network_a ,af_login,"say ""hi"""\r\n',
+    '2024-03-02 00:00:00,,af_purchase,empty media source\r\n',
+    '2024-03-02 01:00:00,"",af_login,"multi\nline"\r\n',
+    '2024-03-02 02:00:00,"network_b, inc",af_purchase,x\r\n',
+    # Outside the 2024-03-01..2024-03-02 window the report was asked for
+    '2024-02-28 23:59:59,network_a,af_purchase,x\r\n',
+    '2024-03-09,network_c,af_purchase,x\r\n',
+    # Short and long rows
+    '2024-03-01 09:00:00,network_a\r\n',
+    '2024-03-01 09:00:00\r\n',
+    '2024-03-02 09:00:00,network_b,af_login,x,extra\r\n',
+    '\r\n',
+]
+
+
+def report(repeat=200):
+    body = ('\ufeff' + HEADER + ''.join(ROWS) * repeat).encode('utf-8')
+    resp = SpooledResponse()
+    resp._body.write(body)
+    resp.size = len(body)
+    return resp
+
+
+def row_counts(**kwargs):
+    _, rows = open_csv(report())
+    counts = count_by_key(rows, 0, **kwargs)
+    assert not csv_stream._vectorizable(rows)
+    return counts
+
+
+@pytest.fixture(autouse=True)
+def row_by_row_by_default(monkeypatch):
+    monkeypatch.setattr(csv_stream, 'CSV_VECTORIZE', False)
+    monkeypatch.setattr(csv_stream, 'CSV_VECTORIZE_MIN_BYTES', 0)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'media_source_idx': 1, 'by_media_source': True},
+    {'media_source_idx': 1, 'by_media_source': True, 'default_media_source': None},
+    {'media_source_idx': 1, 'by_media_source': True, 'event_name_idx': 2},
+    {'media_source_idx': 1, 'by_media_source': True, 'default_media_source': None,
+     'event_name_idx': 2, 'event_names': {'af_purchase'}},
+    {'event_name_idx': 2, 'event_names': {'af_login', 'missing'}},
+    {'by_media_source': True},
+])
+def test_vectorized_counts_match_row_by_row(kwargs):
+    assert csv_stream._vector_modules() is not None
+    expected = row_counts(**kwargs)
+    resp = report()
+    header, _ = open_csv(resp)
+    args = {'media_source_idx': None, 'by_media_source': False, 'default_media_source': 'Unknown',
+            'event_name_idx': None, 'event_names': None}
+    args.update(kwargs)
+    counts = csv_stream._count_vectorized(resp, header, 0, args['media_source_idx'], args['by_media_source'],
+                                          args['default_media_source'], args['event_name_idx'],
+                                          args['event_names'])
+    assert counts is not None
+    assert counts == expected
+
+
+def test_count_by_key_uses_the_vectorized_backend(monkeypatch):
+    expected = row_counts(media_source_idx=1, by_media_source=True)
+    assert expected[('2024-03-02', '', None)] == 400
+    assert expected[('2024-03-01', 'network_a', None)] == 800
+    assert expected[('2024-02-28', 'network_a', None)] == 200
+
+    monkeypatch.setattr(csv_stream, 'CSV_VECTORIZE', True)
+    calls = []
+    vectorized = csv_stream._count_vectorized
+    monkeypatch.setattr(csv_stream, '_count_vectorized', lambda *args: calls.append(args) or vectorized(*args))
+    _, rows = open_csv(report())
+    assert count_by_key(rows, 0, 1, by_media_source=True) == expected
+    assert len(calls) == 1
+
+
+def test_spooled_response_closes_on_the_way_out():
+    with pytest.raises(RuntimeError):
+        with SpooledResponse.from_text(HEADER + ''.join(ROWS)) as spooled:
+            header, _ = open_csv(spooled)
+            assert header == ['Event Time', 'Media Source', 'Event Name', 'Campaign']
+            raise RuntimeError
+    assert spooled._body.closed
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+import metrics_store
+from metrics_store import STATS, FRAUD
+
+
+def report_row(*values):
+    row = metrics_store.stats_row(*values)
+    row["click_to_install"] = round(row["click_to_install"], 2)
+    return row
+
+
+def stats_apps():
+    daily_stats = metrics_store.DailyStats(['af_purchase', 'af_login'])
+    for day, impressions, clicks, installs in ((2, 900, 30, 7), (1, 1000, 40, 9), (3, 0, 0, 0)):
+        daily_stats.add_row(f"2024-03-0{day}", impressions, clicks, installs)
+    daily_stats.add_counts('blocked_installs_rt', {('2024-03-01', None, None): 2})
+    daily_stats.add_event_counts({('2024-03-02', None, 'af_purchase'): 5, ('2024-03-01', None, 'af_login'): 3})
+    table = daily_stats.rows()
+    rounded = metrics_store.DailyStats(net_of_organic=False)
+    rounded.add_row('2024-03-01', 300, 7, 3)
+    return [
+        {'app_id': 'id1', 'app_name': 'First', 'table': table, 'selected_events': ['af_purchase', 'af_login'],
+         'traffic': sum(row['impressions'] + row['clicks'] for row in table)},
+        {'app_id': 'id2', 'app_name': 'Second', 'table': rounded.rows(report_row), 'selected_events': [],
+         'traffic': 310, 'errors': ['Installs Report API timeout']},
+        {'app_id': 'id3', 'app_name': 'Third', 'table': [], 'selected_events': [], 'traffic': 0,
+         'error': 'No data returned from API'},
+    ]
+
+
+def fraud_apps():
+    fraud_table = metrics_store.FraudTable()
+    fraud_table.add_counts('blocked_installs_rt', {('2024-03-01', 'network_b', None): 4,
+                                                    ('2024-03-01', 'network_a', None): 1})
+    fraud_table.add_counts('event1', {('2024-03-02', 'network_a', None): 6})
+    # Auto-run rows: their own blocked_installs field, media sources in first-seen order
+    auto_rows = [{"date": "2024-03-01", "media_source": media_source, "blocked_installs": count,
+                  "blocked_clicks": 0, "blocked_in_app_events": 0}
+                 for media_source, count in (('zeta', 3), ('alpha', 8))]
+    return [
+        {'app_id': 'id1', 'app_name': 'First', 'table': fraud_table.rows(),
+         'event1_name': 'af_purchase', 'event2_name': None, 'errors': []},
+        {'app_id': 'id2', 'app_name': 'Second', 'table': auto_rows},
+    ]
+
+
+@pytest.mark.parametrize('kind, range_key, apps', [
+    (STATS, 'last7:af_purchase:af_login:id1,id2,id3', stats_apps()),
+    (FRAUD, 'last7:id1,id2', fraud_apps()),
+])
+def test_save_and_load_round_trip(store, kind, range_key, apps):
+    expected = json.loads(json.dumps(apps))
+    metrics_store.write_report(store, kind, range_key, apps)
+    assert metrics_store.load_run(store, kind, range_key)['apps'] == expected
+
+
+def test_only_what_cannot_be_rebuilt_goes_to_extra(store):
+    metrics_store.write_report(store, STATS, 'last7::id1,id2,id3', stats_apps())
+    extras = dict(store.execute('''SELECT app_id || ':' || date, extra FROM metric_facts
+                                   WHERE kind = ? AND extra IS NOT NULL''', (STATS,)).fetchall())
+    # Only the rounded click_to_install of the report row differs from stats_row()
+    assert list(extras) == ['id2:2024-03-01']
+    assert json.loads(extras['id2:2024-03-01']) == [{'click_to_install': 0.43}, []]
+
+    metrics_store.write_report(store, FRAUD, 'last7:id1,id2', fraud_apps())
+    changed, absent = json.loads(store.execute('''SELECT extra FROM metric_facts WHERE kind = ? AND app_id = 'id2'
+                                                  AND media_source = 'zeta' ''', (FRAUD,)).fetchone()[0])
+    assert changed == {'blocked_installs': 3}
+    assert set(absent) == set(metrics_store.FRAUD_COLUMNS) - {'blocked_clicks', 'blocked_in_app_events'}
+
+
+def test_rows_of_older_databases_still_load(conn):
+    for table in ('stats_cache', 'fraud_cache'):
+        conn.execute(f'CREATE TABLE {table} (range TEXT PRIMARY KEY, data TEXT, '
+                     f'updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+    conn.execute('''CREATE TABLE metric_apps (kind TEXT NOT NULL, range TEXT NOT NULL, app_id TEXT NOT NULL,
+                    app_name TEXT, position INTEGER NOT NULL, event1_name TEXT, event2_name TEXT,
+                    selected_events TEXT, errors TEXT, error TEXT, PRIMARY KEY (kind, range, app_id))''')
+    columns = ', '.join(f'{col} INTEGER NOT NULL DEFAULT 0' for col in metrics_store.FACT_COLUMNS)
+    conn.execute(f'''CREATE TABLE metric_facts (kind TEXT NOT NULL, range TEXT NOT NULL, app_id TEXT NOT NULL,
+                     date TEXT NOT NULL, media_source TEXT NOT NULL DEFAULT '', {columns},
+                     PRIMARY KEY (kind, range, app_id, date, media_source))''')
+    conn.execute("INSERT INTO metric_apps (kind, range, app_id, app_name, position) VALUES ('fraud', 'p:a', 'a', 'A', 0)")
+    conn.execute('''INSERT INTO metric_facts (kind, range, app_id, date, media_source, blocked_clicks)
+                    VALUES ('fraud', 'p:a', 'a', '2024-01-02', 'x', 3), ('fraud', 'p:a', 'a', '2024-01-01', 'y', 1)''')
+    metrics_store.init_metrics_store(conn)
+
+    table = metrics_store.load_run(conn, FRAUD, 'p:a')['apps'][0]['table']
+    assert [(row['date'], row['blocked_clicks']) for row in table] == [('2024-01-01', 1), ('2024-01-02', 3)]
+
+
+def test_legacy_json_blobs_are_migrated(conn):
+    conn.execute('CREATE TABLE stats_cache (range TEXT PRIMARY KEY, data TEXT, updated_at TIMESTAMP)')
+    conn.execute('CREATE TABLE fraud_cache (range TEXT PRIMARY KEY, data TEXT, updated_at TIMESTAMP)')
+    apps = stats_apps()
+    conn.execute('INSERT INTO stats_cache (range, data) VALUES (?, ?)',
+                 ('last7:af_purchase:af_login:id1,id2,id3', json.dumps({'apps': apps})))
+    metrics_store.init_metrics_store(conn)
+
+    assert conn.execute('SELECT data, period FROM stats_cache').fetchone() == (None, 'last7')
+    loaded = metrics_store.load_run(conn, STATS, 'last7:af_purchase:af_login:id1,id2,id3')['apps']
+    assert loaded == json.loads(json.dumps(apps))
@@ -0,0 +1,82 @@
+import zlib
+
+import pytest
+
+import raw_store
+from raw_store import RAW_CSV_SQL
+
+REPORT = 'Install Time,Media Source,Campaign\n' + ''.join(
+    f'2024-03-{day:02d} 10:00:00,network_{day % 7},"Kampagne, ü {day}"\n' for day in range(1, 29)) * 500
+
+
+def insert(conn, period, text):
+    conn.execute('''INSERT INTO raw_appsflyer_data
+                    (app_id, app_name, endpoint_type, period, raw_csv_data, start_date, end_date)
+                    VALUES ('id1', 'App', 'detection', ?, ?, '2024-03-01', '2024-03-28')''', (period, text))
+
+
+def bodies(conn):
+    return [raw_store.unpack(value) for value, in conn.execute(
+        f'SELECT {RAW_CSV_SQL} FROM raw_appsflyer_data ORDER BY id')]
+
+
+def test_legacy_rows_move_into_shared_blobs(raw_conn):
+    insert(raw_conn, 'last30', REPORT)
+    insert(raw_conn, 'mtd', REPORT)
+    insert(raw_conn, 'last7', 'Install Time\n')
+    raw_store.init_raw_store(raw_conn)
+
+    assert raw_conn.execute("SELECT COUNT(*) FROM raw_appsflyer_data WHERE raw_csv_data != ''").fetchone()[0] == 0
+    assert raw_conn.execute('SELECT COUNT(*) FROM raw_blobs').fetchone()[0] == 2
+    assert bodies(raw_conn) == [REPORT, REPORT, 'Install Time\n']
+    report = raw_store.size_report(raw_conn)
+    assert report['uncompressed_bytes'] == 2 * len(REPORT.encode('utf-8')) + len('Install Time\n')
+    assert report['stored_bytes'] < len(REPORT.encode('utf-8')) / 5
+    # Nothing left to migrate the second time
+    assert raw_store.migrate_legacy_rows(raw_conn) == (0, 0, 0)
+
+
+def test_migration_goes_in_batches(raw_conn):
+    for n in range(7):
+        insert(raw_conn, f'p{n}', f'Install Time\n2024-03-0{n + 1}\n')
+    raw_store.init_raw_store(raw_conn)
+    assert raw_store.migrate_legacy_rows(raw_conn) == (0, 0, 0)
+    raw_conn.execute("UPDATE raw_appsflyer_data SET blob_hash = NULL, raw_csv_data = 'x'")
+    migrated, before, _ = raw_store.migrate_legacy_rows(raw_conn, batch_size=3)
+    assert (migrated, before) == (7, 7)
+    assert bodies(raw_conn) == ['x'] * 7
+
+
+def test_unpack_handles_blobs_and_legacy_text():
+    assert raw_store.unpack(raw_store.pack(REPORT)) == REPORT
+    assert raw_store.unpack(memoryview(raw_store.pack('a,b\n'))) == 'a,b\n'
+    assert raw_store.unpack('legacy,text\n') == 'legacy,text\n'
+    assert raw_store.unpack(None) == ''
+    with pytest.raises(ValueError):
+        raw_store.unpack(b'x' + zlib.compress(b'a'))
+
+
+@pytest.mark.parametrize('value', [raw_store.pack(REPORT), REPORT])
+def test_open_text_streams_the_body(value):
+    stream = raw_store.open_text(value)
+    first = stream.read(100)
+    assert first + stream.read() == REPORT
+    # Line endings are left alone for the csv module
+    assert raw_store.open_text(raw_store.pack('a\r\nb\n')).read() == 'a\r\nb\n'
+
+
+def test_open_text_of_empty_and_unknown_values():
+    assert raw_store.open_text(None).read() == ''
+    assert raw_store.open_text(raw_store.pack('')).read() == ''
+    with pytest.raises(ValueError):
+        raw_store.open_text(b'?abc')
+
+
+def test_prune_drops_unreferenced_blobs(raw_conn):
+    raw_store.init_raw_store(raw_conn)
+    kept = raw_store.put(raw_conn, REPORT)
+    raw_store.put(raw_conn, 'orphan\n')
+    insert(raw_conn, 'last30', '')
+    raw_conn.execute('UPDATE raw_appsflyer_data SET blob_hash = ?', (kept,))
+    assert raw_store.prune(raw_conn) == 1
+    assert [row[0] for row in raw_conn.execute('SELECT hash FROM raw_blobs')] == [kept]
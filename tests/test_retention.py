@@ -0,0 +1,106 @@
+import base64
+import os
+
+import pytest
+
+import metrics_store
+import raw_store
+import retention
+from metrics_store import STATS, FRAUD
+
+
+def add_run(conn, kind, range_key, days_old):
+    metrics_store.write_report(conn, kind, range_key, [
+        {'app_id': 'id1', 'app_name': 'First', 'table': [], 'selected_events': [], 'traffic': 0}])
+    table = retention._CACHE_TABLES[kind]
+    conn.execute(f"UPDATE {table} SET updated_at = datetime('now', ?) WHERE range = ?",
+                 (f'-{days_old} days', range_key))
+
+
+def ranges(conn, table):
+    return sorted(row[0] for row in conn.execute(f'SELECT DISTINCT range FROM {table}'))
+
+
+def test_trim_runs_keeps_the_newest_run_of_each_period(store):
+    for range_key, days_old in (('last7::id1', 1), ('last7:af_purchase:id1', 2), ('last7::id1,id2', 3),
+                                ('last7::id3', 40), ('last30::id1', 90), ('mtd::id1', 0)):
+        add_run(store, STATS, range_key, days_old)
+    add_run(store, FRAUD, 'last7:id1', 90)
+
+    assert retention.trim_runs(store, STATS, max_runs=2, max_age_days=30) == 2
+    kept = ['last30::id1', 'last7::id1', 'last7:af_purchase:id1', 'mtd::id1']
+    assert ranges(store, 'stats_cache') == kept
+    # The metric rows of a trimmed run go with it
+    assert ranges(store, 'metric_apps') == sorted(kept + ['last7:id1'])
+    # A period's newest run stays, however old
+    assert retention.trim_runs(store, FRAUD, max_runs=1, max_age_days=30) == 0
+    assert retention.trim_runs(store, STATS, max_runs=1, max_age_days=0) == 1
+    assert ranges(store, 'stats_cache') == ['last30::id1', 'last7::id1', 'mtd::id1']
+
+
+def test_trim_runs_disabled(store):
+    for n in range(3):
+        add_run(store, STATS, f'last7::id{n}', 100 + n)
+    assert retention.trim_runs(store, STATS, max_runs=0, max_age_days=0) == 0
+    assert len(ranges(store, 'stats_cache')) == 3
+
+
+@pytest.fixture
+def raw(raw_conn):
+    raw_store.init_raw_store(raw_conn)
+    return raw_conn
+
+
+def body():
+    # Random text, so every blob stores at about the same size
+    return base64.b64encode(os.urandom(30000)).decode('ascii')
+
+
+def add_raw(conn, period, text, days_old, start_date='2024-03-01'):
+    conn.execute('''INSERT INTO raw_appsflyer_data
+                    (app_id, app_name, endpoint_type, period, raw_csv_data, blob_hash, start_date, end_date,
+                     created_at)
+                    VALUES ('id1', 'App', 'detection', ?, '', ?, ?, '2024-03-28', datetime('now', ?))''',
+                 (period, raw_store.put(conn, text), start_date, f'-{days_old} days'))
+
+
+def stored_size(text):
+    return len(raw_store.pack(text))
+
+
+def remaining(conn):
+    return [(period, start_date) for period, start_date in conn.execute(
+        'SELECT period, start_date FROM raw_appsflyer_data ORDER BY id')]
+
+
+def test_evict_raw_frees_a_shared_blob_with_its_last_row(raw):
+    shared, other = body(), body()
+    add_raw(raw, 'last30', shared, 5)
+    add_raw(raw, 'mtd', shared, 4)
+    add_raw(raw, 'last7', other, 1)
+    limit = stored_size(shared) + stored_size(other) - 1
+
+    # Dropping the oldest row frees nothing while mtd still points at its body
+    assert retention.evict_raw(raw, max_bytes=limit) == (2, stored_size(shared))
+    assert remaining(raw) == [('last7', '2024-03-01')]
+    assert raw.execute('SELECT COUNT(*) FROM raw_blobs').fetchone()[0] == 1
+    assert raw_store.size_report(raw)['stored_bytes'] <= limit
+
+
+def test_evict_raw_drops_superseded_windows_first(raw):
+    add_raw(raw, 'last7', body(), 10)
+    old_window, new_window = body(), body()
+    add_raw(raw, 'last30', old_window, 3, start_date='2024-02-27')
+    add_raw(raw, 'last30', new_window, 2)
+    used = raw_store.size_report(raw)['stored_bytes']
+
+    assert retention.evict_raw(raw, max_bytes=used - 1) == (1, stored_size(old_window))
+    assert remaining(raw) == [('last7', '2024-03-01'), ('last30', '2024-03-01')]
+
+
+def test_evict_raw_within_limit(raw):
+    add_raw(raw, 'last7', body(), 10)
+    used = raw_store.size_report(raw)['stored_bytes']
+    assert retention.evict_raw(raw, max_bytes=used) == (0, 0)
+    assert retention.evict_raw(raw, max_bytes=0) == (0, 0)
+    assert len(remaining(raw)) == 1
@@ -0,0 +1,35 @@
+import threading
+
+from retry_scheduler import RetryScheduler, backoff_delay
+
+
+class FakeQueue:
+    def __init__(self):
+        self.jobs = []
+
+    def enqueue_in(self, delay, name, *args, **kwargs):
+        self.jobs.append((delay.total_seconds(), name, args))
+
+
+def test_enqueues_while_a_worker_listens():
+    queue = FakeQueue()
+    retries = RetryScheduler(queue, workers_available=lambda: True)
+    assert retries.schedule('key', 5, backoff_delay, 1, 2)
+    assert queue.jobs == [(5, 'retry_scheduler.backoff_delay', (1, 2))]
+
+
+def test_runs_locally_without_a_worker():
+    queue = FakeQueue()
+    ran = threading.Event()
+    retries = RetryScheduler(queue, workers_available=lambda: False)
+    assert retries.schedule('key', 0, ran.set)
+    assert ran.wait(5)
+    assert queue.jobs == []
+
+
+def test_one_pending_retry_per_key():
+    retries = RetryScheduler(FakeQueue(), workers_available=lambda: True)
+    assert retries.schedule('key', 60, print)
+    assert not retries.schedule('key', 60, print)
+    retries.done('key')
+    assert retries.schedule('key', 60, print)